@@ -0,0 +1,125 @@
+"""
+Analisis butir soal dari jawaban pelajar per soal.
+
+Setiap attempt yang dinilai menyimpan jawaban per soal (jawaban_attempt) di
+transaksi yang sama. Pengumpulan hanya meng-insert baris miliknya sendiri;
+tidak ada baris bersama per soal yang diperbarui, jadi pelajar yang
+mengerjakan tugas yang sama tidak saling menunggu. Statistik untuk mentor
+dijumlahkan dari jawaban_attempt saat diminta:
+
+- persen_benar : persen jawaban dengan skor penuh
+- distribusi   : berapa kali tiap pilihan dipilih (soal ABC) atau dijawab 1
+- daya_beda    : korelasi skor soal dengan skor sisa soal lain pada attempt
+                 yang sama (point-biserial terkoreksi untuk soal benar/salah)
+"""
+import math
+
+from sqlalchemy import insert, delete, select, func, case
+from sqlalchemy.orm import Session
+
+import models, grading
+
+
+def pilihan_dijawab(jenis, jumlah_pilihan, jawaban):
+    """
+    Index pilihan yang dihitung di distribusi untuk satu jawaban tersimpan.
+    """
+    if jenis == grading.ABC:
+        return (jawaban,) if 0 <= jawaban < jumlah_pilihan else ()
+    return tuple(i for i in range(jumlah_pilihan) if jawaban >> i & 1)
+
+def catat_jawaban(db: Session, kunci: "grading.KunciJawaban", daftar):
+    """
+    Menyimpan jawaban per soal di transaksi db (tanpa commit). daftar:
+    [(id_attempt, per_soal)] dengan per_soal dari grading.nilai_per_soal.
+    """
+    if not daftar:
+        return
+    db.execute(insert(models.JawabanAttempt.__table__), [
+        {"id_attempt": id_attempt, "id_soal": id_soal, "jawaban": jawaban, "skor": skor}
+        for id_attempt, hasil in daftar
+        for id_soal, (jawaban, skor) in zip(kunci.id_soal, hasil)
+    ])
+
+
+def daya_beda(statistik):
+    """
+    Korelasi skor soal dengan skor soal lain (nilai - skor) dari jumlahan
+    per soal di read_statistik_soal, None jika salah satunya tidak bervariasi.
+    """
+    n = statistik.jumlah_jawaban
+    x, xx = statistik.total_skor, statistik.total_skor_kuadrat
+    sisa = statistik.total_nilai - x
+    sisa_kuadrat = statistik.total_nilai_kuadrat - 2 * statistik.total_skor_nilai + xx
+    x_sisa = statistik.total_skor_nilai - xx
+
+    varians_x = n * xx - x * x
+    varians_sisa = n * sisa_kuadrat - sisa * sisa
+    if varians_x < 1e-9 or varians_sisa < 1e-9:
+        return None
+    r = (n * x_sisa - x * sisa) / math.sqrt(varians_x * varians_sisa)
+    return max(-1.0, min(1.0, r))
+
+def _jawaban_tugas(id_tugas: int):
+    attempt = models.AttemptMengerjakanTugas
+    return select().select_from(models.JawabanAttempt)\
+        .join(attempt, attempt.id == models.JawabanAttempt.id_attempt)\
+        .where(attempt.id_tugas == id_tugas)
+
+def read_statistik_soal(db: Session, id_tugas: int) -> list:
+    """
+    Statistik tiap soal tugas yang sudah pernah dijawab, urut menurut id soal.
+    Dua GROUP BY atas jawaban_attempt tugas ini: jumlahan per soal (nilai
+    attempt dijumlahkan dulu per attempt) dan banyaknya tiap jawaban per soal.
+    """
+    jawaban = models.JawabanAttempt
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+    info = dict(zip(kunci.id_soal, zip(kunci.jenis, kunci.pilihan)))
+
+    per_attempt = _jawaban_tugas(id_tugas)\
+        .add_columns(jawaban.id_attempt, func.sum(jawaban.skor).label("nilai"))\
+        .group_by(jawaban.id_attempt).subquery()
+    nilai = per_attempt.c.nilai
+    daftar = db.execute(
+        select(jawaban.id_soal,
+               func.count().label("jumlah_jawaban"),
+               func.sum(case((jawaban.skor == 1, 1), else_=0)).label("jumlah_benar"),
+               func.sum(jawaban.skor).label("total_skor"),
+               func.sum(jawaban.skor * jawaban.skor).label("total_skor_kuadrat"),
+               func.sum(nilai).label("total_nilai"),
+               func.sum(nilai * nilai).label("total_nilai_kuadrat"),
+               func.sum(jawaban.skor * nilai).label("total_skor_nilai"))
+        .join(per_attempt, per_attempt.c.id_attempt == jawaban.id_attempt)
+        .group_by(jawaban.id_soal).order_by(jawaban.id_soal)).all()
+    # soal yang sudah tidak ada di kunci dilewati
+    daftar = [statistik for statistik in daftar if statistik.id_soal in info]
+
+    distribusi = {statistik.id_soal: [0] * info[statistik.id_soal][1] for statistik in daftar}
+    if daftar:
+        for id_soal, isi, jumlah in db.execute(_jawaban_tugas(id_tugas)
+                .add_columns(jawaban.id_soal, jawaban.jawaban, func.count())
+                .group_by(jawaban.id_soal, jawaban.jawaban)):
+            if id_soal in distribusi:
+                for pilihan in pilihan_dijawab(*info[id_soal], isi):
+                    distribusi[id_soal][pilihan] += jumlah
+
+    hasil = []
+    for statistik in daftar:
+        n = statistik.jumlah_jawaban
+        hasil.append({
+            "id_soal": statistik.id_soal,
+            "jumlah_jawaban": n,
+            "persen_benar": 100 * statistik.jumlah_benar / n if n else None,
+            "rata_rata_skor": statistik.total_skor / n if n else None,
+            "daya_beda": daya_beda(statistik),
+            "distribusi": distribusi[statistik.id_soal],
+        })
+    return hasil
+
+def hapus_tugas(db: Session, id_tugas: int):
+    """
+    Menghapus jawaban per soal semua attempt tugas ini (tanpa commit).
+    """
+    attempt = models.AttemptMengerjakanTugas
+    db.execute(delete(models.JawabanAttempt).where(
+        models.JawabanAttempt.id_attempt.in_(select(attempt.id).where(attempt.id_tugas == id_tugas))))
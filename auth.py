@@ -34,11 +34,11 @@ def check_for_valid_password(password):
         raise HTTPException(status_code=400, detail="Password too short")
 
 def check_if_user_is_mentor(db, id):
-
-    user:models.Mentor = crud.read_user_mentor_by_id(db, id)
-    if user is None: 
+    # cukup kolom Asal dari tabel mentor, bukan seluruh Mentor beserta presigned URL-nya
+    mentor = crud.read_mentor_ringkas_by_id(db, id)
+    if mentor is None: 
         raise HTTPException(status_code=401, detail="akun tidak ditemukan")
-    if user.Asal is None or user.Asal == null:
+    if mentor.Asal is None or mentor.Asal == null:
         raise HTTPException(status_code=401, detail="bukan mentor")
     
 
@@ -0,0 +1,120 @@
+"""
+Cache in-process untuk data tugas yang jarang berubah setelah dibuat:
+snapshot JSON untuk endpoint baca tugas dan kunci jawaban untuk penilaian.
+
+Setiap worker punya cache sendiri. Invalidasi (hapus_tugas) dipanggil oleh
+fungsi crud yang mengubah atau menghapus tugas; worker lain baru melihat
+perubahan setelah TTL habis.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+TUGAS_CACHE_SIZE = int(os.getenv("TUGAS_CACHE_SIZE", 512))
+KUNCI_JAWABAN_CACHE_SIZE = int(os.getenv("KUNCI_JAWABAN_CACHE_SIZE", 1024))
+TUGAS_CACHE_TTL = float(os.getenv("TUGAS_CACHE_TTL", 300))
+
+
+class LRUCache:
+    """
+    Cache LRU dengan batas jumlah entry dan TTL (detik, None = tanpa batas waktu).
+    Aman dipakai dari beberapa thread.
+    """
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] is not None and item[1] <= time.monotonic():
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# JSON (bytes) dari ReadTugasPembelajaran per (id_tugas, view), view: "pelajar" / "mentor"
+tugas_snapshot = LRUCache(TUGAS_CACHE_SIZE, TUGAS_CACHE_TTL)
+VIEW_TUGAS = ("pelajar", "mentor")
+
+# KunciJawaban (grading.py) per id_tugas
+kunci_jawaban = LRUCache(KUNCI_JAWABAN_CACHE_SIZE, TUGAS_CACHE_TTL)
+
+# Versi dinaikkan setiap invalidasi, agar hasil baca yang dimulai sebelum
+# invalidasi tidak disimpan ke cache setelahnya.
+_versi_tugas = {}
+_generasi = 0
+_lock = threading.Lock()
+
+
+def versi_tugas(id_tugas):
+    return (_generasi, _versi_tugas.get(id_tugas, 0))
+
+def simpan_snapshot_tugas(id_tugas, view, versi, data: bytes):
+    with _lock:
+        if versi_tugas(id_tugas) == versi:
+            tugas_snapshot.set((id_tugas, view), data)
+
+def simpan_kunci_jawaban(id_tugas, versi, kunci):
+    with _lock:
+        if versi_tugas(id_tugas) == versi:
+            kunci_jawaban.set(id_tugas, kunci)
+
+def hapus_tugas(id_tugas):
+    """
+    Dipanggil setelah tugas (atau soal/jawabannya) diubah atau dihapus.
+    """
+    with _lock:
+        _versi_tugas[id_tugas] = _versi_tugas.get(id_tugas, 0) + 1
+        for view in VIEW_TUGAS:
+            tugas_snapshot.pop((id_tugas, view))
+        kunci_jawaban.pop(id_tugas)
+
+def hapus_semua():
+    """
+    Mengosongkan seluruh cache tugas, mis. sebelum setiap test. Perubahan
+    data cukup memanggil hapus_tugas untuk tugas yang berubah.
+    """
+    global _generasi
+    with _lock:
+        _generasi += 1
+        tugas_snapshot.clear()
+        kunci_jawaban.clear()
@@ -2,17 +2,62 @@ import datetime
 from typing import List, Union
 import secrets
 from fastapi import UploadFile
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import insert, update, delete, select, func, literal, case, or_
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, joinedload, selectinload, with_polymorphic
+from sqlalchemy.orm.exc import NoResultFound
 from dotenv import load_dotenv
 import os
 from database import s3
 
-import models, schema, auth, email_api
+import models, schema, auth, email_api, pagination, cache, leaderboard, analisis_soal
 
 
 load_dotenv()
 DOMAIN_URL = os.getenv("DOMAIN")
 
+# Kolom kunci keyset pagination (lihat pagination.py)
+KUNCI_MATERI = (models.Materi.id,)
+KUNCI_VIDEO = (models.VideoPembelajaran.id,)
+KUNCI_TUGAS = (models.TugasPembelajaran.time_created, models.TugasPembelajaran.id)
+KUNCI_ATTEMPT = (models.AttemptMengerjakanTugas.id,)
+KUNCI_PELAJAR = (models.Pelajar.id,)
+KUNCI_MENTOR = (models.Mentor.id,)
+KUNCI_ADMIN = (models.Admin.id,)
+KUNCI_REKAP = (models.RekapAttemptTugas.id_pelajar, models.RekapAttemptTugas.id_tugas)
+
+# Kolom response endpoint list untuk jalur cepat (lihat respon_json.py).
+# Kolom relasi diberi label "<relasi>__<kolom>".
+def _kolom_user(model):
+    return (model.id, model.email, model.profile_picture, model.nama_lengkap, model.time_created,
+            model.time_updated, model.is_active)
+
+def _kolom_video(prefix=""):
+    video = models.VideoPembelajaran
+    return tuple(column.label(prefix + column.key) if prefix else column for column in (
+        video.id, video.time_created, video.id_materi, video.s3_key, video.creator_id, video.judul, video.id_tugas))
+
+KOLOM_PELAJAR = _kolom_user(models.Pelajar) + (models.Pelajar.asal_sekolah, models.Pelajar.jurusan, models.Pelajar.is_member)
+KOLOM_MENTOR = _kolom_user(models.Mentor) + (models.Mentor.keahlian, models.Mentor.Asal)
+KOLOM_ADMIN = (models.Admin.id, models.Admin.nama_lengkap, models.Admin.time_created, models.Admin.time_updated,
+               models.Admin.created_by)
+KOLOM_VIDEO_METADATA = _kolom_video()
+KOLOM_MATERI = (models.Materi.id, models.Materi.nama, models.Materi.mapel, models.Materi.jumlah_video)
+KOLOM_VIDEO = KOLOM_VIDEO_METADATA + tuple(column.label("materi__" + column.key) for column in KOLOM_MATERI)
+# jumlah attempt tugas dijumlahkan dari rekap, bukan penghitung di baris tugas:
+# setiap insert attempt/rekap sudah memegang shared lock FK pada baris tugas,
+# jadi UPDATE baris itu per attempt membuat deadlock saat pengumpulan bersamaan.
+JUMLAH_ATTEMPT_TUGAS = select(func.coalesce(func.sum(models.RekapAttemptTugas.jumlah_attempt), 0))\
+    .where(models.RekapAttemptTugas.id_tugas == models.TugasPembelajaran.id)\
+    .scalar_subquery().label("jumlah_attempt")
+KOLOM_TUGAS = (models.TugasPembelajaran.id, models.TugasPembelajaran.time_created, models.TugasPembelajaran.time_updated,
+               models.TugasPembelajaran.judul, models.TugasPembelajaran.attempt_allowed,
+               models.TugasPembelajaran.jumlah_soal, JUMLAH_ATTEMPT_TUGAS) + _kolom_video("video__")
+
+
+class BatasAttemptTercapai(Exception):
+    pass
+
 
 def read_user_by_email(db: Session, email:str):
     return db.query(models.User).filter(models.User.email == email).first()
@@ -92,6 +137,15 @@ def read_user_mentor_by_id(db: Session, user_id: int):
         ExpiresIn = 604800
     )
     return db_mentor
+
+def read_mentor_ringkas_by_id(db: Session, user_id: int):
+    """
+    Row (uid, Asal) untuk pengecekan mentor: hanya tabel mentor, tanpa join ke
+    user dan tanpa presigned URL. None jika bukan mentor.
+    """
+    mentor = models.Mentor.__table__
+    return db.execute(select(mentor.c.uid, mentor.c.Asal).where(mentor.c.uid == user_id)).first()
+
 def create_user_pelajar(db: Session, user: schema.PelajarRegisterForm):
     hashed_password = auth.get_password_hash(user.raw_password)
     activation_code = secrets.token_urlsafe(4)
@@ -193,6 +247,31 @@ def create_new_admin(db: Session, user: schema.AdminRegisterForm, parent: str):
 def read_admin_by_id(db: Session, admin_id: str):
     return db.query(models.Admin).filter(models.Admin.id==admin_id).first()
 
+def admin_ada(db: Session, admin_id: str) -> bool:
+    return db.execute(select(models.Admin.id).where(models.Admin.id == admin_id)).first() is not None
+
+
+# Penghitung materi.jumlah_video dan tugas_pembelajaran.jumlah_soal diubah
+# dengan UPDATE +n/-n di transaksi yang sama dengan insert/delete barisnya,
+# sebelum insert baris anaknya agar kunci baris induk diambil lebih dulu, dan
+# bisa dihitung ulang dengan hitung_ulang_penghitung_stmts
+# (python migrate.py --hitung-ulang).
+def ubah_penghitung_stmt(model, kolom: str, id, n: int = 1):
+    table = model.__table__
+    return update(table).where(table.c.id == id).values({kolom: table.c[kolom] + n})
+
+def hitung_ulang_penghitung_stmts():
+    materi = models.Materi.__table__
+    tugas = models.TugasPembelajaran.__table__
+    video = models.VideoPembelajaran.__table__
+    soal = models.Soal.__table__
+    return [
+        update(materi).values(
+            jumlah_video=select(func.count()).where(video.c.id_materi == materi.c.id).scalar_subquery()),
+        update(tugas).values(
+            jumlah_soal=select(func.count()).where(soal.c.id_tugas == tugas.c.id).scalar_subquery()),
+    ]
+
 
 def create_materi_pembelajaran(db:Session, mapel: Union[str, int, models.DaftarMapelSkolastik], nama_materi: str):
     db.rollback()
@@ -222,6 +301,7 @@ def create_materi_pembelajaran(db:Session, mapel: Union[str, int, models.DaftarM
 def read_materi_pembelajaran_filter_by(db:Session, **kwargs):
     limit = kwargs.get('limit', None)
     page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
     query = db.query(models.Materi).options(joinedload(models.Materi.video_pembelajaran))
 
@@ -236,15 +316,12 @@ def read_materi_pembelajaran_filter_by(db:Session, **kwargs):
             elif key == "mapel":
                 query = query.filter(models.Materi.mapel == value)
     
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
-
-        query = query.limit(limit)
-
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_MATERI)
     return query.all()
 
+def materi_ada(db: Session, id_materi: int) -> bool:
+    return db.execute(select(models.Materi.id).where(models.Materi.id == id_materi)).first() is not None
+
 
 
 def update_materi_pembelajaran_by_id(db: Session, id: int, mapel:Union[str,int], nama_materi: str):
@@ -279,6 +356,7 @@ def create_video_pembelajaran(db:Session, creator: int, judul: str, materi: int,
     s3.upload_fileobj(file.file,"swift-video-pembelajaran", db_video.s3_key)
     file.file.close()
 
+    db.execute(ubah_penghitung_stmt(models.Materi, "jumlah_video", materi))
     db.add(db_video)
     db.commit()
     db.refresh(db_video)
@@ -286,6 +364,21 @@ def create_video_pembelajaran(db:Session, creator: int, judul: str, materi: int,
 def read_video_pembelajaran_metadata_by_id(db: Session, id : int):
     return db.query(models.VideoPembelajaran).filter_by(id = id).one()
 
+def read_pemilik_video_by_id(db: Session, id: int):
+    """
+    Row (id, creator_id, id_tugas) untuk pengecekan pemilik video dan tugasnya,
+    tanpa membuat objek ORM. NoResultFound jika video tidak ada.
+    """
+    video = models.VideoPembelajaran
+    return db.execute(select(video.id, video.creator_id, video.id_tugas).where(video.id == id)).one()
+
+def read_pembuat_tugas_by_id(db: Session, id_tugas: int):
+    """
+    creator_id video yang memuat tugas ini, None jika tugas tidak punya video.
+    """
+    video = models.VideoPembelajaran
+    return db.execute(select(video.creator_id).where(video.id_tugas == id_tugas)).scalar()
+
 def read_video_pembelajaran_download_url_by_id(db: Session, id: int):
     db_video = db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id == id).one()
 
@@ -297,10 +390,16 @@ def read_video_pembelajaran_download_url_by_id(db: Session, id: int):
 
 def update_video_pembelajaran_metadata_by_id(db:Session, video_id:int, id_materi:int, judul_video:str):
     db_video = db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id == video_id).one()
+    if db_video.id_materi != id_materi:
+        db.execute(ubah_penghitung_stmt(models.Materi, "jumlah_video", db_video.id_materi, -1))
+        db.execute(ubah_penghitung_stmt(models.Materi, "jumlah_video", id_materi))
     db_video.id_materi = id_materi
     db_video.judul = judul_video
     db.commit()
     db.refresh(db_video)
+    if db_video.id_tugas is not None:
+        # mapel tugas ikut berubah bersama materi video
+        cache.hapus_tugas(db_video.id_tugas)
     return "ok"
 
 def delete_video_pembelajaran_by_id(db:Session, video_id: int):
@@ -308,8 +407,12 @@ def delete_video_pembelajaran_by_id(db:Session, video_id: int):
     .filter(models.VideoPembelajaran.id == video_id).one()
 
     s3.delete_object(Bucket='swift-video-pembelajaran', key=db_video.s3_key)
-    db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id == video_id).delete()
+    if db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id == video_id).delete():
+        db.execute(ubah_penghitung_stmt(models.Materi, "jumlah_video", db_video.id_materi, -1))
     db.commit()
+    if db_video.id_tugas is not None:
+        # tugas tanpa video tidak bisa dikumpulkan lagi
+        cache.hapus_tugas(db_video.id_tugas)
     return "ok"
 
 def create_tugas_pembelajaran(db:Session, judul, attempt:int, id_video:int):
@@ -336,11 +439,19 @@ def create_soal_abc(db:Session, pertanyaan, id_tugas):
         type="pilihan_ganda",
         id_tugas=id_tugas
     )
+    db.execute(ubah_penghitung_stmt(models.TugasPembelajaran, "jumlah_soal", id_tugas))
     db.add(db_soal)
     db.commit()
     db.refresh(db_soal)
+    cache.hapus_tugas(id_tugas)
     return db_soal
 
+def _hapus_cache_soal(db:Session, id_soal):
+    # hanya cache tugas pemilik soal ini, bukan seluruh cache
+    id_tugas = db.scalar(select(models.Soal.id_tugas).where(models.Soal.id == id_soal))
+    if id_tugas is not None:
+        cache.hapus_tugas(id_tugas)
+
 def create_jawaban_abc(db:Session, id_soal, jawaban):
     db_jawaban = models.JawabanABC(
         id_soal=id_soal,
@@ -349,6 +460,7 @@ def create_jawaban_abc(db:Session, id_soal, jawaban):
     db.add(db_jawaban)
     db.commit()
     db.refresh(db_jawaban)
+    _hapus_cache_soal(db, id_soal)
     return db_jawaban
 
 def update_soal_abc_add_kunci_by_ids(db:Session, id_soal, id_kunci):
@@ -357,6 +469,7 @@ def update_soal_abc_add_kunci_by_ids(db:Session, id_soal, id_kunci):
 
     db.commit()
     db.refresh(soal)
+    cache.hapus_tugas(soal.id_tugas)
     return soal
 
 def create_soal_benar_salah(db:Session, pertanyaan, id_tugas, pernyataan_true, pernyataan_false):
@@ -367,9 +480,11 @@ def create_soal_benar_salah(db:Session, pertanyaan, id_tugas, pernyataan_true, p
         benar=pernyataan_true,
         salah=pernyataan_false
     )
+    db.execute(ubah_penghitung_stmt(models.TugasPembelajaran, "jumlah_soal", id_tugas))
     db.add(db_soal)
     db.commit()
     db.refresh(db_soal)
+    cache.hapus_tugas(id_tugas)
     return db_soal
 
 def create_jawaban_benar_salah(db:Session, id_soal, jawaban, pernyataan_yg_benar):
@@ -382,6 +497,7 @@ def create_jawaban_benar_salah(db:Session, id_soal, jawaban, pernyataan_yg_benar
     db.add(db_jawaban)
     db.commit()
     db.refresh(db_jawaban)
+    _hapus_cache_soal(db, id_soal)
     # print("selesai membuat jawaban benar salah")
     return db_jawaban
 
@@ -392,9 +508,11 @@ def create_soal_multi_pilih(db:Session, pertanyaan, id_tugas):
         type="multi_pilih",
         id_tugas=id_tugas
     )
+    db.execute(ubah_penghitung_stmt(models.TugasPembelajaran, "jumlah_soal", id_tugas))
     db.add(db_soal)
     db.commit()
     db.refresh(db_soal)
+    cache.hapus_tugas(id_tugas)
     return db_soal
 
 def create_jawaban_multi_pilih(db:Session, id_soal, jawaban, benar):
@@ -407,68 +525,290 @@ def create_jawaban_multi_pilih(db:Session, id_soal, jawaban, benar):
     db.add(db_jawaban)
     db.commit()
     db.refresh(db_jawaban)
+    _hapus_cache_soal(db, id_soal)
     return db_jawaban
 
 
+def _insert_dengan_id(db:Session, model, rows):
+    """
+    Insert baris ke tabel model dan mengembalikan id-nya sesuai urutan rows.
+    Dengan INSERT ... RETURNING (SQLite, MariaDB) semua baris masuk dalam satu
+    statement; sort_by_parameter_order memakai kolom sentinel model untuk
+    mengembalikan id sesuai urutan rows.
+    Tanpa RETURNING (MySQL) id hanya bisa didapat per baris.
+    """
+    if not rows:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        statement = insert(model.__table__).returning(model.id, sort_by_parameter_order=True)
+        return list(db.execute(statement, rows).scalars())
+    return [db.execute(insert(model.__table__).values(**row)).inserted_primary_key[0] for row in rows]
+
+def _insert_soal(db:Session, rows):
+    return _insert_dengan_id(db, models.Soal, rows)
+
+def create_tugas_pembelajaran_lengkap(db:Session, judul, attempt:int, id_video:int,
+                                      daftar_soal:List[Union[schema.SoalABCKunci, schema.SoalBenarSalah, schema.SoalMultiPilih]]):
+    """
+    Membuat tugas beserta semua soal dan jawabannya dalam satu transaksi.
+    Setiap tabel di-insert dengan satu executemany, jadi jumlah statement tidak
+    bergantung pada jumlah soal (kecuali tabel soal di MySQL, lihat _insert_soal).
+    Jika gagal tidak ada sisa tugas setengah jadi.
+    Mengembalikan (tugas, daftar id soal sesuai urutan daftar_soal).
+    """
+    db.rollback()
+    # soal tanpa kunci (SoalABC biasa) dilewati, sama seperti sebelumnya
+    daftar_soal = [soal for soal in daftar_soal
+                   if isinstance(soal, (schema.SoalABCKunci, schema.SoalBenarSalah, schema.SoalMultiPilih))]
+    try:
+        db_tugas = models.TugasPembelajaran(judul=judul, attempt_allowed=attempt, jumlah_soal=len(daftar_soal))
+        db.add(db_tugas)
+        db.flush()
+
+        # video hanya boleh punya satu tugas; dicek dan di-update sekaligus
+        hasil = db.execute(
+            update(models.VideoPembelajaran)
+            .where(models.VideoPembelajaran.id == id_video, models.VideoPembelajaran.id_tugas.is_(None))
+            .values(id_tugas=db_tugas.id)
+            .execution_options(synchronize_session=False)
+        )
+        if hasil.rowcount != 1:
+            raise NoResultFound("Video tidak ditemukan atau sudah memiliki tugas")
+
+        soal_ids = _insert_soal(db, [
+            {"pertanyaan": soal.pertanyaan, "id_tugas": db_tugas.id, "type":
+                "pilihan_ganda" if isinstance(soal, schema.SoalABCKunci) else
+                "benar_salah" if isinstance(soal, schema.SoalBenarSalah) else "multi_pilih"}
+            for soal in daftar_soal
+        ])
+
+        soal_abc, soal_benar_salah, soal_multi_pilih = [], [], []
+        jawaban_abc, jawaban_benar_salah, jawaban_multi_pilih = [], [], []
+        for soal, id_soal in zip(daftar_soal, soal_ids):
+            if isinstance(soal, schema.SoalABCKunci):
+                soal_abc.append({"id_soal": id_soal, "kunci": soal.index_jawaban_benar})
+                jawaban_abc += [{"id_soal": id_soal, "jawaban": jawaban} for jawaban in soal.pilihan_jawaban]
+            elif isinstance(soal, schema.SoalBenarSalah):
+                soal_benar_salah.append({"id_soal": id_soal, "benar": soal.pernyataan_pada_benar,
+                                         "salah": soal.pernyataan_pada_salah})
+                jawaban_benar_salah += [
+                    {"id_soal": id_soal, "jawaban": jawaban.isi_jawaban, "kunci": jawaban.jawaban_pernyataan_yang_benar}
+                    for jawaban in soal.daftar_jawaban if isinstance(jawaban, schema.JawabanBenarSalahKunci)
+                ]
+            else:
+                soal_multi_pilih.append({"id_soal": id_soal})
+                jawaban_multi_pilih += [
+                    {"id_soal": id_soal, "jawaban": jawaban.isi_jawaban, "benar": jawaban.jawaban_ini_benar}
+                    for jawaban in soal.pilihan if isinstance(jawaban, schema.JawabanMultiPilihKunci)
+                ]
+
+        for model, rows in ((models.SoalABC, soal_abc),
+                            (models.SoalBenarSalah, soal_benar_salah),
+                            (models.SoalMultiPilih, soal_multi_pilih),
+                            (models.JawabanABC, jawaban_abc),
+                            (models.JawabanBenarSalah, jawaban_benar_salah),
+                            (models.JawabanMultiPilih, jawaban_multi_pilih)):
+            if rows:
+                db.execute(insert(model.__table__), rows)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.refresh(db_tugas)
+    cache.hapus_tugas(db_tugas.id)
+    return db_tugas, soal_ids
+
 def update_video_pembelajaran_remove_tugas(db:Session, id_video:int):
     db_video = db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id == id_video).one()
+    id_tugas = db_video.id_tugas
     db_video.id_tugas = None
     db.commit()
-
-def delete_attemp_pengerjaan_tugas_by_id_tugas(db:Session, id_tugas:int):
-    row = db.query(models.AttemptMengerjakanTugas).filter(models.AttemptMengerjakanTugas.id_tugas == id_tugas).delete()
-    db.commit()
-    return row
+    if id_tugas is not None:
+        cache.hapus_tugas(id_tugas)
+
+def _hapus_attempt_tugas(db:Session, id_tugas:int):
+    """
+    Menghapus rekap, jawaban per soal dan attempt tugas ini
+    (tanpa commit). Urutannya sama dengan penulisan attempt: rekap lebih dulu.
+    """
+    db.execute(delete(models.RekapAttemptTugas).where(models.RekapAttemptTugas.id_tugas == id_tugas))
+    analisis_soal.hapus_tugas(db, id_tugas)
+    return db.query(models.AttemptMengerjakanTugas).filter(models.AttemptMengerjakanTugas.id_tugas == id_tugas).delete()
 
 def delete_tugas_pembelajaran_by_id(db: Session, tugas_pembelajaran_id: int):
-    # Get the TugasPembelajaran object
-    tugas_pembelajaran:models.TugasPembelajaran = db.query(models.TugasPembelajaran).get(tugas_pembelajaran_id)
-
-    if tugas_pembelajaran:
-        # Delete the associated Soal objects and their answers
-        for soal in tugas_pembelajaran.soal:
-            if isinstance(soal, models.SoalABC):
-                for jawaban in soal.pilihan:
-                    db.delete(jawaban)
-                db.delete(soal)
-            elif isinstance(soal, models.SoalBenarSalah):
-                for jawaban in soal.pilihan:
-                    db.delete(jawaban)
-                db.delete(soal)
-            elif isinstance(soal, models.SoalMultiPilih):
-                for jawaban in soal.pilihan:
-                    db.delete(jawaban)
-                db.delete(soal)
-        update_video_pembelajaran_remove_tugas(db, tugas_pembelajaran.video.id)
-        db.delete(tugas_pembelajaran)
+    """
+    Menghapus tugas beserta semua soal, pilihan jawaban, attempt, rekap
+    dan job regrade-nya dalam satu transaksi. Setiap tabel dihapus
+    dengan satu DELETE ... WHERE id_soal IN (subquery), jadi jumlah query
+    tetap berapapun jumlah soal dan attempt-nya.
+    """
+    soal_tugas = select(models.Soal.id).where(models.Soal.id_tugas == tugas_pembelajaran_id)
+    try:
+        _hapus_attempt_tugas(db, tugas_pembelajaran_id)
+        db.execute(delete(models.RegradeTugas).where(models.RegradeTugas.id_tugas == tugas_pembelajaran_id))
+        for model in (models.JawabanABC, models.JawabanBenarSalah, models.JawabanMultiPilih,
+                      models.SoalABC, models.SoalBenarSalah, models.SoalMultiPilih):
+            db.execute(delete(model.__table__).where(model.__table__.c.id_soal.in_(soal_tugas)))
+        db.execute(delete(models.Soal.__table__).where(models.Soal.id_tugas == tugas_pembelajaran_id))
+        db.execute(update(models.VideoPembelajaran).where(models.VideoPembelajaran.id_tugas == tugas_pembelajaran_id)
+                   .values(id_tugas=None))
+        terhapus = db.execute(delete(models.TugasPembelajaran)
+                              .where(models.TugasPembelajaran.id == tugas_pembelajaran_id)).rowcount
         db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
-        return True
-
-    return False
+    if not terhapus:
+        return False
+    cache.hapus_tugas(tugas_pembelajaran_id)
+    leaderboard.hapus_tugas(tugas_pembelajaran_id)
+    return True
 
 
 def read_tugas_pembelajaran_by_id(db:Session, id_tugas):
     return db.query(models.TugasPembelajaran).filter(models.TugasPembelajaran.id == id_tugas).one()
 
+def read_tugas_pembelajaran_lengkap_by_id(db:Session, id_tugas):
+    """
+    Membaca tugas beserta video (dan materinya), semua soal (polymorphic) dan pilihan
+    jawabannya dengan jumlah query tetap: tugas+video, soal, lalu satu query per tabel jawaban.
+    Soal dan pilihan terurut menurut id (urutan pembuatan).
+    """
+    soal = with_polymorphic(models.Soal, [models.SoalABC, models.SoalBenarSalah, models.SoalMultiPilih])
+    return db.query(models.TugasPembelajaran)\
+        .options(
+            joinedload(models.TugasPembelajaran.video).joinedload(models.VideoPembelajaran.materi),
+            selectinload(models.TugasPembelajaran.soal.of_type(soal)).options(
+                selectinload(soal.SoalABC.pilihan),
+                selectinload(soal.SoalBenarSalah.pilihan),
+                selectinload(soal.SoalMultiPilih.pilihan),
+            )
+        )\
+        .filter(models.TugasPembelajaran.id == id_tugas).one()
+
 def read_attempt_mengerjakan_tugas(db:Session, id_tugas, id_pelajar):
     return db.query(models.AttemptMengerjakanTugas)\
            .filter(models.AttemptMengerjakanTugas.id_pelajar == id_pelajar, \
                    models.AttemptMengerjakanTugas.id_tugas == id_tugas).all()
 
-def create_new_attempt_mengerjakan_tugas(db:Session, id_pelajar, id_tugas, nilai, start, stop):
+def _filter_rekap_attempt(id_pelajar, id_tugas):
+    return (models.RekapAttemptTugas.id_pelajar == id_pelajar, models.RekapAttemptTugas.id_tugas == id_tugas)
+
+def update_rekap_attempt_stmt(id_pelajar, id_tugas, daftar_nilai=()):
+    """
+    Menambahkan attempt dengan daftar_nilai (nilai yang disimpan) ke rekap.
+    daftar_nilai kosong hanya mengunci baris rekap: UPDATE mengunci baris
+    sampai transaksi selesai.
+    """
+    rekap = models.RekapAttemptTugas
+    values = {"jumlah_attempt": rekap.jumlah_attempt + len(daftar_nilai)}
+    if daftar_nilai:
+        terbaik = max(daftar_nilai)
+        values.update(
+            nilai_terbaik=case((or_(rekap.nilai_terbaik.is_(None), rekap.nilai_terbaik < terbaik), terbaik),
+                               else_=rekap.nilai_terbaik),
+            nilai_terakhir=daftar_nilai[-1],
+            total_nilai=rekap.total_nilai + sum(daftar_nilai),
+        )
+    return update(rekap).where(*_filter_rekap_attempt(id_pelajar, id_tugas)).values(**values)
+
+def buat_rekap_attempt_stmt(id_pelajar, id_tugas, daftar_nilai=()):
+    # baris rekap pertama dihitung dari attempt yang sudah ada (data sebelum ada rekap)
+    attempt = models.AttemptMengerjakanTugas
+    filter_attempt = (attempt.id_pelajar == id_pelajar, attempt.id_tugas == id_tugas)
+    terbaik = func.max(attempt.nilai)
+    terakhir = select(attempt.nilai).where(*filter_attempt).order_by(attempt.id.desc()).limit(1).scalar_subquery()
+    if daftar_nilai:
+        terbaik = case((terbaik > max(daftar_nilai), terbaik), else_=max(daftar_nilai))
+        terakhir = literal(daftar_nilai[-1])
+    rekap = select(literal(id_pelajar), literal(id_tugas), func.count() + len(daftar_nilai),
+                   terbaik, terakhir, func.coalesce(func.sum(attempt.nilai), 0) + sum(daftar_nilai))\
+        .select_from(attempt).where(*filter_attempt)
+    return insert(models.RekapAttemptTugas).from_select(
+        ["id_pelajar", "id_tugas", "jumlah_attempt", "nilai_terbaik", "nilai_terakhir", "total_nilai"], rekap)
+
+def hitung_ulang_rekap_attempt_stmt(*where):
+    """
+    Mengisi ulang kolom rekap (yang cocok dengan where) dari mengerjakan_tugas.
+    """
+    rekap = models.RekapAttemptTugas
+    attempt = models.AttemptMengerjakanTugas
+    milik_rekap = (attempt.id_pelajar == rekap.id_pelajar, attempt.id_tugas == rekap.id_tugas)
+    return update(rekap).where(*where).values(
+        jumlah_attempt=select(func.count()).where(*milik_rekap).scalar_subquery(),
+        nilai_terbaik=select(func.max(attempt.nilai)).where(*milik_rekap).scalar_subquery(),
+        nilai_terakhir=select(attempt.nilai).where(*milik_rekap).order_by(attempt.id.desc()).limit(1).scalar_subquery(),
+        total_nilai=select(func.coalesce(func.sum(attempt.nilai), 0)).where(*milik_rekap).scalar_subquery(),
+    )
+
+def jumlah_attempt_stmt(id_pelajar, id_tugas):
+    return select(models.RekapAttemptTugas.jumlah_attempt).where(*_filter_rekap_attempt(id_pelajar, id_tugas))
+
+def tambah_rekap_attempt(db:Session, id_pelajar, id_tugas, daftar_nilai=()) -> int:
+    """
+    Memperbarui rekap di transaksi db (belum di-commit) dan mengembalikan
+    jumlah attempt yang baru. IntegrityError/OperationalError jika baris rekap
+    dibuat bersamaan oleh transaksi lain; pemanggil yang mengulang.
+    """
+    if db.execute(update_rekap_attempt_stmt(id_pelajar, id_tugas, daftar_nilai)).rowcount == 0:
+        db.execute(buat_rekap_attempt_stmt(id_pelajar, id_tugas, daftar_nilai))
+    return db.execute(jumlah_attempt_stmt(id_pelajar, id_tugas)).scalar_one()
+
+def skala_nilai(nilai):
+    # nilai dari penilaian (0..1) disimpan dalam skala 0..10
     if(nilai//10 == 0):
         nilai = nilai * 10
-    
-    db_attemp = models.AttemptMengerjakanTugas(
+    return nilai
+
+def buat_attempt_mengerjakan_tugas(id_pelajar, id_tugas, nilai, start, stop) -> models.AttemptMengerjakanTugas:
+    return models.AttemptMengerjakanTugas(
         id_pelajar = id_pelajar,
         id_tugas = id_tugas,
-        nilai = nilai,
+        nilai = skala_nilai(nilai),
         waktu_mulai=start,
         waktu_selesai=stop
     )
-    db.add(db_attemp)
-    db.commit()
+
+def insert_attempt_mengerjakan_tugas_batch(db:Session, rows) -> List[dict]:
+    """
+    Insert banyak attempt sekaligus (tanpa commit). rows: dict id_pelajar,
+    id_tugas, nilai, waktu_mulai, waktu_selesai. Mengembalikan rows dengan id
+    dan nilai yang disimpan.
+    """
+    rows = [{**row, "nilai": skala_nilai(row["nilai"])} for row in rows]
+    ids = _insert_dengan_id(db, models.AttemptMengerjakanTugas, rows)
+    return [{"id": id, **row} for id, row in zip(ids, rows)]
+
+def create_new_attempt_mengerjakan_tugas(db:Session, id_pelajar, id_tugas, nilai, start, stop, attempt_allowed=None,
+                                         kunci=None, per_soal=None):
+    """
+    attempt_allowed: jika diisi, BatasAttemptTercapai di-raise (tanpa menyimpan
+    apapun) saat pelajar sudah mencapai batas attempt tugas ini.
+    kunci, per_soal: jika diisi, jawaban per soal (grading.nilai_per_soal)
+    ikut disimpan.
+    """
+    db_attemp = buat_attempt_mengerjakan_tugas(id_pelajar, id_tugas, nilai, start, stop)
+    # baris rekap yang dibuat bersamaan oleh transaksi lain: rollback lalu ulang sekali
+    for percobaan in range(2):
+        try:
+            jumlah = tambah_rekap_attempt(db, id_pelajar, id_tugas, [db_attemp.nilai])
+            if attempt_allowed is not None and jumlah > attempt_allowed:
+                db.rollback()
+                raise BatasAttemptTercapai("Max attempt reached")
+
+            db.add(db_attemp)
+            if per_soal is not None:
+                db.flush()
+                analisis_soal.catat_jawaban(db, kunci, [(db_attemp.id, per_soal)])
+            db.commit()
+            break
+        except (IntegrityError, OperationalError):
+            db.rollback()
+            if percobaan:
+                raise
     db.refresh(db_attemp)
     return db_attemp
 
@@ -478,6 +818,7 @@ def read_nilai_tugas_filter_by(db:Session, **kwargs):
     id_tugas = kwargs.get('id_tugas', None)
     limit = kwargs.get('limit', None) 
     page = kwargs.get('page', None) 
+    cursor = kwargs.get('cursor', None)
 
     query = db.query(models.AttemptMengerjakanTugas)
 
@@ -486,18 +827,56 @@ def read_nilai_tugas_filter_by(db:Session, **kwargs):
     if id_tugas:
         query = query.filter(models.AttemptMengerjakanTugas.id_tugas == id_tugas)
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
-        query = query.limit(limit)
-
-    return  query.all()
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_ATTEMPT)
+    return query.all()
     
 
+def read_rekap_nilai_filter_by(db:Session, **kwargs):
+    """
+    Rekap nilai per (pelajar, tugas) dari tabel rekap_attempt_tugas,
+    tanpa membaca riwayat attempt.
+    """
+    id_pelajar = kwargs.get('id_pelajar', None)
+    id_tugas = kwargs.get('id_tugas', None)
+    limit = kwargs.get('limit', None)
+    page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
+
+    query = db.query(models.RekapAttemptTugas).filter(models.RekapAttemptTugas.jumlah_attempt > 0)
+
+    if id_pelajar:
+        query = query.filter(models.RekapAttemptTugas.id_pelajar == id_pelajar)
+    if id_tugas:
+        query = query.filter(models.RekapAttemptTugas.id_tugas == id_tugas)
+
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_REKAP)
+    return query.all()
+
+def read_rekap_nilai_per_mapel(db:Session, id_pelajar:int):
+    """
+    Rata-rata nilai pelajar per mapel, dihitung dari baris rekap (satu baris
+    per tugas yang pernah dikerjakan). Tugas tanpa video/materi tidak dihitung.
+    """
+    rekap = models.RekapAttemptTugas
+    return db.query(
+            models.Materi.mapel,
+            func.count().label("jumlah_tugas"),
+            func.sum(rekap.jumlah_attempt).label("jumlah_attempt"),
+            (func.sum(rekap.total_nilai) / func.sum(rekap.jumlah_attempt)).label("rata_rata"),
+            func.avg(rekap.nilai_terbaik).label("rata_rata_terbaik"),
+        )\
+        .select_from(rekap)\
+        .join(models.VideoPembelajaran, models.VideoPembelajaran.id_tugas == rekap.id_tugas)\
+        .join(models.Materi, models.Materi.id == models.VideoPembelajaran.id_materi)\
+        .filter(rekap.id_pelajar == id_pelajar, rekap.jumlah_attempt > 0)\
+        .group_by(models.Materi.mapel)\
+        .order_by(models.Materi.mapel)\
+        .all()
+
 def read_all_video_pembelajaran(db: Session, **kwargs):
     limit = kwargs.get('limit', None)
     page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
     query = db.query(models.VideoPembelajaran).options(joinedload(models.VideoPembelajaran.materi))
 
@@ -513,19 +892,14 @@ def read_all_video_pembelajaran(db: Session, **kwargs):
             elif key == 'id_tugas':
                 query = query.filter(models.VideoPembelajaran.id_tugas == value)
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
-
-        query = query.limit(limit)
-
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_VIDEO)
     return query.all()
 
 
 def read_tugas_pembelajaran_filter_by(db:Session, newest: bool= True, **kwargs):
     limit = kwargs.get('limit', None)
     page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
     query = db.query(models.TugasPembelajaran).options(joinedload(models.TugasPembelajaran.video))
 
@@ -560,21 +934,10 @@ def read_tugas_pembelajaran_filter_by(db:Session, newest: bool= True, **kwargs):
     else:
         query = query.order_by(models.TugasPembelajaran.time_created.asc())
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
-
-        query = query.limit(limit)
-
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_TUGAS, turun=newest)
     return query.all()
 
-def read_user_pelajar_filter_by(db:Session, **kwargs):
-    limit = kwargs.get('limit', None)
-    page = kwargs.get('page', None)
-
-    query = db.query(models.Pelajar)
-
+def _filter_pelajar(query, kwargs):
     # Filter conditions based on provided parameters
     for key, value in kwargs.items():
         if value is not None:
@@ -594,23 +957,28 @@ def read_user_pelajar_filter_by(db:Session, **kwargs):
                 query = query.filter(models.Pelajar.jurusan == value)
             elif key == 'is_member':
                 query = query.filter(models.Pelajar.is_member == value)
-            
+    return query
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
+def read_user_pelajar_filter_by(db:Session, **kwargs):
+    limit = kwargs.get('limit', None)
+    page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
-        query = query.limit(limit)
+    query = _filter_pelajar(db.query(models.Pelajar), kwargs)
 
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_PELAJAR)
     return query.all()
 
-def read_user_mentor_filter_by(db: Session, **kwargs) -> List[models.Mentor]:
-    limit = kwargs.get('limit', None)
-    page = kwargs.get('page', None)
-
-    query = db.query(models.Mentor)
+def read_ringkas_pelajar_filter_by(db: Session, **kwargs):
+    """
+    Sama seperti read_user_pelajar_filter_by, tetapi hanya kolom schema.Pelajar
+    yang dibaca dan hasilnya berupa Row (lihat respon_json.py).
+    """
+    query = _filter_pelajar(select(*KOLOM_PELAJAR), kwargs)
+    query = pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'), KUNCI_PELAJAR)
+    return db.execute(query).all()
 
+def _filter_mentor(query, kwargs):
     # Filter conditions based on provided parameters
     for key, value in kwargs.items():
         if value is not None:
@@ -628,22 +996,28 @@ def read_user_mentor_filter_by(db: Session, **kwargs) -> List[models.Mentor]:
                 query = query.filter(models.Mentor.keahlian == value)
             elif key == 'asal':
                 query = query.filter(models.Mentor.Asal == value)
+    return query
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
+def read_user_mentor_filter_by(db: Session, **kwargs) -> List[models.Mentor]:
+    limit = kwargs.get('limit', None)
+    page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
-        query = query.limit(limit)
+    query = _filter_mentor(db.query(models.Mentor), kwargs)
 
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_MENTOR)
     return query.all()
 
-def read_admin_filter_by(db: Session, **kwargs) -> List[models.Admin]:
-    limit = kwargs.get('limit', None)
-    page = kwargs.get('page', None)
-
-    query = db.query(models.Admin)
+def read_ringkas_mentor_filter_by(db: Session, **kwargs):
+    """
+    Sama seperti read_user_mentor_filter_by, tetapi hanya kolom schema.Mentor
+    sebagai Row.
+    """
+    query = _filter_mentor(select(*KOLOM_MENTOR), kwargs)
+    query = pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'), KUNCI_MENTOR)
+    return db.execute(query).all()
 
+def _filter_admin(query, kwargs):
     # Filter conditions based on provided parameters
     for key, value in kwargs.items():
         if value is not None:
@@ -657,13 +1031,24 @@ def read_admin_filter_by(db: Session, **kwargs) -> List[models.Admin]:
                 query = query.filter(models.Admin.time_updated == value)
             elif key == 'created_by':
                 query = query.filter(models.Admin.created_by == value)
+    return query
 
-    if limit is not None:
-        if page is not None:
-            offset = (page - 1) * limit
-            query = query.offset(offset)
+def read_admin_filter_by(db: Session, **kwargs) -> List[models.Admin]:
+    limit = kwargs.get('limit', None)
+    page = kwargs.get('page', None)
+    cursor = kwargs.get('cursor', None)
 
-        query = query.limit(limit)
+    query = _filter_admin(db.query(models.Admin), kwargs)
 
+    query = pagination.paginate(query, limit, page, cursor, KUNCI_ADMIN)
     return query.all()
 
+def read_ringkas_admin_filter_by(db: Session, **kwargs):
+    """
+    Sama seperti read_admin_filter_by, tetapi hanya kolom schema.AdminData
+    (tanpa hashed_password) sebagai Row.
+    """
+    query = _filter_admin(select(*KOLOM_ADMIN), kwargs)
+    query = pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'), KUNCI_ADMIN)
+    return db.execute(query).all()
+
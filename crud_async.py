@@ -0,0 +1,131 @@
+"""
+Versi async dari fungsi baca crud.py untuk endpoint list yang dilayani
+dengan AsyncSession. Hanya kolom yang dipakai response model yang di-select
+(Row, bukan objek ORM) karena lazy load tidak bisa dilakukan pada AsyncSession.
+Penulisan data tetap lewat crud.py agar hanya ada satu implementasinya.
+"""
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import pagination
+from crud import KUNCI_MATERI, KUNCI_VIDEO, KUNCI_TUGAS, KOLOM_MATERI, KOLOM_VIDEO_METADATA, KOLOM_VIDEO, KOLOM_TUGAS
+
+
+def _filter_materi(query, kwargs):
+    for key, value in kwargs.items():
+        if value is not None:
+            if key == "id_materi":
+                query = query.filter(models.Materi.id == value)
+            elif key == "id_mapel":
+                query = query.filter(models.Materi.mapel == models.DaftarMapelSkolastik(value))
+            elif key == "nama_mapel":
+                query = query.filter(models.Materi.mapel == models.DaftarMapelSkolastik[value])
+            elif key == "mapel":
+                query = query.filter(models.Materi.mapel == value)
+    return query
+
+async def read_ringkas_materi_pembelajaran_filter_by(db: AsyncSession, preview_video: int = 0, **kwargs):
+    """
+    Materi (dengan penghitung jumlah_video) sebagai Row, dan paling banyak
+    preview_video video terbaru per materi: {id_materi: [Row video]}.
+    Preview dibatasi di SQL dengan ROW_NUMBER() per materi sehingga ukuran
+    response tidak bertambah dengan jumlah video yang diunggah.
+    """
+    video = models.VideoPembelajaran
+    query = select(*KOLOM_MATERI)
+    query = _filter_materi(query, kwargs)
+
+    result = await db.execute(pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'),
+                                                  KUNCI_MATERI))
+    daftar_materi = result.all()
+
+    preview = {}
+    id_materi = [materi.id for materi in daftar_materi if materi.jumlah_video]
+    if preview_video > 0 and id_materi:
+        urutan = func.row_number().over(partition_by=video.id_materi, order_by=video.id.desc()).label("urutan")
+        terbaru = select(*KOLOM_VIDEO_METADATA, urutan).where(video.id_materi.in_(id_materi)).subquery()
+        result = await db.execute(
+            select(*[terbaru.c[column.key] for column in KOLOM_VIDEO_METADATA])
+            .where(terbaru.c.urutan <= preview_video)
+            .order_by(terbaru.c.id_materi, terbaru.c.urutan))
+        for row in result:
+            preview.setdefault(row.id_materi, []).append(row)
+    return daftar_materi, preview
+
+async def read_ringkas_video_by_materi(db: AsyncSession, id_materi: int, limit=None, page=None, cursor=None):
+    """
+    Daftar lengkap video satu materi sebagai Row, dengan pagination.
+    """
+    query = select(*KOLOM_VIDEO_METADATA).where(models.VideoPembelajaran.id_materi == id_materi)
+    result = await db.execute(pagination.paginate(query, limit, page, cursor, KUNCI_VIDEO))
+    return result.all()
+
+def _filter_video(query, kwargs):
+    for key, value in kwargs.items():
+        if value is not None:
+            if key == 'id_mentor':
+                query = query.filter(models.VideoPembelajaran.creator_id == value)
+            elif key == 'judul':
+                query = query.filter(models.VideoPembelajaran.judul.ilike(f"%{value}%"))
+            elif key == 'id_materi':
+                query = query.filter(models.VideoPembelajaran.id_materi == value)
+            elif key == 'id_tugas':
+                query = query.filter(models.VideoPembelajaran.id_tugas == value)
+    return query
+
+async def read_ringkas_video_pembelajaran(db: AsyncSession, **kwargs):
+    """
+    Video beserta materinya, hanya kolom schema.VideoDenganMateri sebagai Row
+    (lihat respon_json.py).
+    """
+    query = select(*KOLOM_VIDEO).outerjoin(models.Materi, models.Materi.id == models.VideoPembelajaran.id_materi)
+    query = _filter_video(query, kwargs)
+
+    result = await db.execute(pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'), KUNCI_VIDEO))
+    return result.all()
+
+
+def _filter_tugas(query, newest, kwargs):
+    for key, value in kwargs.items():
+        if value is not None:
+            if key == 'id_tugas':
+                query = query.filter(models.TugasPembelajaran.id == value)
+            elif key == 'judul':
+                query = query.filter(models.TugasPembelajaran.judul.ilike(f"%{value}%"))
+            elif key == 'id_video':
+                query = query.filter(models.TugasPembelajaran.video.has(models.VideoPembelajaran.id == value))
+            elif key == 'mapel':
+                query = query.filter(models.TugasPembelajaran.video.has(
+                    models.VideoPembelajaran.materi.has(
+                        models.Materi.mapel == models.DaftarMapelSkolastik[value]
+                    )
+                ))
+            elif key == 'id_materi':
+                query = query.filter(models.TugasPembelajaran.video.has(
+                    models.VideoPembelajaran.materi.has(
+                        models.Materi.id == value
+                    )
+                ))
+            elif key == 'id_mentor':
+                query = query.filter(models.TugasPembelajaran.video.has(
+                    models.VideoPembelajaran.creator_id == value
+                ))
+
+    if newest:
+        query = query.order_by(models.TugasPembelajaran.time_created.desc())
+    else:
+        query = query.order_by(models.TugasPembelajaran.time_created.asc())
+    return query
+
+async def read_ringkas_tugas_pembelajaran_filter_by(db: AsyncSession, newest: bool = True, **kwargs):
+    """
+    Tugas beserta videonya, hanya kolom schema.TugasDenganVideo sebagai Row.
+    """
+    query = select(*KOLOM_TUGAS)\
+        .outerjoin(models.VideoPembelajaran, models.VideoPembelajaran.id_tugas == models.TugasPembelajaran.id)
+    query = _filter_tugas(query, newest, kwargs)
+
+    result = await db.execute(pagination.paginate(query, kwargs.get('limit'), kwargs.get('page'), kwargs.get('cursor'),
+                                                  KUNCI_TUGAS, turun=newest))
+    return result.all()
@@ -1,32 +1,218 @@
-from sqlalchemy import create_engine
-from sqlalchemy_utils import database_exists, create_database
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select
 from dotenv import load_dotenv
 import os
-import boto3
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# driver async pengganti untuk tiap backend
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+def get_engine_options(url):
+    """
+    Profil engine dari environment variable.
+    Pengaturan pool hanya berlaku untuk server database (bukan SQLite).
+    pool_recycle dibuat lebih kecil dari wait_timeout MySQL agar koneksi
+    idle yang sudah diputus server tidak dipakai lagi.
+    """
+    options = {
+        "echo": False,
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 280)),
+        )
+    return options
+
+def get_echo_sample_rate():
+    return min(max(float(os.getenv("DB_ECHO_SAMPLE_RATE", 0)), 0.0), 1.0)
+
+def pasang_echo_sampling(engine, rate):
+    """
+    Pengganti echo=True: hanya sebagian statement (sesuai rate) yang di-log.
+    Seperti echo=True, logger "database" dinaikkan ke INFO dan diberi handler
+    ke stderr agar log muncul tanpa konfigurasi logging tambahan.
+    """
+    if rate <= 0:
+        return
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _log_statement(conn, cursor, statement, parameters, context, executemany):
+        if rate >= 1 or random.random() < rate:
+            logger.info("%s %r", statement, parameters)
+
+def get_sync_engines():
+    """
+    Semua engine sync yang dipakai aplikasi, termasuk sync_engine milik AsyncEngine.
+    """
+    return [
+        engine, *replica_engines,
+        async_engine.sync_engine, *[e.sync_engine for e in async_replica_engines],
+    ]
+
+def get_pool_report(engine):
+    """
+    Pengaturan yang benar-benar dipakai engine, dibaca dari pool-nya (bukan
+    dari environment, yang bisa saja sudah berubah setelah engine dibuat).
+    """
+    pool = engine.pool
+    laporan = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool": type(pool).__name__,
+        "echo": engine.echo,
+        "pool_pre_ping": pool._pre_ping,
+        "pool_recycle": pool._recycle,
+    }
+    if isinstance(pool, QueuePool):
+        laporan.update(pool_size=pool.size(), max_overflow=pool._max_overflow, pool_timeout=pool._timeout)
+    return laporan
+
+def get_engine_report():
+    """
+    Ringkasan pengaturan semua engine yang sedang dipakai (primary, replika,
+    dan versi async-nya), untuk di-log saat startup.
+    """
+    return {
+        "primary": get_pool_report(engine),
+        "replicas": [get_pool_report(e) for e in replica_engines],
+        "async": get_pool_report(async_engine.sync_engine),
+        "async_replicas": [get_pool_report(e.sync_engine) for e in async_replica_engines],
+        "echo_sample_rate": ECHO_SAMPLE_RATE,
+    }
+
+
+class RoutingSession(Session):
+    """
+    Session yang mengarahkan SELECT ke salah satu replika dan semua penulisan
+    (flush, UPDATE/DELETE, SELECT ... FOR UPDATE) ke primary.
+    Replika dipilih sekali per session agar pembacaan dalam satu request konsisten.
+    Engine diberikan lewat info={"primary": ..., "replicas": [...]}.
+    """
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas = self.info.get("replicas")
+        if replicas and not self._flushing and isinstance(clause, Select) \
+                and clause._for_update_arg is None:
+            if "replica" not in self.info:
+                self.info["replica"] = random.choice(replicas)
+            return self.info["replica"]
+        return self.info["primary"]
+
+def get_replica_urls():
+    return [url.strip() for url in os.getenv("SQL_REPLICA_URLS", "").split(",") if url.strip()]
 
 
 load_dotenv()
 SQLALCHEMY_DATABASE_URL = os.getenv("SQL_DATABASE_URL")
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_SQL_DATABASE_URL") or get_async_url(SQLALCHEMY_DATABASE_URL)
 ENDPOINT_URL = os.getenv("S3_URL")
 KEY_ID = os.getenv("S3_KEY_ID")
 ACCESS_KEY = os.getenv("S3_ACCESS_KEY")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
-if not database_exists(SQLALCHEMY_DATABASE_URL):
-    create_database(SQLALCHEMY_DATABASE_URL)
+ECHO_SAMPLE_RATE = get_echo_sample_rate()
+
+# create_engine belum membuka koneksi; koneksi pertama dibuat saat query pertama.
+# Pembuatan database dan tabel dilakukan oleh `python migrate.py`.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL))
+pasang_echo_sampling(engine, ECHO_SAMPLE_RATE)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Replika baca (opsional). Tanpa SQL_REPLICA_URLS semua query tetap ke primary.
+SQLALCHEMY_REPLICA_URLS = get_replica_urls()
+replica_engines = [create_engine(url, **get_engine_options(url)) for url in SQLALCHEMY_REPLICA_URLS]
+for replica_engine in replica_engines:
+    pasang_echo_sampling(replica_engine, ECHO_SAMPLE_RATE)
+
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False,
+    info={"primary": engine, "replicas": replica_engines}
+)
+
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **get_engine_options(ASYNC_SQLALCHEMY_DATABASE_URL))
+pasang_echo_sampling(async_engine.sync_engine, ECHO_SAMPLE_RATE)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
-s3= boto3.client('s3', 
-    endpoint_url= ENDPOINT_URL,
-    aws_access_key_id=KEY_ID, 
-    aws_secret_access_key=ACCESS_KEY, 
-    aws_session_token=None,
-    config=boto3.session.Config(signature_version='s3v4'),
-    verify=False
+async_replica_engines = [
+    create_async_engine(get_async_url(url), **get_engine_options(url)) for url in SQLALCHEMY_REPLICA_URLS
+]
+for replica_engine in async_replica_engines:
+    pasang_echo_sampling(replica_engine.sync_engine, ECHO_SAMPLE_RATE)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False,
+    info={"primary": async_engine.sync_engine, "replicas": [e.sync_engine for e in async_replica_engines]}
 )
 
+Base = declarative_base()
+
+
+class LazyClient:
+    """
+    Membungkus client eksternal (mis. boto3) yang baru dibuat saat pertama kali
+    dipakai, sehingga import modul tidak membayar biaya import boto3.
+    Akses, set, dan hapus atribut diteruskan ke client asli.
+    """
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_client", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    object.__setattr__(self, "_client", self._factory())
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._get_client(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_client(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._get_client(), name)
+
+
+def buat_s3_client():
+    import boto3
+
+    return boto3.client('s3', 
+        endpoint_url= ENDPOINT_URL,
+        aws_access_key_id=KEY_ID, 
+        aws_secret_access_key=ACCESS_KEY, 
+        aws_session_token=None,
+        config=boto3.session.Config(signature_version='s3v4'),
+        verify=False
+    )
+
+s3 = LazyClient(buat_s3_client)
 
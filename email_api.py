@@ -1,13 +1,16 @@
-import requests
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 auth = (os.getenv('EMAIL_API_KEY_PUBLIC'), os.getenv('EMAIL_API_KEY_PRIVATE'))
 my_email = os.getenv('MY_EMAIL')
+# batas waktu request ke mailjet supaya thread pool tidak tertahan lama
+timeout = float(os.getenv('EMAIL_TIMEOUT', 10))
 
 def kirim_konfimasi_email(email:str, name:str, otp:str):
-    
+    # requests baru di-import saat email pertama dikirim agar import aplikasi tetap ringan
+    import requests
+
     url = 'https://api.mailjet.com/v3.1/send'
 
     headers = {
@@ -37,10 +40,11 @@ def kirim_konfimasi_email(email:str, name:str, otp:str):
         ]
     }
 
-    response = requests.post(url, json=body, headers=headers, auth=auth)
+    response = requests.post(url, json=body, headers=headers, auth=auth, timeout=timeout)
 
 def kirim_password_baru(email:str, name:str, password:str):
-    
+    import requests
+
     url = 'https://api.mailjet.com/v3.1/send'
 
     headers = {
@@ -71,6 +75,6 @@ def kirim_password_baru(email:str, name:str, password:str):
         ]
     }
 
-    response = requests.post(url, json=body, headers=headers, auth=auth)
+    response = requests.post(url, json=body, headers=headers, auth=auth, timeout=timeout)
 
 
@@ -0,0 +1,97 @@
+"""
+Export untuk laporan admin: CSV atau NDJSON yang di-stream langsung dari
+server-side cursor (yield_per). Baris dibaca dan ditulis per EXPORT_BATCH,
+jadi memori yang dipakai tetap berapapun jumlah barisnya.
+
+Export memakai session sendiri yang ditutup setelah baris terakhir dikirim,
+karena body StreamingResponse baru dibaca setelah endpoint selesai.
+"""
+import csv
+import datetime
+import enum
+import io
+import json
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+import models
+
+load_dotenv()
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", 1000))
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPE = {
+    CSV: "text/csv; charset=utf-8",
+    NDJSON: "application/x-ndjson",
+}
+
+
+def nilai_stmt(id_tugas=None, id_pelajar=None):
+    """
+    Semua attempt beserta judul tugas dan nama pelajarnya, urut id attempt.
+    """
+    attempt = models.AttemptMengerjakanTugas
+    statement = select(
+            attempt.id.label("id_attempt"),
+            attempt.id_pelajar,
+            models.Pelajar.nama_lengkap.label("nama_pelajar"),
+            models.Pelajar.email.label("email_pelajar"),
+            attempt.id_tugas,
+            models.TugasPembelajaran.judul.label("judul_tugas"),
+            attempt.nilai,
+            attempt.waktu_mulai,
+            attempt.waktu_selesai,
+        )\
+        .outerjoin(models.Pelajar, models.Pelajar.uid == attempt.id_pelajar)\
+        .outerjoin(models.TugasPembelajaran, models.TugasPembelajaran.id == attempt.id_tugas)\
+        .order_by(attempt.id)
+    if id_tugas:
+        statement = statement.where(attempt.id_tugas == id_tugas)
+    if id_pelajar:
+        statement = statement.where(attempt.id_pelajar == id_pelajar)
+    return statement
+
+def pelajar_stmt():
+    pelajar = models.Pelajar
+    return select(pelajar.id, pelajar.email, pelajar.nama_lengkap, pelajar.asal_sekolah, pelajar.jurusan,
+                  pelajar.is_member, pelajar.is_active, pelajar.time_created)\
+        .order_by(pelajar.id)
+
+
+def _nilai(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+def _csv(kolom, partisi):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(kolom)
+    for rows in partisi:
+        writer.writerows([_nilai(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _ndjson(kolom, partisi):
+    for rows in partisi:
+        yield "".join(
+            json.dumps({k: _nilai(value) for k, value in zip(kolom, row)}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in rows
+        )
+
+def stream(session_factory, statement, format=CSV, batch_size=EXPORT_BATCH):
+    """
+    Generator potongan teks CSV/NDJSON dari hasil statement.
+    """
+    encode = _csv if format == CSV else _ndjson
+    with session_factory() as db:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        yield from encode(list(result.keys()), result.partitions())
@@ -0,0 +1,171 @@
+"""
+Penilaian jawaban tugas memakai kunci jawaban yang sudah dikompilasi.
+
+Kunci disusun sekali dari pohon tugas (tugas, soal, pilihan) menjadi array
+datar lalu disimpan di cache.kunci_jawaban, sehingga pengumpulan jawaban
+berikutnya tidak perlu membaca tabel soal/jawaban lagi.
+"""
+import hashlib
+
+from sqlalchemy.orm import Session
+
+import models, crud, cache
+
+ABC = 0
+BENAR_SALAH = 1
+MULTI_PILIH = 2
+
+# jawaban soal ABC di luar pilihan yang ada disimpan sebagai tidak dijawab
+TIDAK_DIJAWAB = -1
+
+
+class JawabanTidakValid(ValueError):
+    pass
+
+
+class KunciJawaban:
+    """
+    mapel     : mapel materi video tugas (untuk leaderboard), None jika tidak ada
+    id_soal[i]: id soal ke-i
+    jenis[i]  : jenis soal ke-i (ABC / BENAR_SALAH / MULTI_PILIH)
+    awal[i]   : posisi kunci soal ke-i di array kunci
+    jumlah[i] : jumlah pilihan soal ke-i (0 untuk soal ABC, kuncinya satu angka)
+    pilihan[i]: jumlah pilihan soal ke-i, termasuk soal ABC (untuk statistik soal)
+    kunci     : kunci semua soal berurutan, int (None untuk soal ABC tanpa kunci)
+    """
+    __slots__ = ("id_tugas", "attempt_allowed", "ada_video", "mapel", "id_soal", "jenis", "awal", "jumlah", "pilihan", "kunci")
+
+    def __init__(self, id_tugas, attempt_allowed, ada_video, mapel, id_soal, jenis, awal, jumlah, pilihan, kunci):
+        self.id_tugas = id_tugas
+        self.attempt_allowed = attempt_allowed
+        self.ada_video = ada_video
+        self.mapel = mapel
+        self.id_soal = id_soal
+        self.jenis = jenis
+        self.awal = awal
+        self.jumlah = jumlah
+        self.pilihan = pilihan
+        self.kunci = kunci
+
+    def __len__(self):
+        return len(self.jenis)
+
+
+def kompilasi(db_tugas: models.TugasPembelajaran) -> KunciJawaban:
+    id_soal, jenis, awal, jumlah, pilihan, kunci = [], [], [], [], [], []
+    for soal in db_tugas.soal:
+        id_soal.append(soal.id)
+        pilihan.append(len(soal.pilihan))
+        awal.append(len(kunci))
+        if isinstance(soal, models.SoalABC):
+            jenis.append(ABC)
+            jumlah.append(0)
+            kunci.append(soal.kunci)
+        elif isinstance(soal, models.SoalBenarSalah):
+            jenis.append(BENAR_SALAH)
+            jumlah.append(len(soal.pilihan))
+            kunci.extend(int(pilihan.kunci) for pilihan in soal.pilihan)
+        elif isinstance(soal, models.SoalMultiPilih):
+            jenis.append(MULTI_PILIH)
+            jumlah.append(len(soal.pilihan))
+            kunci.extend(int(pilihan.benar) for pilihan in soal.pilihan)
+    video = db_tugas.video
+    mapel = video.materi.mapel if video is not None and video.materi is not None else None
+    return KunciJawaban(db_tugas.id, db_tugas.attempt_allowed, video is not None, mapel,
+                        tuple(id_soal), tuple(jenis), tuple(awal), tuple(jumlah), tuple(pilihan), tuple(kunci))
+
+def read_kunci_jawaban(db: Session, id_tugas: int) -> KunciJawaban:
+    """
+    Kunci jawaban dari cache, atau dikompilasi dari database jika belum ada.
+    NoResultFound jika tugas tidak ada.
+    """
+    kunci = cache.kunci_jawaban.get(id_tugas)
+    if kunci is None:
+        versi = cache.versi_tugas(id_tugas)
+        kunci = kompilasi(crud.read_tugas_pembelajaran_lengkap_by_id(db, id_tugas))
+        cache.simpan_kunci_jawaban(id_tugas, versi, kunci)
+    return kunci
+
+def nilai_jawaban(kunci: KunciJawaban, jawaban: list) -> float:
+    """
+    Nilai 0..1: rata-rata skor per soal. Soal ABC benar/salah penuh, soal
+    benar-salah dan multi pilih diberi skor sebagian per pilihan.
+    """
+    return nilai_per_soal(kunci, jawaban)[0]
+
+def nilai_per_soal(kunci: KunciJawaban, jawaban: list):
+    """
+    (nilai, per_soal) seperti nilai_jawaban. per_soal[i] = (jawaban, skor) soal
+    ke-i: jawaban disimpan sebagai satu int (soal ABC: index pilihan atau
+    TIDAK_DIJAWAB, soal lain: bit ke-j = pilihan ke-j dijawab 1), skor 0..1.
+    """
+    jumlah_soal = len(kunci.jenis)
+    if jumlah_soal != len(jawaban):
+        raise JawabanTidakValid("Length missmatch")
+
+    kunci_flat = kunci.kunci
+    jawaban_benar = 0.0
+    per_soal = []
+    try:
+        for jenis, awal, jumlah, pilihan, isi in zip(kunci.jenis, kunci.awal, kunci.jumlah, kunci.pilihan, jawaban):
+            if jenis == ABC:
+                dipilih = int(isi)
+                if not 0 <= dipilih < pilihan:
+                    dipilih = TIDAK_DIJAWAB
+                skor = 1.0 if kunci_flat[awal] == dipilih else 0.0
+                jawaban_benar += skor
+                per_soal.append((dipilih, skor))
+                continue
+            if jumlah != len(isi):
+                raise JawabanTidakValid("Length not match")
+            yang_benar = 0
+            bit = 0
+            for i, (k, j) in enumerate(zip(kunci_flat[awal:awal + jumlah], isi)):
+                j = int(j)
+                if k == j:
+                    yang_benar += 1
+                if j == 1:
+                    bit |= 1 << i
+            skor = yang_benar / jumlah
+            jawaban_benar += skor
+            per_soal.append((bit, skor))
+    except JawabanTidakValid:
+        raise
+    except (TypeError, ValueError):
+        raise JawabanTidakValid("Invalid answer format")
+    return jawaban_benar / jumlah_soal, per_soal
+
+def kunci_per_soal(kunci: KunciJawaban) -> dict:
+    """
+    {id_soal: (jenis, kunci_soal, jumlah)} untuk menilai ulang jawaban yang
+    tersimpan di jawaban_attempt. Kunci soal benar-salah dan multi pilih
+    disusun sebagai bit seperti jawabannya, jadi semua pilihan satu soal
+    dibandingkan sekaligus dengan satu XOR.
+    """
+    hasil = {}
+    for id_soal, jenis, awal, jumlah in zip(kunci.id_soal, kunci.jenis, kunci.awal, kunci.jumlah):
+        if jenis == ABC:
+            hasil[id_soal] = (jenis, kunci.kunci[awal], 0)
+        else:
+            bit = 0
+            for i, k in enumerate(kunci.kunci[awal:awal + jumlah]):
+                bit |= k << i
+            hasil[id_soal] = (jenis, bit, jumlah)
+    return hasil
+
+def sidik_kunci(kunci: KunciJawaban) -> str:
+    """
+    Sidik jari kunci_per_soal: berubah jika kunci, jumlah pilihan atau daftar
+    soal tugas berubah.
+    """
+    return hashlib.sha256(repr(sorted(kunci_per_soal(kunci).items())).encode()).hexdigest()
+
+def skor_tersimpan(kunci_soal, jawaban: int) -> float:
+    """
+    Skor 0..1 jawaban tersimpan (lihat nilai_per_soal) terhadap kunci_soal dari kunci_per_soal.
+    """
+    jenis, kunci, jumlah = kunci_soal
+    if jenis == ABC:
+        return 1.0 if kunci == jawaban else 0.0
+    sama = ~(jawaban ^ kunci) & ((1 << jumlah) - 1)
+    return bin(sama).count("1") / jumlah
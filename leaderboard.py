@@ -0,0 +1,257 @@
+"""
+Leaderboard per tugas dan per mapel yang disimpan di memori proses.
+
+- Per tugas: nilai terbaik tiap pelajar pada tugas itu.
+- Per mapel: jumlah nilai terbaik pelajar dari semua tugas di mapel itu
+  (mapel dari materi video tugas).
+
+Dibangun ulang dari rekap_attempt_tugas saat startup (muat_ulang) lalu diperbarui
+setiap ada attempt yang dinilai (catat_nilai). Setiap papan berupa list
+terurut sehingga peringkat dicari dengan bisect (O(log n)).
+
+Setiap worker punya salinan sendiri, jadi papan juga dibangun ulang setiap
+LEADERBOARD_REBUILD_INTERVAL detik di background (mulai_muat_ulang_berkala):
+attempt yang dinilai worker lain dan perubahan materi video terlihat paling
+lambat setelah interval itu. catat_nilai/hapus_tugas yang terjadi selama
+muat_ulang membaca database dicatat lalu diputar ulang ke papan yang baru,
+sehingga tidak hilang saat papan ditukar.
+"""
+import logging
+import os
+import sys
+import threading
+from bisect import bisect_left, insort
+
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+load_dotenv()
+# detik antar pembangunan ulang papan di background, 0 untuk mematikan
+LEADERBOARD_REBUILD_INTERVAL = float(os.getenv("LEADERBOARD_REBUILD_INTERVAL", 60))
+
+logger = logging.getLogger(__name__)
+
+
+class PapanPeringkat:
+    """
+    Skor per pelajar, terurut dari skor tertinggi. Pelajar dengan skor sama
+    mendapat peringkat yang sama (1, 2, 2, 4).
+    """
+    def __init__(self):
+        # (-skor, id_pelajar) naik = skor turun, lalu id naik
+        self._urutan = []
+        self._skor = {}
+
+    def __len__(self):
+        return len(self._skor)
+
+    def perbarui(self, id_pelajar, skor):
+        lama = self._skor.get(id_pelajar)
+        if lama is not None:
+            del self._urutan[bisect_left(self._urutan, (-lama, id_pelajar))]
+        self._skor[id_pelajar] = skor
+        insort(self._urutan, (-skor, id_pelajar))
+
+    def hapus(self, id_pelajar):
+        lama = self._skor.pop(id_pelajar, None)
+        if lama is not None:
+            del self._urutan[bisect_left(self._urutan, (-lama, id_pelajar))]
+
+    def skor(self, id_pelajar):
+        return self._skor.get(id_pelajar)
+
+    def items(self):
+        return list(self._skor.items())
+
+    def peringkat(self, id_pelajar):
+        """
+        Peringkat (mulai dari 1) atau None jika pelajar belum ada di papan.
+        """
+        skor = self._skor.get(id_pelajar)
+        if skor is None:
+            return None
+        return bisect_left(self._urutan, (-skor,)) + 1
+
+    def teratas(self, n):
+        """
+        [(peringkat, id_pelajar, skor)] untuk n pelajar teratas.
+        """
+        hasil = []
+        for i, (skor, id_pelajar) in enumerate(self._urutan[:n]):
+            if i and skor == self._urutan[i - 1][0]:
+                peringkat = hasil[-1][0]
+            else:
+                peringkat = i + 1
+            hasil.append((peringkat, id_pelajar, -skor))
+        return hasil
+
+    def ukuran_memori(self):
+        """
+        Perkiraan memori (byte) list, dict dan tuple milik papan ini.
+        """
+        ukuran = sys.getsizeof(self._urutan) + sys.getsizeof(self._skor)
+        for item in self._urutan:
+            ukuran += sys.getsizeof(item) + sys.getsizeof(item[0]) + sys.getsizeof(item[1])
+        return ukuran
+
+
+_lock = threading.RLock()
+_per_tugas = {}
+_per_mapel = {}
+# mapel tiap tugas saat nilainya dicatat, agar total mapel bisa dikoreksi
+_mapel_tugas = {}
+# (mapel, id_pelajar) -> jumlah tugas yang ikut dalam total mapel pelajar itu
+_jumlah_tugas_mapel = {}
+# satu list per muat_ulang yang sedang berjalan: [(fungsi, args)] yang diputar ulang setelah papan ditukar
+_perubahan_selama_muat = []
+_berhenti = threading.Event()
+
+
+def _nilai_terbaik_query(db: Session):
+    # nilai terbaik per (pelajar, tugas) sudah ada di rekap, tanpa GROUP BY atas semua attempt
+    rekap = models.RekapAttemptTugas
+    return db.query(rekap.id_pelajar, rekap.id_tugas, rekap.nilai_terbaik, models.Materi.mapel)\
+        .outerjoin(models.VideoPembelajaran, models.VideoPembelajaran.id_tugas == rekap.id_tugas)\
+        .outerjoin(models.Materi, models.Materi.id == models.VideoPembelajaran.id_materi)\
+        .filter(rekap.nilai_terbaik.isnot(None))\
+        .distinct()
+
+def muat_ulang(db: Session):
+    """
+    Membangun ulang semua papan dengan satu query atas rekap_attempt_tugas
+    (nilai terbaik per pelajar per tugas).
+    """
+    perubahan = []
+    with _lock:
+        _perubahan_selama_muat.append(perubahan)
+    try:
+        papan = _bangun(db)
+    except BaseException:
+        with _lock:
+            _perubahan_selama_muat.remove(perubahan)
+        raise
+
+    global _per_tugas, _per_mapel, _mapel_tugas, _jumlah_tugas_mapel
+    with _lock:
+        _perubahan_selama_muat.remove(perubahan)
+        _per_tugas, _per_mapel, _mapel_tugas, _jumlah_tugas_mapel = papan
+        # nilai yang dicatat setelah rekap dibaca belum ada di papan baru
+        for fungsi, args in perubahan:
+            fungsi(*args)
+
+def _bangun(db: Session):
+    per_tugas, per_mapel, mapel_tugas = {}, {}, {}
+    total_mapel, jumlah_tugas_mapel = {}, {}
+    for id_pelajar, id_tugas, nilai, mapel in _nilai_terbaik_query(db).yield_per(5000):
+        per_tugas.setdefault(id_tugas, PapanPeringkat()).perbarui(id_pelajar, nilai)
+        mapel_tugas[id_tugas] = mapel
+        if mapel is not None:
+            total_mapel[(mapel, id_pelajar)] = total_mapel.get((mapel, id_pelajar), 0) + nilai
+            jumlah_tugas_mapel[(mapel, id_pelajar)] = jumlah_tugas_mapel.get((mapel, id_pelajar), 0) + 1
+    for (mapel, id_pelajar), total in total_mapel.items():
+        per_mapel.setdefault(mapel, PapanPeringkat()).perbarui(id_pelajar, total)
+    return per_tugas, per_mapel, mapel_tugas, jumlah_tugas_mapel
+
+def mulai_muat_ulang_berkala(session_factory, interval=None) -> threading.Thread:
+    """
+    Thread background yang menjalankan muat_ulang setiap interval detik
+    sampai hentikan_muat_ulang_berkala dipanggil.
+    """
+    interval = LEADERBOARD_REBUILD_INTERVAL if interval is None else interval
+    _berhenti.clear()
+
+    def jalankan():
+        while not _berhenti.wait(interval):
+            try:
+                with session_factory() as db:
+                    muat_ulang(db)
+            except Exception:
+                logger.exception("leaderboard gagal dibangun ulang")
+    thread = threading.Thread(target=jalankan, name="leaderboard-muat-ulang", daemon=True)
+    thread.start()
+    return thread
+
+def hentikan_muat_ulang_berkala():
+    _berhenti.set()
+
+def catat_nilai(id_pelajar, id_tugas, nilai, mapel=None):
+    """
+    Dipanggil setelah attempt disimpan. mapel: mapel materi video tugas ini.
+    """
+    if nilai is None:
+        return
+    with _lock:
+        for perubahan in _perubahan_selama_muat:
+            perubahan.append((catat_nilai, (id_pelajar, id_tugas, nilai, mapel)))
+        papan = _per_tugas.setdefault(id_tugas, PapanPeringkat())
+        lama = papan.skor(id_pelajar)
+        if lama is not None and lama >= nilai:
+            return
+        papan.perbarui(id_pelajar, nilai)
+        mapel = _mapel_tugas.setdefault(id_tugas, mapel)
+        if mapel is None:
+            return
+        papan_mapel = _per_mapel.setdefault(mapel, PapanPeringkat())
+        papan_mapel.perbarui(id_pelajar, (papan_mapel.skor(id_pelajar) or 0) + nilai - (lama or 0))
+        if lama is None:
+            _jumlah_tugas_mapel[(mapel, id_pelajar)] = _jumlah_tugas_mapel.get((mapel, id_pelajar), 0) + 1
+
+def hapus_tugas(id_tugas):
+    """
+    Dipanggil setelah tugas (beserta attempt-nya) dihapus.
+    """
+    with _lock:
+        for perubahan in _perubahan_selama_muat:
+            perubahan.append((hapus_tugas, (id_tugas,)))
+        papan = _per_tugas.pop(id_tugas, None)
+        mapel = _mapel_tugas.pop(id_tugas, None)
+        if papan is None or mapel is None:
+            return
+        papan_mapel = _per_mapel[mapel]
+        for id_pelajar, nilai in papan.items():
+            sisa = _jumlah_tugas_mapel.pop((mapel, id_pelajar), 1) - 1
+            if sisa:
+                _jumlah_tugas_mapel[(mapel, id_pelajar)] = sisa
+                papan_mapel.perbarui(id_pelajar, papan_mapel.skor(id_pelajar) - nilai)
+            else:
+                papan_mapel.hapus(id_pelajar)
+
+
+def _ringkasan(papan, n, id_pelajar):
+    if papan is None:
+        return {"jumlah_pelajar": 0, "teratas": [], "pelajar": None}
+    pelajar = None
+    if id_pelajar is not None and papan.skor(id_pelajar) is not None:
+        pelajar = {"peringkat": papan.peringkat(id_pelajar), "id_pelajar": id_pelajar, "nilai": papan.skor(id_pelajar)}
+    return {
+        "jumlah_pelajar": len(papan),
+        "teratas": [{"peringkat": p, "id_pelajar": i, "nilai": s} for p, i, s in papan.teratas(n)],
+        "pelajar": pelajar,
+    }
+
+def papan_tugas(id_tugas, n=10, id_pelajar=None) -> dict:
+    with _lock:
+        return _ringkasan(_per_tugas.get(id_tugas), n, id_pelajar)
+
+def papan_mapel(mapel, n=10, id_pelajar=None) -> dict:
+    with _lock:
+        return _ringkasan(_per_mapel.get(mapel), n, id_pelajar)
+
+def stats() -> dict:
+    """
+    Ukuran memori dihitung di luar _lock agar catat_nilai tidak menunggu;
+    papan bisa berubah selama dihitung, jadi angkanya perkiraan.
+    """
+    with _lock:
+        semua_papan = list(_per_tugas.values()) + list(_per_mapel.values())
+        hasil = {
+            "jumlah_papan_tugas": len(_per_tugas),
+            "jumlah_papan_mapel": len(_per_mapel),
+            "jumlah_entri": sum(len(papan) for papan in semua_papan),
+        }
+        ukuran_lain = sys.getsizeof(_mapel_tugas) + sys.getsizeof(_jumlah_tugas_mapel)
+    hasil["memori_byte"] = sum(papan.ukuran_memori() for papan in semua_papan) + ukuran_lain
+    return hasil
@@ -1,21 +1,42 @@
 import json
+import os
+import logging
 from typing import Union, Optional, List
 from urllib import response
 from datetime import datetime
 
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile, status, Query
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile, status, Query, Response
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 
+import anyio
 import sqlalchemy
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
-import crud, schema, models, auth
-from database import SessionLocal, engine
+import crud, crud_async, schema, models, auth, database, sql_metrics, pagination, cache, grading, submission_queue, leaderboard, analisis_soal, regrade, export, respon_json
+from database import SessionLocal, ReadSessionLocal, AsyncSessionLocal, AsyncReadSessionLocal
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger("uvicorn.error")
 
+# Tabel dibuat oleh `python migrate.py`, bukan saat import.
+# DB_MIGRATE_ON_STARTUP=true menjalankannya sekali saat server mulai.
+MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes", "on")
+
+# Jumlah query dan waktu database per request (header X-DB-*), aktif secara default
+SQL_METRICS_ENABLED = os.getenv("SQL_METRICS_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+
+# Semua handler yang memanggil crud/s3/bcrypt/email ditulis sebagai `def` biasa
+# sehingga FastAPI menjalankannya di thread pool dan event loop tetap bebas.
+# Hanya handler yang memakai crud_async (AsyncSession) yang boleh `async def`.
+# Ukuran thread pool dibatasi agar koneksi database tidak kehabisan.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+
+# Jumlah video terbaru per materi pada /materi/list (default dan batas query parameter preview_video)
+MATERI_PREVIEW_VIDEO = int(os.getenv("MATERI_PREVIEW_VIDEO", 3))
+MATERI_PREVIEW_VIDEO_MAKS = 20
 
 # Dependency
 def get_db():
@@ -25,6 +46,23 @@ def get_db():
     finally:
         db.close()
 
+# Session untuk endpoint baca yang boleh sedikit tertinggal (boleh dari replika).
+# Login dan alur yang membaca hasil tulisannya sendiri tetap memakai get_db.
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 app = FastAPI()
 
 origins = ["*"]
@@ -35,8 +73,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if SQL_METRICS_ENABLED:
+    for sync_engine in database.get_sync_engines():
+        sql_metrics.pasang(sync_engine)
+    app.add_middleware(sql_metrics.SqlMetricsMiddleware)
+
+@app.on_event("startup")
+async def atur_thread_pool():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+@app.on_event("startup")
+async def migrasi_database():
+    if MIGRATE_ON_STARTUP:
+        import migrate
+        await anyio.to_thread.run_sync(migrate.bootstrap)
+
+# Antrian pengumpulan tugas (lihat submission_queue.py), aktif jika SUBMISSION_QUEUE_ENABLED=true
+antrian_pengumpulan = submission_queue.AntrianPengumpulan(SessionLocal)
+
+@app.on_event("startup")
+async def mulai_antrian_pengumpulan():
+    if submission_queue.SUBMISSION_QUEUE_ENABLED:
+        antrian_pengumpulan.mulai()
+
+@app.on_event("shutdown")
+async def hentikan_antrian_pengumpulan():
+    await anyio.to_thread.run_sync(antrian_pengumpulan.berhenti)
+
+@app.on_event("startup")
+async def muat_leaderboard():
+    def muat():
+        try:
+            with ReadSessionLocal() as db:
+                leaderboard.muat_ulang(db)
+        except Exception:
+            logger.exception("leaderboard gagal dimuat")
+    await anyio.to_thread.run_sync(muat)
+    # worker lain juga mencatat nilai; papan di worker ini dibangun ulang berkala
+    if leaderboard.LEADERBOARD_REBUILD_INTERVAL > 0:
+        leaderboard.mulai_muat_ulang_berkala(ReadSessionLocal)
+
+@app.on_event("shutdown")
+async def hentikan_leaderboard():
+    leaderboard.hentikan_muat_ulang_berkala()
+
+@app.on_event("startup")
+async def lanjutkan_regrade():
+    def lanjutkan():
+        try:
+            regrade.lanjutkan_semua(SessionLocal)
+        except Exception:
+            logger.exception("regrade gagal dilanjutkan")
+    await anyio.to_thread.run_sync(lanjutkan)
+
+@app.on_event("startup")
+async def laporan_konfigurasi_database():
+    logger.info("thread pool: %s, database: %s", THREADPOOL_SIZE, database.get_engine_report())
+
+
+DESKRIPSI_CURSOR = "Cursor dari header X-Next-Cursor response sebelumnya, tidak bisa digabung dengan page"
+# dokumentasi OpenAPI untuk endpoint list dengan pagination (lihat pagination.py)
+RESPON_LIST_CURSOR = {
+    200: {"headers": {"X-Next-Cursor": {
+        "description": "Cursor untuk halaman berikutnya (query parameter cursor); tidak ada jika sudah halaman terakhir atau memakai page",
+        "schema": {"type": "string"}}}},
+    400: {"description": "cursor tidak valid, atau page dan cursor dipakai bersamaan"},
+}
+
+def dengan_cursor_berikutnya(response: Response, hasil, limit, page, kunci):
+    """
+    Menambahkan header X-Next-Cursor jika masih ada halaman berikutnya.
+    """
+    cursor = pagination.cursor_berikutnya(hasil, limit, page, kunci)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return hasil
+
+def daftar_cepat(rows, limit, page, kunci):
+    """
+    Response list dari Row hasil select kolom (lihat respon_json.py), dengan
+    header X-Next-Cursor yang sama seperti dengan_cursor_berikutnya.
+    """
+    cursor = pagination.cursor_berikutnya(rows, limit, page, kunci)
+    return respon_json.daftar(rows, headers={"X-Next-Cursor": cursor} if cursor is not None else None)
+
+
 
 @app.get("/")
 async def home():
@@ -46,7 +170,7 @@ async def home():
 
 @app.post("/pelajar/login", response_model=schema.Token)
 @app.post("/mentor/login", response_model=schema.Token)
-async def login_for_access_token(form_data: schema.UserLoginForm, db: Session = Depends(get_db)):
+def login_for_access_token(form_data: schema.UserLoginForm, db: Session = Depends(get_db)):
     
     user = auth.authenticate_user(db, form_data.email, form_data.password)
     if not user:
@@ -70,7 +194,7 @@ async def login_for_access_token(form_data: schema.UserLoginForm, db: Session =
             404: {"description": "Something went wrong"}
         }
         )  
-async def activate_user_account(id:int = -1, otp:str = "-1", db: Session = Depends(get_db)):
+def activate_user_account(id:int = -1, otp:str = "-1", db: Session = Depends(get_db)):
     if(id==-1 or otp == "-1"):
         raise HTTPException(status_code=400, detail="Bad request")
     try:
@@ -133,7 +257,7 @@ async def activate_user_account(id:int = -1, otp:str = "-1", db: Session = Depen
               400: {"description": "Something else went wrong"},
           }
           )
-async def permintaan_reset_password(email:str = "", db : Session = Depends(get_db)):
+def permintaan_reset_password(email:str = "", db : Session = Depends(get_db)):
     if not email or email == "":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -153,7 +277,7 @@ async def permintaan_reset_password(email:str = "", db : Session = Depends(get_d
               401: {"description": "Incorrect username or password"},
               401: {"description": "Inactive account"},
           })
-async def ganti_password_baru(new_data:schema.UserNewPassword, db: Session = Depends(get_db)):
+def ganti_password_baru(new_data:schema.UserNewPassword, db: Session = Depends(get_db)):
     user = auth.authenticate_user(db, new_data.email, new_data.password)
     if not user:
         raise HTTPException(
@@ -182,7 +306,7 @@ async def ganti_password_baru(new_data:schema.UserNewPassword, db: Session = Dep
               400: {"description": "Ukuran file terlalu besar. Maksimal ukuran file adalah {} bytes".format(5 * 1024 * 1024)},
               500: {"description": "Something went wrong, details: 'details of the error' "},
           })
-async def update_profile_picture(
+def update_profile_picture(
     file: UploadFile = File(...), 
     token_data:schema.TokenData = Depends(auth.get_token_data), 
     db: Session = Depends(get_db)):
@@ -203,7 +327,7 @@ async def update_profile_picture(
     }
 
 @app.post("/pelajar/updatedata", response_model=schema.StandarResponse)
-async def update_data_pelajar(
+def update_data_pelajar(
         namaLengkap:Optional[str] = Form(None, description="Nama yang baru"),
         email:Optional[str] = Form(None, description="email yang baru"),
         jurusan:Optional[str] = Form(None, description="jurusan yang baru"),
@@ -233,7 +357,7 @@ async def update_data_pelajar(
     return {"detail": "Berhasil diupdate"}
 
 @app.post("/mentor/updatedata", response_model=schema.StandarResponse)
-async def update_data_pelajar(
+def update_data_pelajar(
         namaLengkap:Optional[str] = Form(None, description="Nama yang baru"),
         email:Optional[str] = Form(None, description="email yang baru"),
         keahlian:Optional[str] = Form(None, description="keahlian yang baru"),
@@ -267,7 +391,7 @@ async def update_data_pelajar(
     401: {"description": "Could not validate credentials"},
     401: {"description": "Invalid authentication credentials"},
 })
-async def read_users_pelajar(token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
+def read_users_pelajar(token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
     """
     kalo mau dipake harus tambahin header "Authorization" (tanpa tanda petik) 
     dengan value "Bearer + (token dari /token)"
@@ -281,7 +405,7 @@ async def read_users_pelajar(token_data: schema.TokenData = Depends(auth.get_tok
     401: {"description": "Could not validate credentials"},
     401: {"description": "Invalid authentication credentials"},
 })
-async def read_users_mentor(token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
+def read_users_mentor(token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
     """
     kalo mau dipake harus tambahin header "Authorization" (tanpa tanda petik) 
     dengan value "Bearer + (token dari /token)"
@@ -294,7 +418,7 @@ async def read_users_mentor(token_data: schema.TokenData = Depends(auth.get_toke
 @app.post("/pelajar/register", response_model=schema.StandarResponse, responses={
     400: {"description": "user already exists"},
 })
-async def register_account_pelajar(register_form: schema.PelajarRegisterForm, db: Session = Depends(get_db)):
+def register_account_pelajar(register_form: schema.PelajarRegisterForm, db: Session = Depends(get_db)):
     """
     Membuat akun pelajar baru
     """
@@ -307,7 +431,7 @@ async def register_account_pelajar(register_form: schema.PelajarRegisterForm, db
 @app.post("/mentor/register", response_model=schema.StandarResponse, responses={
     400: {"description": "user already exists"},
 })
-async def register_account_mentor(register_form: schema.MentorRegisterForm, db: Session = Depends(get_db)):
+def register_account_mentor(register_form: schema.MentorRegisterForm, db: Session = Depends(get_db)):
     """
     Membuat akun mentor baru
     """
@@ -324,7 +448,7 @@ async def register_account_mentor(register_form: schema.MentorRegisterForm, db:
     400: {"description": "Ukuran file terlalu besar. Maksimal ukuran file adalah {} bytes".format(524288000)},
     400: {"description": "Bad materi id"},
 })
-async def upload_video_materi_baru(
+def upload_video_materi_baru(
     token_data: schema.TokenData = Depends(auth.get_token_data), 
     file: UploadFile = File(...),
     id_materi: int = Form(...),
@@ -333,7 +457,6 @@ async def upload_video_materi_baru(
     
     # Check jika user adalah mentor
     auth.check_if_user_is_mentor(db, token_data.id)
-    db.rollback()
 
     # check jika video valid
     if not file.content_type.startswith('video/mp4'):
@@ -345,8 +468,7 @@ async def upload_video_materi_baru(
         )
     
     
-    materi = crud.read_materi_pembelajaran_filter_by(db, id_materi=id_materi)
-    if(len(materi) != 1):
+    if not crud.materi_ada(db, id_materi):
         raise HTTPException(400, detail="Bad materi id")
     crud.create_video_pembelajaran(db, token_data.id, judul_video, id_materi, file)
 
@@ -357,7 +479,7 @@ async def upload_video_materi_baru(
              401: {"description": "Could not validate credentials"},
              500: {"description": "Something went wrong (details: 'details of the error')"},
          })
-async def read_video_pembelajaran(videoid:int, token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
+def read_video_pembelajaran(videoid:int, token_data: schema.TokenData = Depends(auth.get_token_data), db: Session = Depends(get_db)):
     try:
         metadata = crud.read_video_pembelajaran_metadata_by_id(db, videoid)
         download_url = crud.read_video_pembelajaran_download_url_by_id(db, videoid)
@@ -372,7 +494,7 @@ async def read_video_pembelajaran(videoid:int, token_data: schema.TokenData = De
              401: {"description": "bukan mentor"},
              
          })
-async def update_video_pembelajaran(
+def update_video_pembelajaran(
     video_id:int = Form(...),
     id_materi: int = Form(...),
     judul_video: str = Form(...), 
@@ -380,7 +502,6 @@ async def update_video_pembelajaran(
     db: Session = Depends(get_db)):
 
     auth.check_if_user_is_mentor(db, token_data.id)
-    db.rollback()
     crud.update_video_pembelajaran_metadata_by_id(db, video_id, id_materi, judul_video)
     return {"detail":"ok",}
      
@@ -392,13 +513,12 @@ async def update_video_pembelajaran(
              401: {"description": "bukan mentor"},
              
          })
-async def delete_video_pembelajaran(
+def delete_video_pembelajaran(
     video_id:int = Form(...),
     token_data: schema.TokenData = Depends(auth.get_token_data), 
     db: Session = Depends(get_db)):
 
     auth.check_if_user_is_mentor(db, token_data.id)
-    db.rollback()
     crud.delete_video_pembelajaran_by_id(db, video_id)
     return {"detail":"ok",}
 
@@ -408,7 +528,7 @@ async def delete_video_pembelajaran(
              400: {"description": "user already exist"},
              
          })
-async def register_account_admin(register_form: schema.AdminRegisterForm, db: Session =Depends(get_db), admin_token_data = Depends(auth.get_admin_token)):
+def register_account_admin(register_form: schema.AdminRegisterForm, db: Session =Depends(get_db), admin_token_data = Depends(auth.get_admin_token)):
     try:
         crud.create_new_admin(db, register_form, admin_token_data.id)
     except IntegrityError:
@@ -418,7 +538,7 @@ async def register_account_admin(register_form: schema.AdminRegisterForm, db: Se
 @app.post("/admin/login", response_model=schema.Token, responses={
     401: {"description": "Incorrect username or password"},
 })
-async def login_for_admin(form_data: schema.AdminLoginForm, db: Session = Depends(get_db)):
+def login_for_admin(form_data: schema.AdminLoginForm, db: Session = Depends(get_db)):
     admin = auth.admin_auth(db, form_data.id, form_data.password)
     #admin = crud.read_admin_by_id(db, form_data.id)
     if not admin:
@@ -434,7 +554,7 @@ async def login_for_admin(form_data: schema.AdminLoginForm, db: Session = Depend
          responses={
              401: {"description": "Could not validate credentials"},
          })
-async def read_users_admin(token_data: schema.AdminTokenData = Depends(auth.get_admin_token), db: Session = Depends(get_db)):
+def read_users_admin(token_data: schema.AdminTokenData = Depends(auth.get_admin_token), db: Session = Depends(get_db)):
     current_user = crud.read_admin_by_id(db, token_data.id)
     
     return current_user
@@ -445,7 +565,7 @@ async def read_users_admin(token_data: schema.AdminTokenData = Depends(auth.get_
              404: {"description": "account not found"},
              
          })
-async def toggle_user_pelajar_is_member(pelajar: schema.UserBase, token_data: schema.AdminTokenData = Depends(auth.get_admin_token), db: Session = Depends(get_db)):
+def toggle_user_pelajar_is_member(pelajar: schema.UserBase, token_data: schema.AdminTokenData = Depends(auth.get_admin_token), db: Session = Depends(get_db)):
     try:
         crud.update_user_pelajar_toggle_is_member_by_email(db, pelajar.email)
     except NoResultFound:
@@ -465,13 +585,12 @@ async def toggle_user_pelajar_is_member(pelajar: schema.UserBase, token_data: sc
               403: {"description": "creator id missmatch"},
               
           })
-async def tambah_tugas_ke_video(tugas_baru: schema.TambahTugasPembelajaran,tokendata:schema.TokenData = Depends(auth.get_token_data), db= Depends(get_db)):
+def tambah_tugas_ke_video(tugas_baru: schema.TambahTugasPembelajaran,tokendata:schema.TokenData = Depends(auth.get_token_data), db= Depends(get_db)):
     try:
         auth.check_if_user_is_mentor(db, tokendata.id)
-        db.rollback()
 
 
-        db_video = crud.read_video_pembelajaran_metadata_by_id(db, tugas_baru.id_video)
+        db_video = crud.read_pemilik_video_by_id(db, tugas_baru.id_video)
 
         if(db_video.creator_id != tokendata.id):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
@@ -479,32 +598,10 @@ async def tambah_tugas_ke_video(tugas_baru: schema.TambahTugasPembelajaran,token
         if db_video.id_tugas != None:
             raise HTTPException(status_code=400, detail="Tugas sudah ada")
 
-        db_tugas = crud.create_tugas_pembelajaran(db, tugas_baru.judul, \
-                                              tugas_baru.jumlah_attempt, \
-                                              tugas_baru.id_video)
-
-        for soal in tugas_baru.daftar_soal:
-            if isinstance(soal, schema.SoalABCKunci):
-                db_soal = crud.create_soal_abc(db, soal.pertanyaan, db_tugas.id)
-                crud.update_soal_abc_add_kunci_by_ids(db, db_soal.id, soal.index_jawaban_benar)
-                for i in range(len(soal.pilihan_jawaban)):
-                    string_jawaban=soal.pilihan_jawaban[i]
-                    jawaban = crud.create_jawaban_abc(db, db_soal.id, string_jawaban)
-            elif isinstance(soal, schema.SoalBenarSalah):
-                db_soal = crud.create_soal_benar_salah(db, soal.pertanyaan, db_tugas.id,\
-                                                       soal.pernyataan_pada_benar, \
-                                                       soal.pernyataan_pada_salah)
-                for jawaban in soal.daftar_jawaban:
-                    if isinstance(jawaban, schema.JawabanBenarSalahKunci):
-                        crud.create_jawaban_benar_salah(db, db_soal.id, jawaban.isi_jawaban, \
-                                                        jawaban.jawaban_pernyataan_yang_benar )
-            elif isinstance(soal, schema.SoalMultiPilih):
-                db_soal = crud.create_soal_multi_pilih(db, soal.pertanyaan, db_tugas.id)
-                for jawaban in soal.pilihan:
-                    if isinstance(jawaban, schema.JawabanMultiPilihKunci):
-                        crud.create_jawaban_multi_pilih(db, db_soal.id, jawaban.isi_jawaban, \
-                                                        jawaban.jawaban_ini_benar)
-        print("Save tugas selesai")
+        db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, tugas_baru.judul, \
+                                                       tugas_baru.jumlah_attempt, \
+                                                       tugas_baru.id_video, \
+                                                       tugas_baru.daftar_soal)
         return(db_tugas)
     except NoResultFound:
         raise HTTPException(status_code=400, detail="Invalid video id")
@@ -519,86 +616,141 @@ async def tambah_tugas_ke_video(tugas_baru: schema.TambahTugasPembelajaran,token
 
              
          })
-async def menghapus_tugas_yang_ada_pada_video(id_video:int = Form(...), token:schema.TokenData=Depends(auth.get_token_data), \
+def menghapus_tugas_yang_ada_pada_video(id_video:int = Form(...), token:schema.TokenData=Depends(auth.get_token_data), \
                                               db=Depends(get_db) ):
     try:
         auth.check_if_user_is_mentor(db, token.id)
-        db.rollback()
 
 
-        db_video = crud.read_video_pembelajaran_metadata_by_id(db, id_video)
+        db_video = crud.read_pemilik_video_by_id(db, id_video)
 
         if(db_video.creator_id != token.id):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
 
         if db_video.id_tugas == None:
             raise HTTPException(status_code=400, detail="Tidak ada tugas pada video ini")
-        crud.delete_attemp_pengerjaan_tugas_by_id_tugas(db, db_video.id_tugas)
-        crud.delete_tugas_pembelajaran_by_id(db, db_video.id_tugas) 
+        crud.delete_tugas_pembelajaran_by_id(db, db_video.id_tugas)
         return({"detail":f"Tugas berhasil dihapus"})
     except NoResultFound:
         raise HTTPException(status_code=400, detail="Invalid id")
     
     
+def susun_tugas_untuk_pelajar(tugas_pembelajaran: models.TugasPembelajaran) -> schema.ReadTugasPembelajaran:
+    """
+    Tugas tanpa kunci jawaban, untuk dikerjakan pelajar.
+    """
+    daftar_soal=[]
+    for soal in tugas_pembelajaran.soal:
+        if isinstance(soal, models.SoalABC):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(jawaban.jawaban)
+            daftar_soal.append(schema.SoalABC(pertanyaan=soal.pertanyaan, pilihan_jawaban=_daftar_jawaban))
+        elif isinstance(soal, models.SoalBenarSalah):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(schema.JawabanBenarSalah(isi_jawaban=jawaban.jawaban))
+            daftar_soal.append(schema.SoalBenarSalah(pertanyaan=soal.pertanyaan, \
+                                                     pernyataan_pada_benar=soal.benar,\
+                                                     pernyataan_pada_salah=soal.salah, \
+                                                     daftar_jawaban=_daftar_jawaban)) 
+        elif isinstance(soal, models.SoalMultiPilih):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(schema.JawabanMultiPilih(isi_jawaban=jawaban.jawaban))
+
+            daftar_soal.append(schema.SoalMultiPilih(pertanyaan=soal.pertanyaan, pilihan=_daftar_jawaban))
+    return schema.ReadTugasPembelajaran(
+        judul=tugas_pembelajaran.judul,
+        jumlah_attempt=tugas_pembelajaran.attempt_allowed,
+        daftar_soal=daftar_soal,
+        id=tugas_pembelajaran.id,
+        time_created=tugas_pembelajaran.time_created,
+        time_updated=tugas_pembelajaran.time_updated if tugas_pembelajaran.time_updated \
+            else tugas_pembelajaran.time_created
+    )
+
+def susun_tugas_untuk_mentor(tugas_pembelajaran: models.TugasPembelajaran) -> schema.ReadTugasPembelajaran:
+    """
+    Tugas lengkap dengan kunci jawaban, untuk mentor pembuatnya.
+    """
+    daftar_soal=[]
+    for soal in tugas_pembelajaran.soal:
+        if isinstance(soal, models.SoalABC):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(jawaban.jawaban)
+            daftar_soal.append(schema.SoalABCKunci(pertanyaan=soal.pertanyaan, \
+                                                   pilihan_jawaban=_daftar_jawaban,\
+                                                   index_jawaban_benar=soal.kunci))
+        elif isinstance(soal, models.SoalBenarSalah):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(schema.JawabanBenarSalahKunci(isi_jawaban=jawaban.jawaban, \
+                                                                     jawaban_pernyataan_yang_benar=jawaban.kunci))
+            daftar_soal.append(schema.SoalBenarSalah(pertanyaan=soal.pertanyaan, \
+                                                     pernyataan_pada_benar=soal.benar,\
+                                                     pernyataan_pada_salah=soal.salah, \
+                                                     daftar_jawaban=_daftar_jawaban)) 
+        elif isinstance(soal, models.SoalMultiPilih):
+            _daftar_jawaban = []
+            for jawaban in soal.pilihan:
+                _daftar_jawaban.append(schema.JawabanMultiPilihKunci(isi_jawaban=jawaban.jawaban, \
+                    jawaban_ini_benar=jawaban.benar))
+
+            daftar_soal.append(schema.SoalMultiPilih(pertanyaan=soal.pertanyaan, pilihan=_daftar_jawaban))
+    return schema.ReadTugasPembelajaran(
+        judul=tugas_pembelajaran.judul,
+        jumlah_attempt=tugas_pembelajaran.attempt_allowed,
+        daftar_soal=daftar_soal,
+        id=tugas_pembelajaran.id,
+        time_created=tugas_pembelajaran.time_created,
+        time_updated=tugas_pembelajaran.time_updated if tugas_pembelajaran.time_updated \
+            else tugas_pembelajaran.time_created
+    )
+
+def snapshot_tugas(db: Session, id_tugas: int, view: str) -> Response:
+    """
+    Response JSON tugas dari cache; saat miss tugas dibaca dan diserialisasi sekali.
+    """
+    data = cache.tugas_snapshot.get((id_tugas, view))
+    status_cache = "HIT"
+    if data is None:
+        status_cache = "MISS"
+        versi = cache.versi_tugas(id_tugas)
+        tugas_pembelajaran = crud.read_tugas_pembelajaran_lengkap_by_id(db, id_tugas)
+        susun = susun_tugas_untuk_mentor if view == "mentor" else susun_tugas_untuk_pelajar
+        data = json.dumps(jsonable_encoder(susun(tugas_pembelajaran)), ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode("utf-8")
+        cache.simpan_snapshot_tugas(id_tugas, view, versi, data)
+    return Response(content=data, media_type="application/json", headers={"X-Cache": status_cache})
+
 @app.get("/video/tugas", response_model=schema.ReadTugasPembelajaran)
-async def mengakses_soal_yang_ada_pada_video(id_video:int = Query(default=None, description="Id video dari tugas"), \
+def mengakses_soal_yang_ada_pada_video(id_video:int = Query(default=None, description="Id video dari tugas"), \
                                              token:schema.TokenData=Depends(auth.get_token_data), \
                                              db=Depends(get_db)):
     try:
         if(id_video == None):
             raise HTTPException(status_code=400, detail="Invalid id")
-        db_video = crud.read_video_pembelajaran_metadata_by_id(db, id_video)
+        db_video = crud.read_pemilik_video_by_id(db, id_video)
 
         if db_video.id_tugas == None:
             raise HTTPException(status_code=400, detail="Tidak ada tugas pada video ini")
         
-        tugas_pembelajaran = crud.read_tugas_pembelajaran_by_id(db,db_video.id_tugas )
-        daftar_soal=[]
-        for soal in tugas_pembelajaran.soal:
-            if isinstance(soal, models.SoalABC):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(jawaban.jawaban)
-                daftar_soal.append(schema.SoalABC(pertanyaan=soal.pertanyaan, pilihan_jawaban=_daftar_jawaban))
-            elif isinstance(soal, models.SoalBenarSalah):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(schema.JawabanBenarSalah(isi_jawaban=jawaban.jawaban))
-                daftar_soal.append(schema.SoalBenarSalah(pertanyaan=soal.pertanyaan, \
-                                                         pernyataan_pada_benar=soal.benar,\
-                                                         pernyataan_pada_salah=soal.salah, \
-                                                         daftar_jawaban=_daftar_jawaban)) 
-            elif isinstance(soal, models.SoalMultiPilih):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(schema.JawabanMultiPilih(isi_jawaban=jawaban.jawaban))
-
-                daftar_soal.append(schema.SoalMultiPilih(pertanyaan=soal.pertanyaan, pilihan=_daftar_jawaban))
-        return schema.ReadTugasPembelajaran(
-            judul=tugas_pembelajaran.judul,
-            jumlah_attempt=tugas_pembelajaran.attempt_allowed,
-            daftar_soal=daftar_soal,
-            id=tugas_pembelajaran.id,
-            time_created=tugas_pembelajaran.time_created,
-            time_updated=tugas_pembelajaran.time_updated if tugas_pembelajaran.time_updated \
-                else tugas_pembelajaran.time_created
-        )
-            
-        
+        return snapshot_tugas(db, db_video.id_tugas, "pelajar")
     except NoResultFound:
         raise HTTPException(status_code=400, detail="Invalid id")
 
 
 @app.get("/video/tugas/edit", response_model=schema.ReadTugasPembelajaran)
-async def lihat_soal_pada_video_untuk_mentor(id_video:int = Form(...), \
+def lihat_soal_pada_video_untuk_mentor(id_video:int = Form(...), \
                                              token:schema.TokenData=Depends(auth.get_token_data), \
                                              db=Depends(get_db)):
     try:
         auth.check_if_user_is_mentor(db, token.id)
-        db.rollback()
         
 
-        db_video = crud.read_video_pembelajaran_metadata_by_id(db, id_video)
+        db_video = crud.read_pemilik_video_by_id(db, id_video)
 
         if(db_video.creator_id != token.id):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
@@ -606,108 +758,186 @@ async def lihat_soal_pada_video_untuk_mentor(id_video:int = Form(...), \
         if db_video.id_tugas == None:
             raise HTTPException(status_code=400, detail="Tidak ada tugas pada video ini")
         
-        tugas_pembelajaran = crud.read_tugas_pembelajaran_by_id(db,db_video.id_tugas )
-        daftar_soal=[]
-        for soal in tugas_pembelajaran.soal:
-            if isinstance(soal, models.SoalABC):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(jawaban.jawaban)
-                daftar_soal.append(schema.SoalABCKunci(pertanyaan=soal.pertanyaan, \
-                                                       pilihan_jawaban=_daftar_jawaban,\
-                                                       index_jawaban_benar=soal.kunci))
-            elif isinstance(soal, models.SoalBenarSalah):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(schema.JawabanBenarSalahKunci(isi_jawaban=jawaban.jawaban, \
-                                                                         jawaban_pernyataan_yang_benar=jawaban.kunci))
-                daftar_soal.append(schema.SoalBenarSalah(pertanyaan=soal.pertanyaan, \
-                                                         pernyataan_pada_benar=soal.benar,\
-                                                         pernyataan_pada_salah=soal.salah, \
-                                                         daftar_jawaban=_daftar_jawaban)) 
-            elif isinstance(soal, models.SoalMultiPilih):
-                _daftar_jawaban = []
-                for jawaban in soal.pilihan:
-                    _daftar_jawaban.append(schema.JawabanMultiPilihKunci(isi_jawaban=jawaban.jawaban, \
-                        jawaban_ini_benar=jawaban.benar))
-
-                daftar_soal.append(schema.SoalMultiPilih(pertanyaan=soal.pertanyaan, pilihan=_daftar_jawaban))
-        return schema.ReadTugasPembelajaran(
-            judul=tugas_pembelajaran.judul,
-            jumlah_attempt=tugas_pembelajaran.attempt_allowed,
-            daftar_soal=daftar_soal,
-            id=tugas_pembelajaran.id,
-            time_created=tugas_pembelajaran.time_created,
-            time_updated=tugas_pembelajaran.time_updated if tugas_pembelajaran.time_updated \
-                else tugas_pembelajaran.time_created
-        )
-            
-        
+        return snapshot_tugas(db, db_video.id_tugas, "mentor")
     except NoResultFound:
         raise HTTPException(status_code=400, detail="Invalid id")
 
 @app.post("/video/tugas/kumpul", response_model=schema.attempt_mengerjakan_tugas)
-async def kirim_jawaban_tugas(format_jawaban:schema.format_kirim_jawaban_tugas,\
+def kirim_jawaban_tugas(format_jawaban:schema.format_kirim_jawaban_tugas,\
                               token: schema.TokenData = Depends(auth.get_token_data),\
                               db:Session = Depends(get_db)):
     try:
-        db_tugas = crud.read_tugas_pembelajaran_by_id(db, format_jawaban.id_tugas)
-        if(len(crud.read_attempt_mengerjakan_tugas(db, db_tugas.id, token.id)) >= db_tugas.attempt_allowed):
-            raise HTTPException(status.HTTP_403_FORBIDDEN, "Max attempt reached")
-        
-        if(db_tugas.video is None):
+        kunci = grading.read_kunci_jawaban(db, format_jawaban.id_tugas)
+        if(not kunci.ada_video):
             raise HTTPException(status.HTTP_400_BAD_REQUEST)
         
-        jumlah_soal = len(db_tugas.soal)
-        if( jumlah_soal != len(format_jawaban.jawaban)):
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Length missmatch")
-        
-        jawaban_benar = 0.0
-
-        for i in range(jumlah_soal):
-            soal = db_tugas.soal[i]
-            if isinstance(soal, models.SoalABC):
-                
-                if(soal.kunci == int(format_jawaban.jawaban[i])):
-                    jawaban_benar += 1.0
-            elif isinstance(soal, models.SoalBenarSalah):
-                jumlah_jawaban = len(soal.pilihan)
-                yang_benar = 0
-                if(len(soal.pilihan) != len(format_jawaban.jawaban[i])):
-                    raise HTTPException(status.HTTP_400_BAD_REQUEST,"Length not match")
-                for j in range(jumlah_jawaban):
-                    if(int(soal.pilihan[j].kunci) == int(format_jawaban.jawaban[i][j])):
-                        yang_benar += 1
-                jawaban_benar += yang_benar/jumlah_jawaban
-
-            elif isinstance(soal, models.SoalMultiPilih):
-                jumlah_jawaban = len(soal.pilihan)
-                yang_benar = 0
-                if(len(soal.pilihan) != len(format_jawaban.jawaban[i])):
-                    raise HTTPException(status.HTTP_400_BAD_REQUEST,"Length not match")
-                for j in range(jumlah_jawaban):
-                    if(int(soal.pilihan[j].benar) == int(format_jawaban.jawaban[i][j])):
-                        yang_benar += 1
-                jawaban_benar += yang_benar/jumlah_jawaban
-        nilai:float = jawaban_benar/jumlah_soal
-        db_attempt = crud.create_new_attempt_mengerjakan_tugas(db, token.id, db_tugas.id, nilai,\
-                     format_jawaban.waktu_mulai, format_jawaban.waktu_selesai)
+        try:
+            nilai, per_soal = grading.nilai_per_soal(kunci, format_jawaban.jawaban)
+        except grading.JawabanTidakValid as e:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
+        try:
+            # batas attempt dicek dengan mengunci baris rekap di transaksi insert
+            db_attempt = crud.create_new_attempt_mengerjakan_tugas(db, token.id, kunci.id_tugas, nilai,\
+                         format_jawaban.waktu_mulai, format_jawaban.waktu_selesai, kunci.attempt_allowed,\
+                         kunci=kunci, per_soal=per_soal)
+        except crud.BatasAttemptTercapai:
+            raise HTTPException(status.HTTP_403_FORBIDDEN, "Max attempt reached")
+        leaderboard.catat_nilai(token.id, kunci.id_tugas, db_attempt.nilai, kunci.mapel)
 
         return db_attempt
 
     except NoResultFound:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid id")
     
-@app.get("/video/tugas/nilai", response_model=List[schema.attempt_mengerjakan_tugas])
-async def melihat_nilai_pelajar(id_pelajar:int = None, id_tugas:int = None, limit:int = None, page:int=None, \
-        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic),db:Session = Depends(get_db) ):
+@app.post("/video/tugas/kumpul/antrian", response_model=schema.ReceiptPengumpulan, status_code=status.HTTP_202_ACCEPTED)
+async def kirim_jawaban_tugas_ke_antrian(format_jawaban:schema.format_kirim_jawaban_tugas,\
+                              token: schema.TokenData = Depends(auth.get_token_data)):
+    """
+    Sama seperti /video/tugas/kumpul tetapi dinilai di background.
+    Hasilnya dilihat lewat /video/tugas/kumpul/antrian/{receipt}.
+    """
+    try:
+        receipt = antrian_pengumpulan.kirim(token.id, format_jawaban.id_tugas, format_jawaban.jawaban,\
+                                           format_jawaban.waktu_mulai, format_jawaban.waktu_selesai)
+    except submission_queue.AntrianTidakAktif:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Antrian tidak aktif, gunakan /video/tugas/kumpul")
+    except submission_queue.AntrianPenuh:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, "Antrian penuh, coba lagi nanti", headers={"Retry-After": "5"})
+    return {"receipt": receipt, "status": submission_queue.MENUNGGU}
+
+@app.get("/video/tugas/kumpul/antrian/{receipt}", response_model=schema.StatusPengumpulan)
+async def lihat_hasil_antrian(receipt: str, token: schema.TokenData = Depends(auth.get_token_data)):
+    hasil = antrian_pengumpulan.status(receipt)
+    if hasil is None or hasil["id_pelajar"] != token.id:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Receipt tidak ditemukan")
+    return hasil
+
+@app.get("/admin/leaderboard/stats", response_model=schema.StatistikLeaderboard)
+def statistik_leaderboard(_ = Depends(auth.get_admin_token)):
+    return leaderboard.stats()
+
+@app.get("/admin/antrian/stats", response_model=schema.StatistikAntrian)
+async def statistik_antrian(_ = Depends(auth.get_admin_token)):
+    return antrian_pengumpulan.stats()
+
+@app.get("/video/tugas/nilai", response_model=List[schema.attempt_mengerjakan_tugas], responses=RESPON_LIST_CURSOR)
+def melihat_nilai_pelajar(response: Response, id_pelajar:int = None, id_tugas:int = None, limit:int = None, page:int=None, \
+        cursor:Optional[str] = Query(None, description=DESKRIPSI_CURSOR), \
+        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic),db:Session = Depends(get_read_db) ):
     try:
-        return crud.read_nilai_tugas_filter_by(db=db, id_tugas=id_tugas, id_pelajar=id_pelajar, limit=limit, page=page)    
+        hasil = crud.read_nilai_tugas_filter_by(db=db, id_tugas=id_tugas, id_pelajar=id_pelajar, limit=limit, page=page, cursor=cursor)
+        return dengan_cursor_berikutnya(response, hasil, limit, page, crud.KUNCI_ATTEMPT)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
 
-@app.get("/video/list", response_model=List[schema.VideoDenganMateri])
+@app.get("/video/tugas/rekap", response_model=List[schema.RekapNilaiTugas], responses=RESPON_LIST_CURSOR)
+def melihat_rekap_nilai_pelajar(response: Response, id_pelajar:int = None, id_tugas:int = None, limit:int = None, page:int=None, \
+        cursor:Optional[str] = Query(None, description=DESKRIPSI_CURSOR), \
+        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic),db:Session = Depends(get_read_db) ):
+    """
+    Jumlah attempt, nilai terbaik, terakhir dan rata-rata per pelajar per tugas.
+    """
+    try:
+        hasil = crud.read_rekap_nilai_filter_by(db=db, id_tugas=id_tugas, id_pelajar=id_pelajar, limit=limit, page=page, cursor=cursor)
+        return dengan_cursor_berikutnya(response, hasil, limit, page, crud.KUNCI_REKAP)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
+
+@app.get("/video/tugas/rekap/mapel", response_model=List[schema.RekapNilaiMapel])
+def melihat_rekap_nilai_per_mapel(id_pelajar:int, \
+        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic),db:Session = Depends(get_read_db) ):
+    try:
+        return crud.read_rekap_nilai_per_mapel(db, id_pelajar)
+    except Exception as e:
+        raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
+
+@app.get("/video/tugas/statistik", response_model=List[schema.StatistikSoal],
+         responses={
+             401: {"description": "Could not validate credentials"},
+             403: {"description": "creator id missmatch"},
+             400: {"description": "Tidak ada tugas pada video ini"},
+         })
+def statistik_soal_pada_video(id_video:int, token:schema.TokenData=Depends(auth.get_token_data), \
+                              db:Session = Depends(get_read_db)):
+    """
+    Persen benar, distribusi jawaban dan daya beda tiap soal, untuk mentor pembuat video.
+    """
+    try:
+        auth.check_if_user_is_mentor(db, token.id)
+
+        db_video = crud.read_pemilik_video_by_id(db, id_video)
+
+        if(db_video.creator_id != token.id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
+
+        if db_video.id_tugas == None:
+            raise HTTPException(status_code=400, detail="Tidak ada tugas pada video ini")
+
+        return analisis_soal.read_statistik_soal(db, db_video.id_tugas)
+    except NoResultFound:
+        raise HTTPException(status_code=400, detail="Invalid id")
+
+@app.post("/video/tugas/regrade", response_model=schema.StatusRegrade, status_code=status.HTTP_202_ACCEPTED,
+          responses={
+              401: {"description": "Could not validate credentials"},
+              403: {"description": "creator id missmatch"},
+              400: {"description": "Tidak ada tugas pada video ini"},
+          })
+def regrade_tugas_pada_video(id_video:int = Form(...), token:schema.TokenData=Depends(auth.get_token_data), \
+                             db:Session = Depends(get_db)):
+    """
+    Menilai ulang semua attempt tugas dengan kunci jawaban sekarang, di background.
+    Job yang belum selesai (mis. gagal) dilanjutkan dari checkpoint-nya.
+    """
+    try:
+        auth.check_if_user_is_mentor(db, token.id)
+
+        db_video = crud.read_pemilik_video_by_id(db, id_video)
+
+        if(db_video.creator_id != token.id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
+
+        if db_video.id_tugas == None:
+            raise HTTPException(status_code=400, detail="Tidak ada tugas pada video ini")
+
+        job = regrade.buat_job(db, db_video.id_tugas)
+        regrade.mulai(SessionLocal, job.id)
+        return job
+    except NoResultFound:
+        raise HTTPException(status_code=400, detail="Invalid id")
+
+@app.get("/video/tugas/regrade/{id_regrade}", response_model=schema.StatusRegrade,
+         responses={
+             401: {"description": "Could not validate credentials"},
+             403: {"description": "creator id missmatch"},
+             404: {"description": "Regrade tidak ditemukan"},
+         })
+def status_regrade(id_regrade:int, token:schema.TokenData=Depends(auth.get_token_data), db:Session = Depends(get_read_db)):
+    try:
+        auth.check_if_user_is_mentor(db, token.id)
+
+        job = regrade.read_job(db, id_regrade)
+        if crud.read_pembuat_tugas_by_id(db, job.id_tugas) != token.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="creator id missmatch")
+        return job
+    except NoResultFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Regrade tidak ditemukan")
+
+@app.get("/video/tugas/leaderboard", response_model=schema.Leaderboard)
+async def leaderboard_tugas(id_tugas:int, limit:int = Query(10, ge=1, le=100), \
+        id_pelajar:Optional[int] = Query(None, description="sertakan peringkat pelajar ini"), \
+        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic)):
+    """
+    Peringkat nilai terbaik pelajar pada satu tugas, dari memori (tanpa query database).
+    """
+    return leaderboard.papan_tugas(id_tugas, limit, id_pelajar)
+
+@app.get("/video/list", response_model=List[schema.VideoDenganMateri], responses=RESPON_LIST_CURSOR)
 async def melihat_daftar_video_milik_mentor(
     id_mentor: Optional[int] = Query(None, description="ID mentor yang dicari"),
     id_tugas: Optional[int] = Query(None, description="ID tugas yang dicari"),
@@ -715,31 +945,35 @@ async def melihat_daftar_video_milik_mentor(
     judul: Optional[str] = Query(None, description="judul video yang dicari"),
     limit: Optional[int] = Query(None, description="Limit the number of results"),
     page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
+    cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
     token: Union[schema.TokenData, schema.AdminTokenData] = Depends(auth.get_token_dynamic),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     try:
-        return crud.read_all_video_pembelajaran(
+        hasil = await crud_async.read_ringkas_video_pembelajaran(
             db, 
             id_mentor=id_mentor, 
             id_tugas=id_tugas,
             id_materi=id_materi,
             judul=judul,
             limit=limit, 
-            page=page
+            page=page,
+            cursor=cursor
         )
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_VIDEO)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
 @app.post("/materi/tambah", response_model=schema.Materi)
-async def buat_materi_pembelajaran_baru(
+def buat_materi_pembelajaran_baru(
         materi_baru: schema.schema_pembuatan_materi_pembelajaran_baru, 
         token: Union[schema.TokenData, schema.AdminTokenData] = Depends(auth.get_token_dynamic),
         db: Session = Depends(get_db)
         ):
     if isinstance(token, schema.TokenData):
         auth.check_if_user_is_mentor(db, token.id)
-        db.rollback()
         
 
     if isinstance(materi_baru.mapel, int):
@@ -755,13 +989,13 @@ async def buat_materi_pembelajaran_baru(
     
 
 @app.put("/materi/admin/update", response_model=schema.UpdateMateri) # <- update materi
-async def update_materi(
+def update_materi(
     id: int,
     materi_baru: schema.schema_pembuatan_materi_pembelajaran_baru, 
     token: schema.AdminTokenData = Depends(auth.get_admin_token), 
     db:Session = Depends(get_db)):
     try:
-        if crud.read_admin_by_id(db, token.id) is None:
+        if not crud.admin_ada(db, token.id):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid user id")
         
         try:
@@ -784,16 +1018,29 @@ async def update_materi(
     
 
 @app.delete("/materi/admin/delete", response_model=schema.DeleteMateri) # <- delete materi
-async def delete_materi_menggunakan_id(id:int, token : schema.AdminTokenData=Depends(auth.get_admin_token), db=Depends(get_db) ):
+def delete_materi_menggunakan_id(id:int, token : schema.AdminTokenData=Depends(auth.get_admin_token), db=Depends(get_db) ):
     try:
-        if crud.read_admin_by_id(db, token.id) is None:
+        if not crud.admin_ada(db, token.id):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid user id")
 
         return {"detail":"ok", "row_deleted":crud.delete_materi_pembelajaran_by_id(db, id)}
     except Exception as e:
         raise HTTPException(500, f"something went wrong, details: {str(e)}")
         
-@app.get("/materi/list", response_model=List[schema.MateriDenganDaftarVideo])
+@app.get("/materi/leaderboard", response_model=schema.Leaderboard)
+async def leaderboard_mapel(mapel:str = Query(..., description="id atau nama mapel"), limit:int = Query(10, ge=1, le=100), \
+        id_pelajar:Optional[int] = Query(None, description="sertakan peringkat pelajar ini"), \
+        token:Union[schema.TokenData, schema.AdminTokenData]=Depends(auth.get_token_dynamic)):
+    """
+    Peringkat jumlah nilai terbaik pelajar dari semua tugas pada satu mapel.
+    """
+    try:
+        mapel = models.DaftarMapelSkolastik(int(mapel)) if mapel.isdigit() else models.DaftarMapelSkolastik[mapel]
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="mapel invalid")
+    return leaderboard.papan_mapel(mapel, limit, id_pelajar)
+
+@app.get("/materi/list", response_model=List[schema.MateriDenganPreviewVideo], responses=RESPON_LIST_CURSOR)
 async def read_daftar_materi(
         id_materi:Optional[int] = Query(None, description="id materi yang dicari"),
         id_mapel:Optional[int] = Query(None, description="filter materi dengan id mapel", examples={
@@ -806,25 +1053,58 @@ async def read_daftar_materi(
         }),
         nama_mapel:Optional[str] = Query(None, description="filter materi dengan nama mapel"),
         mapel:Optional[models.DaftarMapelSkolastik] = Query(None, description="filter materi dengan mapel"),
+        preview_video: int = Query(MATERI_PREVIEW_VIDEO, ge=0, le=MATERI_PREVIEW_VIDEO_MAKS,
+                                   description="jumlah video terbaru per materi yang disertakan"),
         limit: Optional[int] = Query(None, description="Limit the number of results"),
         page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
+        cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
         _:Union[schema.TokenData, schema.AdminTokenData] = Depends(auth.get_token_dynamic),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_read_db)
         ):
+    """
+    Daftar materi dengan jumlah video dan beberapa video terbarunya saja.
+    Daftar lengkap video satu materi ada di /materi/video/list.
+    """
     try:
-        return crud.read_materi_pembelajaran_filter_by(
+        hasil, preview = await crud_async.read_ringkas_materi_pembelajaran_filter_by(
             db,
+            preview_video=preview_video,
             id_materi = id_materi,
             id_mapel = id_mapel,
             nama_mapel = nama_mapel,
             mapel = mapel,
             limit=limit,
-            page=page
+            page=page,
+            cursor=cursor
             )
+        daftar = respon_json.susun_semua(hasil)
+        for materi in daftar:
+            materi["video_pembelajaran"] = respon_json.susun_semua(preview.get(materi["id"], []))
+        cursor = pagination.cursor_berikutnya(hasil, limit, page, crud.KUNCI_MATERI)
+        return respon_json.ORJSONResponse(daftar, headers={"X-Next-Cursor": cursor} if cursor is not None else None)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(500, f"something went wrong, details: {str(e)}")
+
+@app.get("/materi/video/list", response_model=List[schema.video_metadata], responses=RESPON_LIST_CURSOR)
+async def read_daftar_video_materi(
+        id_materi: int = Query(..., description="id materi"),
+        limit: Optional[int] = Query(None, description="Limit the number of results"),
+        page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
+        cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
+        _:Union[schema.TokenData, schema.AdminTokenData] = Depends(auth.get_token_dynamic),
+        db: AsyncSession = Depends(get_async_read_db)
+        ):
+    try:
+        hasil = await crud_async.read_ringkas_video_by_materi(db, id_materi, limit=limit, page=page, cursor=cursor)
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_VIDEO)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(500, f"something went wrong, details: {str(e)}")
     
-@app.get("/materi/tugas/list", response_model=List[schema.TugasDenganVideo])
+@app.get("/materi/tugas/list", response_model=List[schema.TugasDenganVideo], responses=RESPON_LIST_CURSOR)
 async def read_daftar_tugas(
         id_tugas:Optional[int] = Query(None, description="id materi yang dicari"), 
         newest:Optional[bool] = Query(True, description="mengurutkan dari yang terbaru"), 
@@ -835,11 +1115,12 @@ async def read_daftar_tugas(
         id_creator: Optional[int] = Query(None, description="filter materi dengan id mentor"),
         limit: Optional[int] = Query(None, description="Limit the number of results"),
         page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
+        cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
         _:Union[schema.TokenData, schema.AdminTokenData] = Depends(auth.get_token_dynamic),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_read_db)
         ):
     try:
-        return crud.read_tugas_pembelajaran_filter_by(
+        hasil = await crud_async.read_ringkas_tugas_pembelajaran_filter_by(
             db,
             id_tugas=id_tugas,
             newest=newest,
@@ -847,15 +1128,19 @@ async def read_daftar_tugas(
             mapel=mapel,
             judul=judul,
             id_materi=id_materi,
-            id_creator=id_creator,
+            id_mentor=id_creator,
             limit=limit,
-            page=page
+            page=page,
+            cursor=cursor
             )
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_TUGAS)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(500, f"something went wrong, details: {str(e)}")
 
-@app.get("/admin/pelajar/list", response_model=list[schema.Pelajar])
-async def lihat_semua_daftar_pelajar(
+@app.get("/admin/pelajar/list", response_model=list[schema.Pelajar], responses=RESPON_LIST_CURSOR)
+def lihat_semua_daftar_pelajar(
     id_pelajar:Optional[int] = Query(None, description="filter dengan id pelajar"),
     email:Optional[str] = Query(None, description="filter dengan email"),
     nama_lengkap:Optional[str] = Query(None, description="filter dengan nama_lengkap"),
@@ -867,11 +1152,12 @@ async def lihat_semua_daftar_pelajar(
     is_member:Optional[bool] = Query(None, description="filter dengan is_member"),
     limit: Optional[int] = Query(None, description="Limit the number of results"),
     page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
+    cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
     _ = Depends(auth.get_admin_token), 
-    db=Depends(get_db)):
+    db=Depends(get_read_db)):
 
     try:
-        return crud.read_user_pelajar_filter_by(
+        hasil = crud.read_ringkas_pelajar_filter_by(
             db,
             id_pelajar=id_pelajar,
             email=email,
@@ -883,13 +1169,17 @@ async def lihat_semua_daftar_pelajar(
             jurusan=jurusan,
             is_member=is_member,
             limit=limit,
-            page=page
+            page=page,
+            cursor=cursor
         )
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_PELAJAR)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
     
-@app.get("/admin/mentor/list", response_model=list[schema.Mentor])
-async def lihat_semua_daftar_mentor(
+@app.get("/admin/mentor/list", response_model=list[schema.Mentor], responses=RESPON_LIST_CURSOR)
+def lihat_semua_daftar_mentor(
     id_mentor: Optional[int] = Query(None, description="Filter by mentor ID"),
     nama_lengkap: Optional[str] = Query(None, description="Filter by full name"),
     time_created: Optional[datetime] = Query(None, description="Filter by time created"),
@@ -899,11 +1189,12 @@ async def lihat_semua_daftar_mentor(
     asal: Optional[str] = Query(None, description="Filter by origin"),
     limit: Optional[int] = Query(None, description="Limit the number of results"),
     page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
+    db: Session = Depends(get_read_db),
     _ = Depends(auth.get_admin_token)
 ):
     try:
-        return crud.read_user_mentor_filter_by(
+        hasil = crud.read_ringkas_mentor_filter_by(
             db,
             id_mentor=id_mentor,
             nama_lengkap=nama_lengkap,
@@ -913,14 +1204,18 @@ async def lihat_semua_daftar_mentor(
             keahlian=keahlian,
             asal=asal,
             limit=limit,
-            page=page
+            page=page,
+            cursor=cursor
         )
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_MENTOR)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
 
 
-@app.get("/admin/admin/list", response_model=list[schema.AdminData])
-async def lihat_semua_daftar_admin(
+@app.get("/admin/admin/list", response_model=list[schema.AdminData], responses=RESPON_LIST_CURSOR)
+def lihat_semua_daftar_admin(
     id_admin: Optional[int] = Query(None, description="Filter by admin ID"),
     nama_lengkap: Optional[str] = Query(None, description="Filter by full name"),
     time_created: Optional[datetime] = Query(None, description="Filter by time created"),
@@ -928,11 +1223,12 @@ async def lihat_semua_daftar_admin(
     created_by: Optional[str] = Query(None, description="Filter by creator"),
     limit: Optional[int] = Query(None, description="Limit the number of results"),
     page: Optional[int] = Query(None, description="Page number for pagination when using limit"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description=DESKRIPSI_CURSOR),
+    db: Session = Depends(get_read_db),
     _ = Depends(auth.get_admin_token)
 ):
     try:
-        return crud.read_admin_filter_by(
+        hasil = crud.read_ringkas_admin_filter_by(
             db,
             id=id_admin,
             nama_lengkap=nama_lengkap,
@@ -940,7 +1236,43 @@ async def lihat_semua_daftar_admin(
             time_updated=time_updated,
             created_by=created_by,
             limit=limit,
-            page=page
+            page=page,
+            cursor=cursor
         )
+        return daftar_cepat(hasil, limit, page, crud.KUNCI_ADMIN)
+    except pagination.CursorTidakValid as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
\ No newline at end of file
+        raise HTTPException(500, detail=f'Unknown error, details: {str(e)}')
+
+
+def respon_export(db: Session, statement, format: str, nama_file: str) -> StreamingResponse:
+    if format not in export.MEDIA_TYPE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format harus csv atau ndjson")
+    # get_bind tanpa clause selalu primary; dengan statement SELECT-nya replika yang dipilih session ini
+    return StreamingResponse(
+        export.stream(sessionmaker(bind=db.get_bind(clause=statement)), statement, format),
+        media_type=export.MEDIA_TYPE[format],
+        headers={"Content-Disposition": f'attachment; filename="{nama_file}.{format}"'},
+    )
+
+@app.get("/admin/export/nilai", response_class=StreamingResponse,
+         responses={200: {"content": {"text/csv": {}, "application/x-ndjson": {}}}})
+def export_nilai(
+    format: str = Query(export.CSV, description="csv atau ndjson"),
+    id_tugas: Optional[int] = Query(None, description="filter dengan id tugas"),
+    id_pelajar: Optional[int] = Query(None, description="filter dengan id pelajar"),
+    _ = Depends(auth.get_admin_token),
+    db: Session = Depends(get_read_db)):
+    """
+    Semua attempt beserta nama pelajar dan judul tugas, di-stream tanpa paginasi.
+    """
+    return respon_export(db, export.nilai_stmt(id_tugas, id_pelajar), format, "nilai")
+
+@app.get("/admin/export/pelajar", response_class=StreamingResponse,
+         responses={200: {"content": {"text/csv": {}, "application/x-ndjson": {}}}})
+def export_pelajar(
+    format: str = Query(export.CSV, description="csv atau ndjson"),
+    _ = Depends(auth.get_admin_token),
+    db: Session = Depends(get_read_db)):
+    return respon_export(db, export.pelajar_stmt(), format, "pelajar")
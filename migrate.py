@@ -0,0 +1,106 @@
+"""
+Bootstrap database: membuat database (jika belum ada) beserta semua tabelnya,
+kolom dan index yang belum ada di database lama.
+Dijalankan sekali setiap deploy, bukan setiap kali aplikasi di-import:
+
+    python migrate.py
+
+Penghitung (materi.jumlah_video dan tugas_pembelajaran.jumlah_soal) dan rekap
+attempt bisa diperbaiki kapan saja dengan:
+
+    python migrate.py --hitung-ulang
+"""
+import argparse
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy_utils import database_exists, create_database
+
+import crud
+import database
+import models
+
+
+def bootstrap(engine=None):
+    engine = engine or database.engine
+    if not database_exists(engine.url):
+        create_database(engine.url)
+    models.Base.metadata.create_all(bind=engine)
+    kolom_baru = tambah_kolom_yang_belum_ada(engine)
+    if any(kolom.startswith("rekap_attempt_tugas.") for kolom in kolom_baru):
+        hitung_ulang_rekap_attempt(engine)
+    if any(kolom in KOLOM_PENGHITUNG for kolom in kolom_baru):
+        hitung_ulang_penghitung(engine)
+    return kolom_baru + buat_index_yang_belum_ada(engine)
+
+
+def tambah_kolom_yang_belum_ada(engine):
+    """
+    Menambahkan kolom baru di models.py ke tabel yang sudah ada (ALTER TABLE
+    ADD COLUMN). Kolom baru harus nullable atau punya server_default.
+    Mengembalikan "tabel.kolom" yang baru ditambahkan.
+    """
+    inspector = inspect(engine)
+    ditambah = []
+    with engine.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            sudah_ada = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in sudah_ada:
+                    definisi = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {engine.dialect.identifier_preparer.format_table(table)} ADD COLUMN {definisi}")
+                    ditambah.append(f"{table.name}.{column.name}")
+    return ditambah
+
+
+def hitung_ulang_rekap_attempt(engine):
+    """
+    Mengisi ulang semua kolom rekap_attempt_tugas dari mengerjakan_tugas.
+    """
+    with engine.begin() as conn:
+        conn.execute(crud.hitung_ulang_rekap_attempt_stmt())
+
+
+KOLOM_PENGHITUNG = {"materi_pembelajaran.jumlah_video", "tugas_pembelajaran.jumlah_soal"}
+
+def hitung_ulang_penghitung(engine):
+    """
+    Mengisi ulang kolom penghitung materi dan tugas dari baris video dan soal,
+    satu UPDATE per tabel.
+    """
+    with engine.begin() as conn:
+        for statement in crud.hitung_ulang_penghitung_stmts():
+            conn.execute(statement)
+
+
+def buat_index_yang_belum_ada(engine):
+    """
+    create_all tidak menyentuh tabel yang sudah ada, jadi index yang ditambahkan
+    di models.py setelah tabel dibuat harus dibuat di sini.
+    Mengembalikan nama index yang baru dibuat.
+    """
+    inspector = inspect(engine)
+    dibuat = []
+    for table in models.Base.metadata.sorted_tables:
+        sudah_ada = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in sudah_ada:
+                index.create(bind=engine)
+                dibuat.append(index.name)
+    return dibuat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bootstrap database")
+    parser.add_argument("--hitung-ulang", action="store_true",
+                        help="hitung ulang semua penghitung dan rekap attempt dari datanya")
+    args = parser.parse_args()
+
+    perubahan = bootstrap()
+    if perubahan:
+        print("kolom/index baru:", ", ".join(perubahan))
+    if args.hitung_ulang:
+        hitung_ulang_rekap_attempt(database.engine)
+        hitung_ulang_penghitung(database.engine)
+        print("penghitung dan rekap attempt dihitung ulang")
+    print("database siap:", database.engine.url.render_as_string(hide_password=True))
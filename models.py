@@ -3,16 +3,19 @@ Models digunakan sebagai table database
 """
 import os
 import enum
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, func, Enum, BigInteger
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Boolean, Column, DateTime, Double, Float, ForeignKey, Integer, String, func, Enum, BigInteger, Index, insert_sentinel
+from sqlalchemy.orm import relationship, backref, configure_mappers
 
 from database import Base
 
+# BIGINT tidak bisa autoincrement di SQLite, jadi dipakai INTEGER di sana
+BigIntegerId = BigInteger().with_variant(Integer, "sqlite")
+
 
 class User(Base):
     __tablename__ = "user"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
     email = Column(String(255), unique=True, index=True)
     nama_lengkap = Column(String(255))
     hashed_password =  Column(String(255))
@@ -70,21 +73,23 @@ class DaftarMapelSkolastik(enum.Enum):
 class Materi(Base):
     __tablename__ = "materi_pembelajaran"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
     nama = Column(String(255), unique=True) 
     mapel = Column(Enum(DaftarMapelSkolastik))
+    # penghitung yang diperbarui oleh crud (lihat crud.ubah_penghitung_stmt)
+    jumlah_video = Column(Integer, nullable=False, default=0, server_default="0")
 
 class VideoPembelajaran(Base):
     __tablename__ = "video_pembelajaran"
 
     # Metadata
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    creator_id = Column(BigInteger, ForeignKey("mentor.uid"))
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
+    creator_id = Column(BigInteger, ForeignKey("mentor.uid"), index=True)
     time_created = Column(DateTime(timezone=True), server_default=func.now())
 
     # Content
     judul = Column(String(127), nullable=False)
-    id_materi = Column(BigInteger, ForeignKey("materi_pembelajaran.id"))
+    id_materi = Column(BigInteger, ForeignKey("materi_pembelajaran.id"), index=True)
     id_tugas = Column(BigInteger, ForeignKey("tugas_pembelajaran.id"), unique=True)
 
     s3_key = Column(String(255))
@@ -98,27 +103,32 @@ class VideoPembelajaran(Base):
 class TugasPembelajaran(Base):
     __tablename__ = "tugas_pembelajaran"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True) # read: ada, post: tidak
-    time_created = Column(DateTime(timezone=True), server_default=func.now()) # read: ada, post: tidak
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True) # read: ada, post: tidak
+    time_created = Column(DateTime(timezone=True), server_default=func.now(), index=True) # read: ada, post: tidak
     time_updated = Column(DateTime(timezone=True), onupdate=func.now()) # read: ada, post: tidak
 
     judul = Column(String(255))
     attempt_allowed = Column(Integer)
+    # penghitung yang diperbarui oleh crud (lihat crud.ubah_penghitung_stmt)
+    jumlah_soal = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relation
     video = relationship(VideoPembelajaran, backref="tugas_pembelajaran", uselist=False, viewonly=True) # read tidak, post ada
-    soal = relationship("Soal", backref="tugas_pembelajaran")
+    soal = relationship("Soal", backref="tugas_pembelajaran", order_by="Soal.id")
     attemp = relationship("AttemptMengerjakanTugas")
 
 class Soal(Base):
     __tablename__ = "soal"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
     pertanyaan = Column(String(512), nullable=False)
     type = Column(String(32))
 
     
-    id_tugas = Column(BigInteger, ForeignKey('tugas_pembelajaran.id'))
+    id_tugas = Column(BigInteger, ForeignKey('tugas_pembelajaran.id'), index=True)
+    # diisi SQLAlchemy saat insert banyak baris, agar id dari RETURNING bisa
+    # dipasangkan dengan urutan baris (lihat crud._insert_dengan_id)
+    sentinel = insert_sentinel()
     __mapper_args__ = {'polymorphic_on': type}
 
 class SoalABC(Soal):
@@ -128,13 +138,13 @@ class SoalABC(Soal):
     id_soal = Column(BigInteger, ForeignKey('soal.id'), primary_key=True)
 
     kunci = Column(Integer) 
-    pilihan = relationship("JawabanABC", backref="soal_pilihan_ganda")
+    pilihan = relationship("JawabanABC", backref="soal_pilihan_ganda", order_by="JawabanABC.id")
 
 class JawabanABC(Base):
     __tablename__ = "jawaban_pilihan_ganda"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    id_soal = Column(BigInteger, ForeignKey('soal_pilihan_ganda.id_soal'))
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
+    id_soal = Column(BigInteger, ForeignKey('soal_pilihan_ganda.id_soal'), index=True)
     jawaban = Column(String(127))
 
 class SoalBenarSalah(Soal):
@@ -145,13 +155,13 @@ class SoalBenarSalah(Soal):
     benar = Column(String(32))
     salah = Column(String(32))
 
-    pilihan = relationship("JawabanBenarSalah", backref="soal_benar_salah")
+    pilihan = relationship("JawabanBenarSalah", backref="soal_benar_salah", order_by="JawabanBenarSalah.id")
 
 class JawabanBenarSalah(Base):
     __tablename__ = "jawaban_benar_salah"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    id_soal = Column(BigInteger, ForeignKey('soal_benar_salah.id_soal'))
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
+    id_soal = Column(BigInteger, ForeignKey('soal_benar_salah.id_soal'), index=True)
     jawaban = Column(String(127))
     kunci = Column(Boolean)
 
@@ -162,24 +172,99 @@ class SoalMultiPilih(Soal):
 
     id_soal = Column(BigInteger, ForeignKey('soal.id'), primary_key=True)
 
-    pilihan = relationship("JawabanMultiPilih", backref="soal_multi_pilih")
+    pilihan = relationship("JawabanMultiPilih", backref="soal_multi_pilih", order_by="JawabanMultiPilih.id")
 
 
 class JawabanMultiPilih(Base):
     __tablename__ = "jawaban_multi_pilih"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
-    id_soal = Column(BigInteger, ForeignKey('soal_multi_pilih.id_soal'))
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
+    id_soal = Column(BigInteger, ForeignKey('soal_multi_pilih.id_soal'), index=True)
     jawaban = Column(String(127))
     benar = Column(Boolean)
 
 class AttemptMengerjakanTugas(Base):
     __tablename__ = "mengerjakan_tugas"
 
-    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
     waktu_mulai = Column(DateTime(timezone=True))
     waktu_selesai = Column(DateTime(timezone=True))
     nilai = Column(Float)
 
     id_pelajar = Column(BigInteger, ForeignKey("pelajar.uid"))
-    id_tugas = Column(BigInteger, ForeignKey("tugas_pembelajaran.id"))
\ No newline at end of file
+    id_tugas = Column(BigInteger, ForeignKey("tugas_pembelajaran.id"), index=True)
+    # lihat Soal.sentinel
+    sentinel = insert_sentinel()
+
+    # cek batas attempt dan daftar nilai per pelajar; id_pelajar saja juga memakai index ini
+    __table_args__ = (
+        Index("ix_mengerjakan_tugas_id_pelajar_id_tugas", "id_pelajar", "id_tugas"),
+    )
+
+class RekapAttemptTugas(Base):
+    """
+    Jumlah attempt dan rekap nilai per (pelajar, tugas), diperbarui dalam
+    transaksi yang sama dengan insert attempt. Baris ini dikunci (UPDATE)
+    sehingga batas attempt_allowed tetap berlaku saat ada kiriman bersamaan.
+    """
+    __tablename__ = "rekap_attempt_tugas"
+
+    id_pelajar = Column(BigInteger, ForeignKey("pelajar.uid"), primary_key=True)
+    id_tugas = Column(BigInteger, ForeignKey("tugas_pembelajaran.id"), primary_key=True, index=True)
+    jumlah_attempt = Column(Integer, nullable=False, default=0)
+    # Double seperti JawabanAttempt.skor: total_nilai terus dijumlahkan
+    nilai_terbaik = Column(Double)
+    nilai_terakhir = Column(Double)
+    total_nilai = Column(Double, nullable=False, default=0, server_default="0")
+
+    @property
+    def rata_rata(self):
+        if not self.jumlah_attempt:
+            return None
+        return self.total_nilai / self.jumlah_attempt
+
+class JawabanAttempt(Base):
+    """
+    Jawaban pelajar per soal pada satu attempt, di-insert bersama attempt-nya.
+    jawaban: soal ABC index pilihan, soal lain bit ke-i = pilihan ke-i dijawab 1.
+    """
+    __tablename__ = "jawaban_attempt"
+
+    id_attempt = Column(BigInteger, ForeignKey("mengerjakan_tugas.id"), primary_key=True)
+    id_soal = Column(BigInteger, ForeignKey("soal.id"), primary_key=True, index=True)
+    jawaban = Column(Integer)
+    # Double, bukan Float: FLOAT di MySQL single precision
+    skor = Column(Double)
+
+class RegradeTugas(Base):
+    """
+    Job penilaian ulang attempt satu tugas (regrade.py). id_attempt_terakhir
+    adalah checkpoint: attempt sampai id ini sudah dinilai ulang dan di-commit
+    bersama baris ini, jadi job bisa dilanjutkan setelah proses mati.
+    sidik_kunci: grading.sidik_kunci dari kunci yang dipakai sejak checkpoint
+    di-reset; jika kunci berubah lagi job dinilai ulang dari awal.
+    """
+    __tablename__ = "regrade_tugas"
+
+    id = Column(BigIntegerId, primary_key=True, index=True, autoincrement=True)
+    id_tugas = Column(BigInteger, ForeignKey("tugas_pembelajaran.id"), index=True)
+    status = Column(String(16), nullable=False)
+    id_attempt_terakhir = Column(BigInteger, nullable=False, default=0)
+    sidik_kunci = Column(String(64))
+    jumlah_total = Column(Integer, nullable=False, default=0)
+    jumlah_diproses = Column(Integer, nullable=False, default=0)
+    jumlah_berubah = Column(Integer, nullable=False, default=0)
+    jumlah_dilewati = Column(Integer, nullable=False, default=0)
+    pesan = Column(String(255))
+    time_created = Column(DateTime(timezone=True), server_default=func.now())
+    time_updated = Column(DateTime(timezone=True))
+
+    @property
+    def persen(self):
+        if not self.jumlah_total:
+            return 100.0 if self.status == "selesai" else 0.0
+        return min(100.0, 100 * self.jumlah_diproses / self.jumlah_total)
+
+
+# backref (mis. Materi.video_pembelajaran) baru ada setelah mapper dikonfigurasi
+configure_mappers()
@@ -0,0 +1,93 @@
+"""
+Pagination untuk fungsi-fungsi list di crud.py dan crud_async.py.
+
+- limit + page: pagination lama dengan OFFSET (tetap didukung).
+- limit tanpa page, atau cursor: keyset pagination. Hasil diurutkan menurut
+  kolom kunci dan halaman berikutnya dimulai setelah kunci baris terakhir,
+  sehingga halaman dalam tidak perlu membuang baris dan tidak bergeser saat
+  ada baris baru.
+
+Cursor adalah nilai kunci baris terakhir dalam bentuk JSON yang di-encode
+base64, dan bisa dipakai untuk Query (ORM lama) maupun Select. Endpoint list
+mengirim cursor halaman berikutnya di header X-Next-Cursor (body tetap list).
+page dan cursor tidak bisa dipakai bersamaan.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from sqlalchemy import and_, or_, DateTime
+
+
+class CursorTidakValid(ValueError):
+    pass
+
+
+def encode_cursor(values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, kunci) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise CursorTidakValid("cursor tidak valid")
+    if not isinstance(values, list) or len(values) != len(kunci):
+        raise CursorTidakValid("cursor tidak valid")
+
+    hasil = []
+    for column, value in zip(kunci, values):
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise CursorTidakValid("cursor tidak valid")
+        hasil.append(value)
+    return hasil
+
+
+def _setelah(kunci, values, turun):
+    """
+    (k1, k2, ...) > (v1, v2, ...) ditulis sebagai OR bertingkat agar bisa
+    memakai index di MySQL maupun SQLite.
+    """
+    kondisi = []
+    for i, (column, value) in enumerate(zip(kunci, values)):
+        sama = [kunci[j] == values[j] for j in range(i)]
+        lewat = column < value if turun else column > value
+        kondisi.append(and_(*sama, lewat))
+    return or_(*kondisi)
+
+def paginate(query, limit=None, page=None, cursor=None, kunci=(), turun=False):
+    """
+    Menerapkan pagination ke Query atau Select.
+    kunci: kolom-kolom yang unik bersama-sama, mis. (time_created, id).
+    """
+    if page is not None and cursor is not None:
+        raise CursorTidakValid("page dan cursor tidak bisa dipakai bersamaan")
+    if limit is not None and page is not None:
+        offset = (page - 1) * limit
+        return query.offset(offset).limit(limit)
+
+    if cursor is None and limit is None:
+        return query
+
+    if cursor is not None:
+        query = query.filter(_setelah(kunci, decode_cursor(cursor, kunci), turun))
+    query = query.order_by(None).order_by(*[column.desc() if turun else column.asc() for column in kunci])
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def cursor_berikutnya(hasil, limit=None, page=None, kunci=()):
+    """
+    Cursor untuk halaman berikutnya, atau None jika sudah halaman terakhir
+    atau request memakai page.
+    """
+    if limit is None or page is not None or len(hasil) < limit or not hasil:
+        return None
+    terakhir = hasil[-1]
+    return encode_cursor([getattr(terakhir, column.key) for column in kunci])
@@ -0,0 +1,242 @@
+"""
+Penilaian ulang (regrade) semua attempt satu tugas, mis. setelah mentor
+memperbaiki kunci jawaban.
+
+Attempt dibaca per batch dengan keyset (id > checkpoint, urut id), dinilai
+ulang dari jawaban per soal yang tersimpan (jawaban_attempt), lalu nilai yang
+berubah di-update dengan executemany. Checkpoint dan progress di
+regrade_tugas di-commit bersama batch itu, sehingga job yang berhenti di
+tengah jalan (proses mati, error) dilanjutkan dari batch berikutnya dan
+memori yang dipakai hanya sebesar satu batch.
+
+Checkpoint hanya berlaku untuk kunci jawaban yang sama: jika kunci berubah
+(mis. mentor memperbaikinya lagi saat job berjalan atau setelah job gagal),
+checkpoint dan progress di-reset dan semua attempt dinilai ulang dengan kunci
+yang baru, sehingga job tidak pernah selesai dengan campuran dua kunci.
+
+Attempt dari sebelum jawaban per soal disimpan tidak bisa dinilai ulang dan
+dihitung sebagai dilewati. Setelah semua batch selesai rekap nilai dan
+leaderboard tugas dihitung ulang; statistik soal langsung mengikuti skor
+baru di jawaban_attempt.
+"""
+import datetime
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update, bindparam, func, or_, and_
+from sqlalchemy.orm import Session
+
+import models, crud, grading, leaderboard
+
+load_dotenv()
+REGRADE_BATCH = int(os.getenv("REGRADE_BATCH", 1000))
+# job berjalan yang tidak memperbarui progress selama ini dianggap mati dan boleh diambil alih
+REGRADE_STALE = float(os.getenv("REGRADE_STALE", 300))
+
+logger = logging.getLogger(__name__)
+
+MENUNGGU = "menunggu"
+BERJALAN = "berjalan"
+SELESAI = "selesai"
+GAGAL = "gagal"
+
+_attempt = models.AttemptMengerjakanTugas.__table__
+_jawaban = models.JawabanAttempt.__table__
+_update_nilai = update(_attempt)\
+    .where(_attempt.c.id == bindparam("b_id"))\
+    .values(nilai=bindparam("b_nilai"))
+_update_skor = update(_jawaban)\
+    .where(_jawaban.c.id_attempt == bindparam("b_id_attempt"), _jawaban.c.id_soal == bindparam("b_id_soal"))\
+    .values(skor=bindparam("b_skor"))
+
+
+class RegradeBerhenti(Exception):
+    """
+    Job dihapus atau diambil alih proses lain di tengah jalan.
+    """
+
+
+def _sekarang():
+    return datetime.datetime.now()
+
+def buat_job(db: Session, id_tugas: int) -> models.RegradeTugas:
+    """
+    Job regrade tugas ini yang belum selesai (untuk dilanjutkan), atau job baru.
+    """
+    job = db.query(models.RegradeTugas)\
+        .filter(models.RegradeTugas.id_tugas == id_tugas, models.RegradeTugas.status != SELESAI)\
+        .order_by(models.RegradeTugas.id.desc()).first()
+    if job is None:
+        job = models.RegradeTugas(id_tugas=id_tugas, status=MENUNGGU, id_attempt_terakhir=0, time_updated=_sekarang())
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    return job
+
+def read_job(db: Session, id_job: int) -> models.RegradeTugas:
+    return db.query(models.RegradeTugas).filter(models.RegradeTugas.id == id_job).one()
+
+def klaim(db: Session, id_job: int) -> bool:
+    """
+    Menandai job berjalan. False jika job sudah selesai atau sedang
+    dijalankan (progress-nya masih baru) oleh thread/proses lain.
+    """
+    job = models.RegradeTugas
+    hasil = db.execute(update(job)
+        .where(job.id == id_job, or_(
+            job.status.in_((MENUNGGU, GAGAL)),
+            and_(job.status == BERJALAN, job.time_updated < _sekarang() - datetime.timedelta(seconds=REGRADE_STALE)),
+        ))
+        .values(status=BERJALAN, pesan=None, time_updated=_sekarang()))
+    db.commit()
+    return hasil.rowcount == 1
+
+def _perbarui_job(db: Session, id_job: int, **values):
+    hasil = db.execute(update(models.RegradeTugas)
+        .where(models.RegradeTugas.id == id_job, models.RegradeTugas.status == BERJALAN)
+        .values(time_updated=_sekarang(), **values))
+    if hasil.rowcount != 1:
+        raise RegradeBerhenti(id_job)
+
+
+def siapkan(db: Session, id_job: int, hitung_total=True):
+    """
+    (kunci, checkpoint, berubah) dengan kunci jawaban tugas sekarang. Jika
+    sidik kuncinya berbeda dari yang tersimpan di job, checkpoint dan progress
+    di-reset ke awal (berubah True).
+    """
+    job = read_job(db, id_job)
+    kunci = grading.kompilasi(crud.read_tugas_pembelajaran_lengkap_by_id(db, job.id_tugas))
+    sidik = grading.sidik_kunci(kunci)
+    berubah = job.sidik_kunci != sidik
+    values = {}
+    if berubah:
+        values.update(sidik_kunci=sidik, id_attempt_terakhir=0, jumlah_diproses=0, jumlah_berubah=0, jumlah_dilewati=0)
+    if berubah or hitung_total:
+        # total dihitung ulang setiap mulai/lanjut karena attempt baru bisa masuk
+        values["jumlah_total"] = select(func.count()).where(_attempt.c.id_tugas == kunci.id_tugas).scalar_subquery()
+    if values:
+        _perbarui_job(db, id_job, **values)
+    db.commit()
+    return kunci, 0 if berubah else job.id_attempt_terakhir, berubah
+
+def nilai_ulang(kunci_soal: dict, jumlah_soal: int, baris):
+    """
+    (nilai 0..1, [(row, skor_baru)]) satu attempt dari baris jawaban_attempt-nya.
+    Soal yang tidak dijawab (ditambahkan setelah attempt) bernilai 0.
+    """
+    skor_baru = [(row, grading.skor_tersimpan(kunci_soal[row.id_soal], row.jawaban))
+                 for row in baris if row.id_soal in kunci_soal]
+    return sum(skor for _, skor in skor_baru) / jumlah_soal, skor_baru
+
+def proses_batch(db: Session, id_job: int, kunci: grading.KunciJawaban, kunci_soal: dict, terakhir: int, batch_size: int):
+    """
+    Menilai ulang batch_size attempt setelah id terakhir dan meng-commit-nya
+    bersama checkpoint. Mengembalikan checkpoint baru, None jika sudah habis.
+    """
+    attempts = db.execute(select(_attempt.c.id, _attempt.c.nilai)
+                          .where(_attempt.c.id_tugas == kunci.id_tugas, _attempt.c.id > terakhir)
+                          .order_by(_attempt.c.id).limit(batch_size)).all()
+    if not attempts:
+        return None
+
+    per_attempt = {}
+    for row in db.execute(select(_jawaban.c.id_attempt, _jawaban.c.id_soal, _jawaban.c.jawaban, _jawaban.c.skor)
+                          .where(_jawaban.c.id_attempt.in_([attempt.id for attempt in attempts]))):
+        per_attempt.setdefault(row.id_attempt, []).append(row)
+
+    update_nilai, update_skor, dilewati = [], [], 0
+    for id_attempt, nilai_lama in attempts:
+        baris = per_attempt.get(id_attempt)
+        if not baris:
+            dilewati += 1
+            continue
+        nilai, skor_baru = nilai_ulang(kunci_soal, len(kunci), baris)
+        nilai = crud.skala_nilai(nilai)
+        if nilai_lama is None or abs(nilai - nilai_lama) > 1e-9:
+            update_nilai.append({"b_id": id_attempt, "b_nilai": nilai})
+        update_skor += [
+            {"b_id_attempt": id_attempt, "b_id_soal": row.id_soal, "b_skor": skor}
+            for row, skor in skor_baru if skor != row.skor
+        ]
+
+    if update_nilai:
+        db.execute(_update_nilai, update_nilai)
+    if update_skor:
+        db.execute(_update_skor, update_skor)
+    job = models.RegradeTugas
+    _perbarui_job(db, id_job,
+                  id_attempt_terakhir=attempts[-1].id,
+                  jumlah_diproses=job.jumlah_diproses + len(attempts),
+                  jumlah_berubah=job.jumlah_berubah + len(update_nilai),
+                  jumlah_dilewati=job.jumlah_dilewati + dilewati)
+    db.commit()
+    return attempts[-1].id
+
+def selesaikan(db: Session, id_job: int, kunci: grading.KunciJawaban):
+    """
+    Menghitung ulang rekap nilai tugas lalu menandai job selesai.
+    """
+    rekap = models.RekapAttemptTugas
+    db.execute(crud.hitung_ulang_rekap_attempt_stmt(rekap.id_tugas == kunci.id_tugas))
+    _perbarui_job(db, id_job, status=SELESAI)
+    db.commit()
+
+    leaderboard.hapus_tugas(kunci.id_tugas)
+    for id_pelajar, nilai in db.execute(select(rekap.id_pelajar, rekap.nilai_terbaik)
+                                        .where(rekap.id_tugas == kunci.id_tugas, rekap.nilai_terbaik.isnot(None))):
+        leaderboard.catat_nilai(id_pelajar, kunci.id_tugas, nilai, kunci.mapel)
+
+def jalankan(session_factory, id_job: int, batch_size=REGRADE_BATCH) -> bool:
+    """
+    Menjalankan (atau melanjutkan) job sampai selesai di thread pemanggil.
+    False jika job tidak bisa diklaim, gagal, atau diambil alih.
+    """
+    with session_factory() as db:
+        if not klaim(db, id_job):
+            return False
+    try:
+        with session_factory() as db:
+            kunci, terakhir, _ = siapkan(db, id_job)
+        berubah = True
+        while berubah:
+            kunci_soal = grading.kunci_per_soal(kunci)
+            while terakhir is not None:
+                with session_factory() as db:
+                    terakhir = proses_batch(db, id_job, kunci, kunci_soal, terakhir, batch_size)
+            # kunci diubah lagi selama batch berjalan: ulang dari awal dengan kunci baru
+            with session_factory() as db:
+                kunci, terakhir, berubah = siapkan(db, id_job, hitung_total=False)
+        with session_factory() as db:
+            selesaikan(db, id_job, kunci)
+        return True
+    except RegradeBerhenti:
+        logger.info("regrade %s berhenti: job dihapus atau diambil alih", id_job)
+        return False
+    except Exception as e:
+        logger.exception("regrade %s gagal", id_job)
+        with session_factory() as db:
+            db.execute(update(models.RegradeTugas).where(models.RegradeTugas.id == id_job)
+                       .values(status=GAGAL, pesan=str(e)[:255], time_updated=_sekarang()))
+            db.commit()
+        return False
+
+def mulai(session_factory, id_job: int):
+    """
+    Menjalankan job di thread background.
+    """
+    thread = threading.Thread(target=jalankan, args=(session_factory, id_job), name=f"regrade-{id_job}", daemon=True)
+    thread.start()
+    return thread
+
+def lanjutkan_semua(session_factory):
+    """
+    Melanjutkan job yang belum selesai (menunggu, atau berjalan tetapi
+    prosesnya mati), dipanggil saat startup. Job gagal dilanjutkan lewat endpoint.
+    """
+    with session_factory() as db:
+        daftar = db.execute(select(models.RegradeTugas.id)
+                            .where(models.RegradeTugas.status.in_((MENUNGGU, BERJALAN)))).scalars().all()
+    return [mulai(session_factory, id_job) for id_job in daftar]
@@ -0,0 +1,58 @@
+"""
+Jalur cepat untuk endpoint list: baris hasil select kolom (Row) langsung
+diubah menjadi dict lalu di-encode dengan orjson, tanpa membuat objek ORM
+dan tanpa validasi response model Pydantic.
+
+Kolom milik relasi diberi label "<relasi>__<kolom>" dan dijadikan dict
+bersarang, mis. "materi__nama" menjadi {"materi": {"nama": ...}}. Relasi yang
+semua kolomnya NULL (outer join tanpa pasangan) menjadi null.
+
+Endpoint yang memakai ini tetap mencantumkan response_model agar dokumentasi
+OpenAPI tidak berubah, tetapi mengembalikan ORJSONResponse secara langsung.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+PEMISAH = "__"
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    datetime, date dan enum di-encode oleh orjson sama seperti Pydantic
+    (ISO 8601 dan nilai enum).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _penyusun(fields):
+    """
+    Fungsi Row -> dict untuk urutan kolom ini. Pembagian kolom per relasi
+    dihitung sekali per hasil query, bukan per baris.
+    """
+    datar = [(i, key) for i, key in enumerate(fields) if PEMISAH not in key]
+    relasi = {}
+    for i, key in enumerate(fields):
+        if PEMISAH in key:
+            nama, kolom = key.split(PEMISAH, 1)
+            relasi.setdefault(nama, []).append((i, kolom))
+
+    def susun(row) -> dict:
+        hasil = {key: row[i] for i, key in datar}
+        for nama, kolom in relasi.items():
+            isi = {key: row[i] for i, key in kolom}
+            hasil[nama] = isi if any(value is not None for value in isi.values()) else None
+        return hasil
+    return susun
+
+def susun_semua(rows) -> list:
+    if not rows:
+        return []
+    susun = _penyusun(rows[0]._fields)
+    return [susun(row) for row in rows]
+
+def daftar(rows, headers=None) -> ORJSONResponse:
+    return ORJSONResponse(susun_semua(rows), headers=headers)
@@ -188,7 +188,8 @@ class tugas_pembelajaran_metadata(BaseModel):
     time_updated: Optional[datetime]
     judul: str
     attempt_allowed: int
-    
+    jumlah_soal: int = 0
+    jumlah_attempt: int = 0
 
     class Config:
         orm_mode = True
@@ -211,10 +212,91 @@ class attempt_mengerjakan_tugas(BaseModel):
     class Config:
         orm_mode = True
 
+class RekapNilaiTugas(BaseModel):
+    id_pelajar: int
+    id_tugas: int
+    jumlah_attempt: int
+    nilai_terbaik: Optional[float]
+    nilai_terakhir: Optional[float]
+    rata_rata: Optional[float]
+
+    class Config:
+        orm_mode = True
+
+class RekapNilaiMapel(BaseModel):
+    mapel: models.DaftarMapelSkolastik
+    jumlah_tugas: int
+    jumlah_attempt: int
+    rata_rata: Optional[float]
+    rata_rata_terbaik: Optional[float]
+
+    class Config:
+        orm_mode = True
+
+class StatistikSoal(BaseModel):
+    id_soal: int
+    jumlah_jawaban: int
+    persen_benar: Optional[float]
+    rata_rata_skor: Optional[float]
+    daya_beda: Optional[float]
+    distribusi: List[int]
+
+class StatusRegrade(BaseModel):
+    id: int
+    id_tugas: int
+    status: str
+    jumlah_total: int
+    jumlah_diproses: int
+    jumlah_berubah: int
+    jumlah_dilewati: int
+    persen: float
+    pesan: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+class PeringkatPelajar(BaseModel):
+    peringkat: int
+    id_pelajar: int
+    nilai: float
+
+class Leaderboard(BaseModel):
+    jumlah_pelajar: int
+    teratas: List[PeringkatPelajar]
+    pelajar: Optional[PeringkatPelajar] = None
+
+class StatistikLeaderboard(BaseModel):
+    jumlah_papan_tugas: int
+    jumlah_papan_mapel: int
+    jumlah_entri: int
+    memori_byte: int
+
+class ReceiptPengumpulan(BaseModel):
+    receipt: str
+    status: str
+
+class StatusPengumpulan(BaseModel):
+    receipt: str
+    status: str
+    detail: Optional[str] = None
+    attempt: Optional[attempt_mengerjakan_tugas] = None
+
+class StatistikAntrian(BaseModel):
+    aktif: bool
+    workers: int
+    antrian: int
+    lag_detik: float
+    lag_terakhir_detik: float
+    diproses: int
+    ditolak: int
+    gagal: int
+    batch: int
+
 class Materi(BaseModel):
     id: int
     nama: str
     mapel: models.DaftarMapelSkolastik
+    jumlah_video: int = 0
 
     class Config:
         orm_mode = True
@@ -237,6 +319,9 @@ class MateriDenganDaftarVideo(Materi):
     class Config:
         orm_mode = True
 
+class MateriDenganPreviewVideo(Materi):
+    video_pembelajaran: List[video_metadata]
+
 class VideoDenganMateri(video_metadata):
     materi: Materi
 
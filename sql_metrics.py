@@ -0,0 +1,114 @@
+"""
+Instrumentasi SQL per request: jumlah statement, total waktu database, dan
+deteksi statement identik yang berulang (pola N+1).
+Statistik disimpan di ContextVar sehingga ikut terbawa ke thread pool dan ke
+greenlet AsyncSession tanpa perlu diteruskan lewat parameter.
+"""
+import os
+import time
+import logging
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# statement identik yang dijalankan sebanyak ini dalam satu request dianggap N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+_current_stats = contextvars.ContextVar("sql_stats", default=None)
+
+
+class SqlStats:
+    __slots__ = ("jumlah", "durasi", "statement")
+
+    def __init__(self):
+        self.jumlah = 0
+        self.durasi = 0.0
+        self.statement = Counter()
+
+    def berulang(self, batas=None):
+        batas = N_PLUS_ONE_THRESHOLD if batas is None else batas
+        return {statement: n for statement, n in self.statement.items() if n >= batas}
+
+
+@contextmanager
+def rekam():
+    """
+    Merekam semua statement yang dijalankan di dalam blok ini.
+    """
+    stats = SqlStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # disimpan di execution context, bukan di koneksi: jika statement gagal
+    # after_cursor_execute tidak dipanggil dan waktunya tidak boleh terbawa
+    # ke statement berikutnya pada koneksi pool yang sama
+    if _current_stats.get() is not None:
+        context._sql_metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    start = getattr(context, "_sql_metrics_start", None)
+    if start is not None:
+        stats.durasi += time.perf_counter() - start
+    stats.jumlah += 1
+    stats.statement[statement] += 1
+
+def pasang(engine):
+    """
+    Memasang listener ke engine sync (untuk AsyncEngine pakai .sync_engine).
+    """
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlMetricsMiddleware:
+    """
+    Middleware ASGI yang menambahkan header X-DB-Queries, X-DB-Time-Ms dan
+    (jika ada pola N+1) X-DB-Repeated ke setiap response.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with rekam() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-DB-Queries", str(stats.jumlah))
+                    headers.append("X-DB-Time-Ms", f"{stats.durasi * 1000:.1f}")
+                    berulang = stats.berulang()
+                    if berulang:
+                        headers.append("X-DB-Repeated", str(max(berulang.values())))
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+
+        berulang = stats.berulang()
+        if berulang:
+            statement, n = max(berulang.items(), key=lambda item: item[1])
+            logger.warning(
+                "kemungkinan N+1 pada %s %s: %d statement, statement diulang %dx: %s",
+                scope["method"], scope["path"], stats.jumlah, n, statement
+            )
+        else:
+            logger.debug(
+                "%s %s: %d statement, %.1f ms",
+                scope["method"], scope["path"], stats.jumlah, stats.durasi * 1000
+            )
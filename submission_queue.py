@@ -0,0 +1,283 @@
+"""
+Antrian pengumpulan tugas untuk lonjakan kiriman (mis. saat tryout).
+
+POST /video/tugas/kumpul/antrian hanya memasukkan kiriman ke antrian dan
+mengembalikan receipt. Worker (thread) mengambil kiriman per batch, menilai
+dengan kunci jawaban dari grading.py, lalu menyimpan semua attempt dalam
+satu transaksi. Hasil bisa dilihat lewat receipt sampai SUBMISSION_RESULT_TTL.
+
+Antrian ada di memori proses: kiriman yang belum diproses hilang jika proses
+mati mendadak. Saat shutdown antrian dikosongkan dulu.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import NoResultFound
+
+import crud, cache, grading, leaderboard, analisis_soal
+
+load_dotenv()
+SUBMISSION_QUEUE_ENABLED = os.getenv("SUBMISSION_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+SUBMISSION_QUEUE_WORKERS = int(os.getenv("SUBMISSION_QUEUE_WORKERS", 2))
+SUBMISSION_QUEUE_BATCH = int(os.getenv("SUBMISSION_QUEUE_BATCH", 100))
+SUBMISSION_QUEUE_MAXSIZE = int(os.getenv("SUBMISSION_QUEUE_MAXSIZE", 20000))
+SUBMISSION_RESULT_TTL = float(os.getenv("SUBMISSION_RESULT_TTL", 3600))
+
+logger = logging.getLogger(__name__)
+
+MENUNGGU = "menunggu"
+SELESAI = "selesai"
+DITOLAK = "ditolak"
+GAGAL = "gagal"
+
+
+class AntrianTidakAktif(Exception):
+    pass
+
+class AntrianPenuh(Exception):
+    pass
+
+
+class Kiriman:
+    __slots__ = ("receipt", "id_pelajar", "id_tugas", "jawaban", "waktu_mulai", "waktu_selesai", "diterima")
+
+    def __init__(self, receipt, id_pelajar, id_tugas, jawaban, waktu_mulai, waktu_selesai):
+        self.receipt = receipt
+        self.id_pelajar = id_pelajar
+        self.id_tugas = id_tugas
+        self.jawaban = jawaban
+        self.waktu_mulai = waktu_mulai
+        self.waktu_selesai = waktu_selesai
+        self.diterima = time.monotonic()
+
+
+class AntrianPengumpulan:
+    """
+    workers=0 tidak menjalankan thread; kiriman diproses dengan proses_semua(),
+    dipakai di test agar worker bisa dijalankan di proses yang sama.
+    """
+    def __init__(self, session_factory, workers=SUBMISSION_QUEUE_WORKERS, batch_size=SUBMISSION_QUEUE_BATCH,
+                 maxsize=SUBMISSION_QUEUE_MAXSIZE, result_ttl=SUBMISSION_RESULT_TTL):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.batch_size = max(batch_size, 1)
+        self.aktif = False
+        self._antrian = queue.Queue(maxsize)
+        # hasil disimpan sampai TTL; kiriman yang masih menunggu tidak bisa terbuang
+        self._hasil = cache.LRUCache(max(maxsize, 1) * 2, result_ttl)
+        self._menunggu = OrderedDict()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._diproses = 0
+        self._ditolak = 0
+        self._gagal = 0
+        self._batch = 0
+        self._lag_terakhir = 0.0
+
+    def mulai(self):
+        if self.aktif:
+            return
+        self.aktif = True
+        self._threads = [
+            threading.Thread(target=self._jalankan_worker, name=f"antrian-pengumpulan-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def berhenti(self, timeout=30):
+        """
+        Menolak kiriman baru lalu menunggu worker menghabiskan antrian.
+        """
+        self.aktif = False
+        for _ in self._threads:
+            self._antrian.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def kirim(self, id_pelajar, id_tugas, jawaban, waktu_mulai, waktu_selesai) -> str:
+        if not self.aktif:
+            raise AntrianTidakAktif("antrian pengumpulan tidak aktif")
+        kiriman = Kiriman(uuid.uuid4().hex, id_pelajar, id_tugas, jawaban, waktu_mulai, waktu_selesai)
+        with self._lock:
+            try:
+                self._antrian.put_nowait(kiriman)
+            except queue.Full:
+                raise AntrianPenuh("antrian pengumpulan penuh")
+            self._menunggu[kiriman.receipt] = kiriman
+        return kiriman.receipt
+
+    def status(self, receipt):
+        """
+        dict dengan receipt, id_pelajar, status, detail dan attempt, atau None.
+        """
+        with self._lock:
+            kiriman = self._menunggu.get(receipt)
+            if kiriman is not None:
+                return {"receipt": receipt, "id_pelajar": kiriman.id_pelajar, "status": MENUNGGU,
+                        "detail": None, "attempt": None}
+        return self._hasil.get(receipt)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tertua = next(iter(self._menunggu.values()), None)
+            return {
+                "aktif": self.aktif,
+                "workers": sum(thread.is_alive() for thread in self._threads),
+                "antrian": len(self._menunggu),
+                "lag_detik": round(time.monotonic() - tertua.diterima, 3) if tertua else 0.0,
+                "lag_terakhir_detik": round(self._lag_terakhir, 3),
+                "diproses": self._diproses,
+                "ditolak": self._ditolak,
+                "gagal": self._gagal,
+                "batch": self._batch,
+            }
+
+    def proses_semua(self):
+        """
+        Memproses semua kiriman yang ada di antrian di thread pemanggil.
+        """
+        while True:
+            batch = self._ambil_batch(block=False)
+            if not batch:
+                return
+            self.proses_batch(batch)
+
+    def _ambil_batch(self, block=True):
+        batch = []
+        try:
+            kiriman = self._antrian.get(block=block)
+            while True:
+                batch.append(kiriman)
+                if kiriman is None or len(batch) >= self.batch_size:
+                    break
+                kiriman = self._antrian.get_nowait()
+        except queue.Empty:
+            pass
+        return batch
+
+    def _jalankan_worker(self):
+        while True:
+            batch = self._ambil_batch()
+            berhenti = None in batch
+            batch = [kiriman for kiriman in batch if kiriman is not None]
+            if batch:
+                self.proses_batch(batch)
+            if berhenti:
+                return
+
+    def proses_batch(self, batch):
+        sekarang = time.monotonic()
+        try:
+            with self.session_factory() as db:
+                hasil, dinilai = self._nilai_batch(db, batch)
+                try:
+                    hasil.update(self._simpan_dengan_ulang(db, batch, dinilai))
+                except Exception:
+                    # satu kiriman yang gagal (mis. pelajar sudah dihapus) tidak boleh
+                    # menggagalkan kiriman lain: simpan satu per satu
+                    db.rollback()
+                    logger.exception("gagal menyimpan batch %s kiriman, disimpan satu per satu", len(batch))
+                    for kiriman in batch:
+                        if kiriman.receipt not in dinilai:
+                            continue
+                        try:
+                            hasil.update(self._simpan_dengan_ulang(db, [kiriman], dinilai))
+                        except Exception:
+                            db.rollback()
+                            logger.exception("gagal menyimpan kiriman %s", kiriman.receipt)
+                            hasil[kiriman.receipt] = (GAGAL, "Internal server error", None)
+        except Exception:
+            logger.exception("gagal memproses %s kiriman", len(batch))
+            hasil = {kiriman.receipt: (GAGAL, "Internal server error", None) for kiriman in batch}
+
+        with self._lock:
+            for kiriman in batch:
+                status, detail, attempt = hasil[kiriman.receipt]
+                self._hasil.set(kiriman.receipt, {"receipt": kiriman.receipt, "id_pelajar": kiriman.id_pelajar,
+                                                  "status": status, "detail": detail, "attempt": attempt})
+                self._menunggu.pop(kiriman.receipt, None)
+                self._diproses += status == SELESAI
+                self._ditolak += status == DITOLAK
+                self._gagal += status == GAGAL
+            self._batch += 1
+            self._lag_terakhir = sekarang - batch[0].diterima
+
+    def _nilai_batch(self, db, batch):
+        """
+        (ditolak, dinilai): ditolak receipt -> (status, detail, None),
+        dinilai receipt -> (kunci, nilai, per_soal) untuk kiriman yang akan disimpan.
+        """
+        ditolak, dinilai = {}, {}
+        for kiriman in batch:
+            try:
+                kunci = grading.read_kunci_jawaban(db, kiriman.id_tugas)
+                if not kunci.ada_video:
+                    ditolak[kiriman.receipt] = (DITOLAK, "Bad Request", None)
+                    continue
+                dinilai[kiriman.receipt] = (kunci, *grading.nilai_per_soal(kunci, kiriman.jawaban))
+            except NoResultFound:
+                ditolak[kiriman.receipt] = (DITOLAK, "Invalid id", None)
+            except grading.JawabanTidakValid as e:
+                ditolak[kiriman.receipt] = (DITOLAK, str(e), None)
+        # akhiri transaksi baca sebelum menulis
+        db.rollback()
+        return ditolak, dinilai
+
+    def _simpan_dengan_ulang(self, db, batch, dinilai) -> dict:
+        for percobaan in range(2):
+            try:
+                return self._simpan_batch(db, batch, dinilai)
+            except (IntegrityError, OperationalError):
+                # baris rekap dibuat bersamaan oleh transaksi lain, ulangi sekali
+                db.rollback()
+                if percobaan:
+                    raise
+
+    def _simpan_batch(self, db, batch, dinilai) -> dict:
+        # batas attempt per (pelajar, tugas): satu UPDATE untuk semua kiriman pelajar itu di batch
+        grup = {}
+        for kiriman in batch:
+            if kiriman.receipt in dinilai:
+                grup.setdefault((kiriman.id_pelajar, kiriman.id_tugas), []).append(kiriman)
+
+        hasil, diterima = {}, []
+        # baris rekap dikunci dalam urutan yang sama di semua worker agar tidak deadlock
+        for (id_pelajar, id_tugas), daftar in sorted(grup.items()):
+            attempt_allowed = dinilai[daftar[0].receipt][0].attempt_allowed
+            # kunci baris rekap dulu, lalu tambahkan hanya attempt yang masih diizinkan
+            sudah = crud.tambah_rekap_attempt(db, id_pelajar, id_tugas)
+            sisa = min(max(attempt_allowed - sudah, 0), len(daftar))
+            if sisa:
+                db.execute(crud.update_rekap_attempt_stmt(id_pelajar, id_tugas, [
+                    crud.skala_nilai(dinilai[kiriman.receipt][1]) for kiriman in daftar[:sisa]
+                ]))
+            for kiriman in daftar[sisa:]:
+                hasil[kiriman.receipt] = (DITOLAK, "Max attempt reached", None)
+            diterima += daftar[:sisa]
+
+        attempts = crud.insert_attempt_mengerjakan_tugas_batch(db, [
+            {"id_pelajar": kiriman.id_pelajar, "id_tugas": kiriman.id_tugas, "nilai": dinilai[kiriman.receipt][1],
+             "waktu_mulai": kiriman.waktu_mulai, "waktu_selesai": kiriman.waktu_selesai}
+            for kiriman in diterima
+        ])
+        per_tugas = OrderedDict()
+        for kiriman, attempt in zip(diterima, attempts):
+            hasil[kiriman.receipt] = (SELESAI, None, attempt)
+            kunci, _, per_soal = dinilai[kiriman.receipt]
+            per_tugas.setdefault(kiriman.id_tugas, (kunci, []))[1].append((attempt["id"], per_soal))
+        # jawaban per soal: satu insert per tugas untuk seluruh batch
+        for kunci, daftar in per_tugas.values():
+            analisis_soal.catat_jawaban(db, kunci, daftar)
+        db.commit()
+        for kiriman, attempt in zip(diterima, attempts):
+            leaderboard.catat_nilai(kiriman.id_pelajar, kiriman.id_tugas, attempt["nilai"], dinilai[kiriman.receipt][0].mapel)
+        return hasil
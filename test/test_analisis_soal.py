@@ -0,0 +1,183 @@
+import datetime
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import analisis_soal
+import auth
+import cache
+import crud
+import grading
+import main
+import models
+import schema
+import submission_queue
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0)
+JAWABAN = [
+    ["2", ["1", "0"], ["1", "0", "1", "0"]],
+    ["2", ["1", "1"], ["1", "0", "0", "0"]],
+    ["0", ["0", "1"], ["0", "1", "0", "1"]],
+    ["1", ["1", "0"], ["1", "1", "1", "0"]],
+    ["2", ["0", "0"], ["1", "0", "1", "1"]],
+]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/analisis.db")
+    models.Base.metadata.create_all(engine)
+    cache.hapus_semua()
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def data(session_factory):
+    with session_factory() as db:
+        mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+        lain = models.Mentor(email="lain@example.com", nama_lengkap="Lain", Asal="ITB")
+        daftar_pelajar = [
+            models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", asal_sekolah="SMA 1", jurusan="IPA")
+            for i in range(len(JAWABAN))
+        ]
+        db.add_all([mentor, lain, *daftar_pelajar])
+        db.flush()
+        video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key")
+        db.add(video)
+        db.commit()
+        db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video.id, [
+            schema.SoalABCKunci(pertanyaan="abc", pilihan_jawaban=["a", "b", "c"], index_jawaban_benar=2),
+            schema.SoalBenarSalah(pertanyaan="bs", pernyataan_pada_benar="Benar", pernyataan_pada_salah="Salah",
+                                  daftar_jawaban=[schema.JawabanBenarSalahKunci(isi_jawaban="x", jawaban_pernyataan_yang_benar=True),
+                                                  schema.JawabanBenarSalahKunci(isi_jawaban="y", jawaban_pernyataan_yang_benar=False)]),
+            schema.SoalMultiPilih(pertanyaan="mp", pilihan=[
+                schema.JawabanMultiPilihKunci(isi_jawaban="p", jawaban_ini_benar=True),
+                schema.JawabanMultiPilihKunci(isi_jawaban="q", jawaban_ini_benar=False),
+                schema.JawabanMultiPilihKunci(isi_jawaban="r", jawaban_ini_benar=True),
+                schema.JawabanMultiPilihKunci(isi_jawaban="s", jawaban_ini_benar=False)]),
+        ])
+        return {"tugas": db_tugas.id, "video": video.id, "mentor": mentor.id, "lain": lain.id,
+                "pelajar": [p.id for p in daftar_pelajar]}
+
+def kumpul(db, id_pelajar, id_tugas, jawaban):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+    nilai, per_soal = grading.nilai_per_soal(kunci, jawaban)
+    return crud.create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, nilai, WAKTU, WAKTU,
+                                                      kunci.attempt_allowed, kunci=kunci, per_soal=per_soal)
+
+def dihitung_ulang(db, id_tugas):
+    """
+    Statistik yang dihitung langsung dari semua baris jawaban_attempt.
+    """
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+    per_attempt = {}
+    for jawaban in db.query(models.JawabanAttempt).order_by(models.JawabanAttempt.id_soal):
+        per_attempt.setdefault(jawaban.id_attempt, {})[jawaban.id_soal] = jawaban
+    hasil = []
+    for id_soal, jenis, jumlah_pilihan in zip(kunci.id_soal, kunci.jenis, kunci.pilihan):
+        skor = [attempt[id_soal].skor for attempt in per_attempt.values()]
+        sisa = [sum(j.skor for j in attempt.values()) - attempt[id_soal].skor for attempt in per_attempt.values()]
+        distribusi = [0] * jumlah_pilihan
+        for attempt in per_attempt.values():
+            for pilihan in analisis_soal.pilihan_dijawab(jenis, jumlah_pilihan, attempt[id_soal].jawaban):
+                distribusi[pilihan] += 1
+        hasil.append((100 * sum(s == 1 for s in skor) / len(skor), distribusi, korelasi(skor, sisa)))
+    return hasil
+
+def korelasi(x, y):
+    rata_x, rata_y = sum(x) / len(x), sum(y) / len(y)
+    kovarians = sum((a - rata_x) * (b - rata_y) for a, b in zip(x, y))
+    return kovarians / math.sqrt(sum((a - rata_x) ** 2 for a in x) * sum((b - rata_y) ** 2 for b in y))
+
+
+def test_scores_are_double_precision_on_mysql():
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy.schema import CreateTable
+
+    ddl = str(CreateTable(models.JawabanAttempt.__table__).compile(dialect=mysql.dialect()))
+    assert "FLOAT" not in ddl
+    assert "DOUBLE" in ddl
+
+def test_statistics_match_raw_answers(session_factory, data):
+    with session_factory() as db:
+        for id_pelajar, jawaban in zip(data["pelajar"], JAWABAN):
+            kumpul(db, id_pelajar, data["tugas"], jawaban)
+
+        statistik = analisis_soal.read_statistik_soal(db, data["tugas"])
+        assert [s["jumlah_jawaban"] for s in statistik] == [5, 5, 5]
+        for s, (persen_benar, distribusi, daya_beda) in zip(statistik, dihitung_ulang(db, data["tugas"])):
+            assert s["persen_benar"] == pytest.approx(persen_benar)
+            assert s["distribusi"] == distribusi
+            assert s["daya_beda"] == pytest.approx(daya_beda)
+        assert statistik[0]["persen_benar"] == 60.0
+        assert statistik[0]["distribusi"] == [1, 1, 3]
+
+def test_queue_batch_matches_single_submissions(session_factory, data):
+    antrian = submission_queue.AntrianPengumpulan(session_factory, workers=0, batch_size=10)
+    antrian.mulai()
+    for id_pelajar, jawaban in zip(data["pelajar"], JAWABAN):
+        antrian.kirim(id_pelajar, data["tugas"], jawaban, WAKTU, WAKTU)
+    antrian.proses_semua()
+
+    with session_factory() as db:
+        dari_antrian = analisis_soal.read_statistik_soal(db, data["tugas"])
+        assert db.query(models.JawabanAttempt).count() == 3 * len(JAWABAN)
+        crud._hapus_attempt_tugas(db, data["tugas"])
+        db.commit()
+        assert analisis_soal.read_statistik_soal(db, data["tugas"]) == []
+        assert db.query(models.JawabanAttempt).count() == 0
+
+        for id_pelajar, jawaban in zip(data["pelajar"], JAWABAN):
+            kumpul(db, id_pelajar, data["tugas"], jawaban)
+        satu_per_satu = analisis_soal.read_statistik_soal(db, data["tugas"])
+    assert len(dari_antrian) == len(satu_per_satu) == 3
+    for a, b in zip(dari_antrian, satu_per_satu):
+        assert a.pop("distribusi") == b.pop("distribusi")
+        assert a == pytest.approx(b)
+
+def test_submit_only_updates_its_own_rekap_row(session_factory, data):
+    from sqlalchemy import event
+    with session_factory() as db:
+        kumpul(db, data["pelajar"][0], data["tugas"], JAWABAN[0])
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        kumpul(db, data["pelajar"][1], data["tugas"], JAWABAN[1])
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    # baris yang dipakai bersama pelajar lain (per soal / per tugas) tidak diperbarui
+    assert [s.split()[1] for s in statements if s.startswith("UPDATE")] == ["rekap_attempt_tugas"]
+
+def test_rejected_attempt_stores_no_answers(session_factory, data):
+    with session_factory() as db:
+        for _ in range(3):
+            kumpul(db, data["pelajar"][0], data["tugas"], JAWABAN[0])
+        with pytest.raises(crud.BatasAttemptTercapai):
+            kumpul(db, data["pelajar"][0], data["tugas"], JAWABAN[0])
+
+        assert db.query(models.JawabanAttempt).count() == 3 * 3
+        assert [s["jumlah_jawaban"] for s in analisis_soal.read_statistik_soal(db, data["tugas"])] == [3, 3, 3]
+
+def test_endpoint_is_limited_to_video_creator(session_factory, data):
+    with session_factory() as db:
+        kumpul(db, data["pelajar"][0], data["tugas"], JAWABAN[0])
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    try:
+        client = TestClient(main.app)
+        token = {"Authorization": f"Bearer {auth.create_access_token({'id': data['mentor']})}"}
+        response = client.get("/video/tugas/statistik", headers=token, params={"id_video": data["video"]})
+        assert response.status_code == 200
+        assert [s["distribusi"] for s in response.json()] == [[0, 0, 1], [1, 0], [1, 0, 1, 0]]
+
+        token_lain = {"Authorization": f"Bearer {auth.create_access_token({'id': data['lain']})}"}
+        response = client.get("/video/tugas/statistik", headers=token_lain, params={"id_video": data["video"]})
+        assert response.status_code == 403
+    finally:
+        main.app.dependency_overrides.clear()
@@ -1,7 +1,8 @@
 from unittest import result
 import pytest
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 import unittest.mock as mock
 from sqlalchemy.orm import Session
 import auth
@@ -60,34 +61,34 @@ def test_authenticate_user_valid_user():
 
 
 
-def test_authenticate_user_valid_user():
+def test_authenticate_user_valid_user(monkeypatch):
     mock_session = mock.Mock(spec=Session)
     mock_user = mock.Mock()
     mock_user.hashed_password = auth.get_password_hash("password123")
 
-    auth.crud.read_user_by_email = mock.Mock(return_value=mock_user)
+    monkeypatch.setattr(auth.crud, "read_user_by_email", mock.Mock(return_value=mock_user))
 
     user = auth.authenticate_user(mock_session, "test@example.com", "password123")
 
     assert user == mock_user
     auth.crud.read_user_by_email.assert_called_once_with(mock_session, "test@example.com")
 
-def test_authenticate_user_invalid_user():
+def test_authenticate_user_invalid_user(monkeypatch):
     mock_session = mock.Mock(spec=Session)
 
-    auth.crud.read_user_by_email = mock.Mock(return_value=None)
+    monkeypatch.setattr(auth.crud, "read_user_by_email", mock.Mock(return_value=None))
 
     user = auth.authenticate_user(mock_session, "test@example.com", "password123")
 
     assert user is False
     auth.crud.read_user_by_email.assert_called_once_with(mock_session, "test@example.com")
 
-def test_authenticate_user_invalid_password():
+def test_authenticate_user_invalid_password(monkeypatch):
     mock_session = mock.Mock(spec=Session)
     mock_user = mock.Mock()
     mock_user.hashed_password = auth.get_password_hash("password123")
 
-    auth.crud.read_user_by_email = mock.Mock(return_value=mock_user)
+    monkeypatch.setattr(auth.crud, "read_user_by_email", mock.Mock(return_value=mock_user))
 
     user = auth.authenticate_user(mock_session, "test@example.com", "wrongpassword")
 
@@ -177,43 +178,60 @@ def test_admin_auth_id_not_found():
 
    
 
-def test_check_if_user_is_mentor_user_found():
+def test_check_if_user_is_mentor_user_found(monkeypatch):
     mock_session = mock.Mock(spec=Session)
-    mock_user = mock.Mock(spec=models.Mentor)
+    mock_mentor = mock.Mock(Asal="UI")
 
-    auth.crud.read_user_mentor_by_id = mock.Mock(return_value=mock_user)
+    monkeypatch.setattr(auth.crud, "read_mentor_ringkas_by_id", mock.Mock(return_value=mock_mentor))
 
     auth.check_if_user_is_mentor(mock_session, 1)
 
-    auth.crud.read_user_mentor_by_id.assert_called_once_with(mock_session, 1)
+    auth.crud.read_mentor_ringkas_by_id.assert_called_once_with(mock_session, 1)
 
-def test_check_if_user_is_mentor_user_not_found():
+def test_check_if_user_is_mentor_user_not_found(monkeypatch):
     mock_session = mock.Mock(spec=Session)
 
-    auth.crud.read_user_mentor_by_id = mock.Mock(return_value=None)
+    monkeypatch.setattr(auth.crud, "read_mentor_ringkas_by_id", mock.Mock(return_value=None))
 
-    try:
+    with pytest.raises(HTTPException) as e:
         auth.check_if_user_is_mentor(mock_session, 1)
-    except HTTPException as e:
-        assert e.status_code == 401
-        assert e.detail == "akun tidak ditemukan"
+    assert e.value.status_code == 401
+    assert e.value.detail == "akun tidak ditemukan"
 
-    auth.crud.read_user_mentor_by_id.assert_called_once_with(mock_session, 1)
+    auth.crud.read_mentor_ringkas_by_id.assert_called_once_with(mock_session, 1)
 
-def test_check_if_user_is_mentor_user_not_mentor():
+def test_check_if_user_is_mentor_user_not_mentor(monkeypatch):
     mock_session = mock.Mock(spec=Session)
-    mock_user = mock.Mock(spec=models.Mentor)
-    mock_user.Asal = None
+    mock_mentor = mock.Mock(Asal=None)
 
-    auth.crud.read_user_mentor_by_id = mock.Mock(return_value=mock_user)
+    monkeypatch.setattr(auth.crud, "read_mentor_ringkas_by_id", mock.Mock(return_value=mock_mentor))
 
-    try:
+    with pytest.raises(HTTPException) as e:
         auth.check_if_user_is_mentor(mock_session, 1)
-    except HTTPException as e:
-        assert e.status_code == 401
-        assert e.detail == "bukan mentor"
-
-    auth.crud.read_user_mentor_by_id.assert_called_once_with(mock_session, 1)
+    assert e.value.status_code == 401
+    assert e.value.detail == "bukan mentor"
+
+    auth.crud.read_mentor_ringkas_by_id.assert_called_once_with(mock_session, 1)
+
+def test_check_if_user_is_mentor_reads_only_mentor_table(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/auth.db")
+    models.Base.metadata.create_all(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    monkeypatch.setattr(auth.crud, "s3", mock.Mock(side_effect=AssertionError("tidak boleh presign")))
+
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([models.Mentor(email="mentor@example.com", Asal="UI"), models.Pelajar(email="pelajar@example.com")])
+        db.commit()
+        statements.clear()
+
+        auth.check_if_user_is_mentor(db, 1)
+        with pytest.raises(HTTPException):
+            auth.check_if_user_is_mentor(db, 2)
+        assert not db.dirty
+
+    assert len(statements) == 2
+    assert all('"user"' not in statement for statement in statements)
 
 
 
@@ -0,0 +1,162 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import cache
+import crud
+import main
+import models
+import schema
+import sql_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", fake)
+    return fake
+
+
+def test_lru_evicts_least_recently_used():
+    lru = cache.LRUCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+def test_entries_expire_after_ttl(clock):
+    lru = cache.LRUCache(10, ttl=60)
+    lru.set("a", 1)
+
+    clock.now += 59
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+def test_zero_size_disables_cache():
+    lru = cache.LRUCache(0)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+
+def test_stale_read_is_not_stored_after_invalidation():
+    cache.hapus_semua()
+    versi = cache.versi_tugas(7)
+    # tugas diubah saat snapshot lama sedang disusun
+    cache.hapus_tugas(7)
+    cache.simpan_snapshot_tugas(7, "pelajar", versi, b"lama")
+    assert cache.tugas_snapshot.get((7, "pelajar")) is None
+
+    versi = cache.versi_tugas(7)
+    cache.simpan_snapshot_tugas(7, "pelajar", versi, b"baru")
+    assert cache.tugas_snapshot.get((7, "pelajar")) == b"baru"
+
+    versi = cache.versi_tugas(7)
+    cache.hapus_semua()
+    cache.simpan_snapshot_tugas(7, "mentor", versi, b"lama")
+    assert cache.tugas_snapshot.get((7, "mentor")) is None
+
+
+@pytest.fixture
+def client_dengan_tugas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/cache.db")
+    models.Base.metadata.create_all(engine)
+    sql_metrics.pasang(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI", keahlian="Fisika")
+        db.add(mentor)
+        db.flush()
+        video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key")
+        db.add(video)
+        db.commit()
+        ids = {"mentor": mentor.id, "video": video.id}
+        db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, "Tugas", 2, video.id, [
+            schema.SoalABCKunci(pertanyaan="1 + 1?", pilihan_jawaban=["1", "2"], index_jawaban_benar=1),
+            schema.SoalMultiPilih(pertanyaan="Genap?", pilihan=[
+                schema.JawabanMultiPilihKunci(isi_jawaban="2", jawaban_ini_benar=True),
+                schema.JawabanMultiPilihKunci(isi_jawaban="3", jawaban_ini_benar=False)]),
+        ])
+        ids["tugas"] = db_tugas.id
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_db] = get_db
+    main.app.dependency_overrides[auth.get_token_data] = lambda: schema.TokenData(id=ids["mentor"])
+    main.app.dependency_overrides[auth.check_if_user_is_mentor] = lambda: None
+    cache.hapus_semua()
+    yield TestClient(main.app), session_factory, ids
+    main.app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def test_tugas_views_are_served_from_cache(client_dengan_tugas, monkeypatch):
+    client, session_factory, ids = client_dengan_tugas
+    monkeypatch.setattr(auth, "check_if_user_is_mentor", lambda db, id: None)
+
+    pertama = client.get("/video/tugas", params={"id_video": ids["video"]})
+    kedua = client.get("/video/tugas", params={"id_video": ids["video"]})
+
+    assert pertama.headers["X-Cache"] == "MISS"
+    assert kedua.headers["X-Cache"] == "HIT"
+    assert kedua.content == pertama.content
+    if main.SQL_METRICS_ENABLED:
+        assert int(kedua.headers["X-DB-Queries"]) < int(pertama.headers["X-DB-Queries"])
+    soal = json.loads(kedua.content)["daftar_soal"]
+    assert soal[0] == {"pertanyaan": "1 + 1?", "pilihan_jawaban": ["1", "2"]}
+
+    # view mentor disimpan terpisah dan berisi kunci
+    mentor = client.request("GET", "/video/tugas/edit", data={"id_video": ids["video"]})
+    assert mentor.headers["X-Cache"] == "MISS"
+    soal = mentor.json()["daftar_soal"]
+    assert soal[0]["index_jawaban_benar"] == 1
+    assert soal[1]["pilihan"][0] == {"isi_jawaban": "2", "jawaban_ini_benar": True}
+
+def test_deleting_tugas_invalidates_cache(client_dengan_tugas):
+    client, session_factory, ids = client_dengan_tugas
+    client.get("/video/tugas", params={"id_video": ids["video"]})
+    assert cache.tugas_snapshot.get((ids["tugas"], "pelajar")) is not None
+
+    with session_factory() as db:
+        crud.delete_tugas_pembelajaran_by_id(db, ids["tugas"])
+
+    assert cache.tugas_snapshot.get((ids["tugas"], "pelajar")) is None
+    assert client.get("/video/tugas", params={"id_video": ids["video"]}).status_code == 400
+
+def test_editing_soal_only_invalidates_its_tugas(client_dengan_tugas):
+    client, session_factory, ids = client_dengan_tugas
+    client.get("/video/tugas", params={"id_video": ids["video"]})
+    # tugas lain yang ikut ter-cache tidak boleh terhapus
+    cache.simpan_snapshot_tugas(999, "pelajar", cache.versi_tugas(999), b"lain")
+
+    with session_factory() as db:
+        id_soal = db.query(models.SoalABC.id).filter(models.SoalABC.id_tugas == ids["tugas"]).scalar()
+        crud.create_jawaban_abc(db, id_soal, "3")
+    assert cache.tugas_snapshot.get((ids["tugas"], "pelajar")) is None
+    assert cache.tugas_snapshot.get((999, "pelajar")) == b"lain"
+
+    client.get("/video/tugas", params={"id_video": ids["video"]})
+    with session_factory() as db:
+        crud.update_soal_abc_add_kunci_by_ids(db, id_soal, 0)
+    assert cache.tugas_snapshot.get((ids["tugas"], "pelajar")) is None
+    assert cache.tugas_snapshot.get((999, "pelajar")) == b"lain"
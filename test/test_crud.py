@@ -540,21 +540,6 @@ def test_update_materi_pembelajaran_by_id_with_mock():
 
 
 
-def test_delete_attemp_pengerjaan_tugas_by_id_tugas():
-    # Create a mock session
-    db_mock = MagicMock(spec=Session)
-
-    # Configure the query mock
-    db_mock.query.return_value.filter.return_value.delete.return_value = 2
-
-    # Test case: Delete attempts by id_tugas
-    result = delete_attemp_pengerjaan_tugas_by_id_tugas(db_mock, id_tugas=1)
-    db_mock.query.assert_called_once_with(models.AttemptMengerjakanTugas)
-    db_mock.query.return_value.filter.return_value.delete.assert_called_once()
-    db_mock.commit.assert_called_once()
-    assert result == 2
-
-
 def test_delete_materi_pembelajaran_by_id_with_mock():
     # Create a mock session
     session = MagicMock(spec=Session)
@@ -894,48 +879,23 @@ def test_update_video_pembelajaran_remove_tugas():
     assert session.query.return_value.filter.return_value.one.return_value.id_tugas is None
 
 def test_delete_tugas_pembelajaran_by_id():
-    # Create a mock session
     session = MagicMock(spec=Session)
+    session.execute.return_value.rowcount = 1
 
-    # Define test data
-    tugas_pembelajaran_id = 1
-
-    # Create a mock TugasPembelajaran object
-    tugas_pembelajaran = MagicMock(spec=models.TugasPembelajaran)
-    tugas_pembelajaran.video.id = 1
-
-    # Create mock Soal objects
-    soal_abc = MagicMock(spec=models.SoalABC)
-    soal_benar_salah = MagicMock(spec=models.SoalBenarSalah)
-    soal_multi_pilih = MagicMock(spec=models.SoalMultiPilih)
+    result = delete_tugas_pembelajaran_by_id(session, 1)
 
-    # Assign Soal objects to TugasPembelajaran's soal attribute
-    tugas_pembelajaran.soal = [soal_abc, soal_benar_salah, soal_multi_pilih]
-    soal_abc.pilihan = [MagicMock(spec=models.JawabanABC)]
-    soal_benar_salah.pilihan = [MagicMock(spec=models.JawabanBenarSalah)]
-    soal_multi_pilih.pilihan = [MagicMock(spec=models.JawabanMultiPilih)]
-
-    # Mock the query method to return the TugasPembelajaran object
-    session.query.return_value.get.return_value = tugas_pembelajaran
-
-    # Call the function being tested
-    result = delete_tugas_pembelajaran_by_id(session, tugas_pembelajaran_id)
-
-    # Assertions
-    session.query.return_value.get.assert_called_once_with(tugas_pembelajaran_id)
-    assert session.query.return_value.get.return_value.video.id == tugas_pembelajaran_id
-    assert session.delete.call_count == 7  # 1 for TugasPembelajaran, 3 for Soal objects, and 3 for each Answers
-    assert session.commit.called_once()
+    # tidak ada objek yang dimuat atau dihapus satu per satu
+    session.delete.assert_not_called()
+    session.query.return_value.get.assert_not_called()
+    session.commit.assert_called_once()
     assert result is True
 
 def test_delete_tugas_pembelajaran_by_id_not_found():
     session = MagicMock(spec=Session)
-    tugas_pembelajaran_id = 1
-    session.query.return_value.get.return_value = None
+    session.execute.return_value.rowcount = 0
 
-    result = delete_tugas_pembelajaran_by_id(session, tugas_pembelajaran_id)
+    result = delete_tugas_pembelajaran_by_id(session, 1)
 
-    session.query.return_value.get.assert_called_once_with(tugas_pembelajaran_id)
     assert result is False
 
 
@@ -1586,4 +1546,293 @@ def test_update_user_mentor_data_by_id():
         mentor.nama_lengkap,
         DOMAIN_URL + "/user/aktivasi?id=1&otp=" + mentor.activation_code,
     )
-    assert result == mentor
\ No newline at end of file
+    assert result == mentor
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    from sqlalchemy import create_engine
+    engine = create_engine(f"sqlite:///{tmp_path}/crud.db")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+@pytest.fixture
+def video_tanpa_tugas(sqlite_db):
+    mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+    sqlite_db.add(mentor)
+    sqlite_db.flush()
+    video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key")
+    sqlite_db.add(video)
+    sqlite_db.commit()
+    return video.id
+
+def daftar_soal_campuran(jumlah):
+    daftar_soal = []
+    for i in range(jumlah):
+        daftar_soal += [
+            schema.SoalABCKunci(pertanyaan=f"abc {i}", pilihan_jawaban=["a", "b", "c", "d"], index_jawaban_benar=2),
+            schema.SoalBenarSalah(pertanyaan=f"bs {i}", pernyataan_pada_benar="Benar", pernyataan_pada_salah="Salah",
+                                  daftar_jawaban=[schema.JawabanBenarSalahKunci(isi_jawaban="x", jawaban_pernyataan_yang_benar=True),
+                                                  schema.JawabanBenarSalahKunci(isi_jawaban="y", jawaban_pernyataan_yang_benar=False)]),
+            schema.SoalMultiPilih(pertanyaan=f"mp {i}",
+                                  pilihan=[schema.JawabanMultiPilihKunci(isi_jawaban="p", jawaban_ini_benar=True),
+                                           schema.JawabanMultiPilihKunci(isi_jawaban="q", jawaban_ini_benar=False)]),
+        ]
+    return daftar_soal
+
+def test_create_tugas_pembelajaran_lengkap(sqlite_db, video_tanpa_tugas):
+    db = sqlite_db
+
+    db_tugas, soal_ids = create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video_tanpa_tugas, daftar_soal_campuran(2))
+
+    # Soal dibuat sesuai urutan input, lengkap dengan kunci dan jawabannya
+    assert db_tugas.attempt_allowed == 3
+    assert soal_ids == sorted(soal_ids)
+    soal = db.query(models.Soal).filter(models.Soal.id_tugas == db_tugas.id).order_by(models.Soal.id).all()
+    assert [s.id for s in soal] == soal_ids
+    assert [s.pertanyaan for s in soal] == ["abc 0", "bs 0", "mp 0", "abc 1", "bs 1", "mp 1"]
+    assert soal[0].kunci == 2
+    assert [j.jawaban for j in soal[0].pilihan] == ["a", "b", "c", "d"]
+    assert [j.kunci for j in soal[1].pilihan] == [True, False]
+    assert [j.benar for j in soal[2].pilihan] == [True, False]
+    assert db.get(models.VideoPembelajaran, video_tanpa_tugas).id_tugas == db_tugas.id
+
+def test_create_tugas_pembelajaran_lengkap_statement_count_does_not_grow(sqlite_db, video_tanpa_tugas):
+    from sqlalchemy import event
+    db = sqlite_db
+    video_lain = models.VideoPembelajaran(creator_id=db.get(models.VideoPembelajaran, video_tanpa_tugas).creator_id,
+                                          judul="Video 2", s3_key="key2")
+    db.add(video_lain)
+    db.commit()
+
+    jumlah = []
+    for id_video, banyak_soal in ((video_tanpa_tugas, 1), (video_lain.id, 20)):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        create_tugas_pembelajaran_lengkap(db, "Tugas", 1, id_video, daftar_soal_campuran(banyak_soal))
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+        jumlah.append(len(statements))
+
+    assert jumlah[0] == jumlah[1]
+    # id soal dipasangkan lewat kolom sentinel, bukan diurutkan
+    insert_soal = [s for s in statements if s.startswith("INSERT INTO soal ")]
+    assert len(insert_soal) == 1 and "RETURNING id, sentinel" in insert_soal[0]
+
+def test_create_tugas_pembelajaran_lengkap_rolls_back_when_video_already_has_tugas(sqlite_db, video_tanpa_tugas):
+    db = sqlite_db
+    create_tugas_pembelajaran_lengkap(db, "Tugas", 1, video_tanpa_tugas, daftar_soal_campuran(1))
+
+    with pytest.raises(NoResultFound):
+        create_tugas_pembelajaran_lengkap(db, "Tugas kedua", 1, video_tanpa_tugas, daftar_soal_campuran(1))
+
+    # Tidak ada tugas atau soal setengah jadi yang tertinggal
+    assert db.query(models.TugasPembelajaran).count() == 1
+    assert db.query(models.Soal).count() == 3
+    assert db.query(models.JawabanABC).count() == 4
+
+def test_read_tugas_pembelajaran_lengkap_by_id_loads_tree_with_fixed_queries(sqlite_db, video_tanpa_tugas):
+    from sqlalchemy import event
+    db = sqlite_db
+    db_tugas, soal_ids = create_tugas_pembelajaran_lengkap(db, "Tugas", 1, video_tanpa_tugas, daftar_soal_campuran(5))
+    db.expunge_all()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    tugas = read_tugas_pembelajaran_lengkap_by_id(db, db_tugas.id)
+    # Akses semua atribut yang dipakai main.py tidak boleh memicu lazy load
+    isi = [(soal.id, type(soal).__name__, [jawaban.jawaban for jawaban in soal.pilihan]) for soal in tugas.soal]
+    kunci = [soal.kunci for soal in tugas.soal if isinstance(soal, models.SoalABC)]
+    video = tugas.video.id
+    event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    assert len(statements) == 5
+    assert [soal_id for soal_id, _, _ in isi] == soal_ids
+    assert [nama for _, nama, _ in isi][:3] == ["SoalABC", "SoalBenarSalah", "SoalMultiPilih"]
+    assert isi[0][2] == ["a", "b", "c", "d"]
+    assert kunci == [2] * 5
+    assert video == video_tanpa_tugas
+
+@pytest.fixture
+def tugas_dan_pelajar(sqlite_db, video_tanpa_tugas):
+    db = sqlite_db
+    db_tugas, _ = create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video_tanpa_tugas, daftar_soal_campuran(1))
+    pelajar = models.Pelajar(email="pelajar@example.com", nama_lengkap="Pelajar", asal_sekolah="SMA 1", jurusan="IPA")
+    db.add(pelajar)
+    db.commit()
+    return db_tugas.id, pelajar.id
+
+def test_attempt_limit_counts_existing_attempts(sqlite_db, tugas_dan_pelajar):
+    db = sqlite_db
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    # attempt lama yang dibuat sebelum ada tabel rekap
+    db.add_all([models.AttemptMengerjakanTugas(id_pelajar=id_pelajar, id_tugas=id_tugas, nilai=50, waktu_mulai=waktu, waktu_selesai=waktu)
+                for _ in range(2)])
+    db.commit()
+
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu, attempt_allowed=3)
+    with pytest.raises(BatasAttemptTercapai):
+        create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu, attempt_allowed=3)
+
+    assert len(read_attempt_mengerjakan_tugas(db, id_tugas, id_pelajar)) == 3
+    rekap = db.get(models.RekapAttemptTugas, (id_pelajar, id_tugas))
+    assert rekap.jumlah_attempt == 3
+
+    assert delete_tugas_pembelajaran_by_id(db, id_tugas)
+    assert db.get(models.RekapAttemptTugas, (id_pelajar, id_tugas)) is None
+
+def test_attempt_limit_holds_under_concurrent_submits(sqlite_db, tugas_dan_pelajar):
+    import threading
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    engine = sqlite_db.get_bind()
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    hasil = []
+    mulai = threading.Barrier(8)
+
+    def kirim():
+        with Session(engine) as db:
+            mulai.wait()
+            try:
+                create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu, attempt_allowed=3)
+                hasil.append("ok")
+            except BatasAttemptTercapai:
+                hasil.append("ditolak")
+
+    threads = [threading.Thread(target=kirim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(hasil) == ["ditolak"] * 5 + ["ok"] * 3
+    assert len(read_attempt_mengerjakan_tugas(sqlite_db, id_tugas, id_pelajar)) == 3
+
+def test_rekap_nilai_is_updated_with_each_attempt(sqlite_db, tugas_dan_pelajar):
+    db = sqlite_db
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    db.add(models.AttemptMengerjakanTugas(id_pelajar=id_pelajar, id_tugas=id_tugas, nilai=7.0, waktu_mulai=waktu, waktu_selesai=waktu))
+    db.commit()
+
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu, attempt_allowed=3)
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.25, waktu, waktu, attempt_allowed=3)
+    with pytest.raises(BatasAttemptTercapai):
+        create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 1.0, waktu, waktu, attempt_allowed=3)
+
+    [rekap] = read_rekap_nilai_filter_by(db, id_pelajar=id_pelajar)
+    assert (rekap.jumlah_attempt, rekap.nilai_terbaik, rekap.nilai_terakhir) == (3, 7.0, 2.5)
+    assert rekap.rata_rata == pytest.approx((7.0 + 5.0 + 2.5) / 3)
+    assert read_rekap_nilai_filter_by(db, id_tugas=id_tugas + 1) == []
+
+def test_rekap_nilai_per_mapel(sqlite_db, tugas_dan_pelajar):
+    db = sqlite_db
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    materi = models.Materi(nama="Aljabar", mapel=models.DaftarMapelSkolastik.penalaran_matematika)
+    db.add(materi)
+    db.flush()
+    db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id_tugas == id_tugas).update({"id_materi": materi.id})
+    db.commit()
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu)
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.9, waktu, waktu)
+
+    [mapel] = read_rekap_nilai_per_mapel(db, id_pelajar)
+
+    assert mapel.mapel == models.DaftarMapelSkolastik.penalaran_matematika
+    assert (mapel.jumlah_tugas, mapel.jumlah_attempt) == (1, 2)
+    assert mapel.rata_rata == pytest.approx(7.0)
+    assert mapel.rata_rata_terbaik == pytest.approx(9.0)
+    assert read_rekap_nilai_per_mapel(db, id_pelajar + 1) == []
+
+def test_penghitung_tugas_mengikuti_soal_dan_attempt(sqlite_db, tugas_dan_pelajar):
+    db = sqlite_db
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    penghitung = lambda: db.execute(select(models.TugasPembelajaran.jumlah_soal, JUMLAH_ATTEMPT_TUGAS)
+                                    .where(models.TugasPembelajaran.id == id_tugas)).one()
+
+    assert penghitung() == (3, 0)
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu)
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.9, waktu, waktu)
+    create_soal_abc(db, "soal baru", id_tugas)
+    assert penghitung() == (4, 2)
+
+    # hitung ulang tidak mengubah penghitung yang sudah benar
+    db.query(models.TugasPembelajaran).update({"jumlah_soal": 0})
+    for statement in hitung_ulang_penghitung_stmts():
+        db.execute(statement)
+    db.commit()
+    assert penghitung() == (4, 2)
+
+def test_pengumpulan_bersamaan_pada_tugas_yang_sama(tmp_path):
+    import threading
+    from sqlalchemy import create_engine
+    engine = create_engine(f"sqlite:///{tmp_path}/bersamaan.db", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db_tugas = models.TugasPembelajaran(judul="Tugas", attempt_allowed=3)
+        daftar_pelajar = [models.Pelajar(email=f"p{i}@example.com", nama_lengkap="P", asal_sekolah="SMA", jurusan="IPA")
+                          for i in range(2)]
+        db.add_all([db_tugas, *daftar_pelajar])
+        db.commit()
+        id_tugas, ids_pelajar = db_tugas.id, [pelajar.id for pelajar in daftar_pelajar]
+
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    mulai = threading.Barrier(len(ids_pelajar))
+    gagal = []
+
+    def kumpul(id_pelajar):
+        with Session(engine) as db:
+            mulai.wait()
+            try:
+                create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, 0.5, waktu, waktu, attempt_allowed=3)
+            except Exception as e:
+                gagal.append(e)
+
+    threads = [threading.Thread(target=kumpul, args=(id_pelajar,)) for id_pelajar in ids_pelajar]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert gagal == []
+    with Session(engine) as db:
+        assert db.execute(select(JUMLAH_ATTEMPT_TUGAS).where(models.TugasPembelajaran.id == id_tugas)).scalar_one() == 2
+        assert db.query(models.AttemptMengerjakanTugas).count() == 2
+    engine.dispose()
+
+def test_delete_tugas_menghapus_seluruh_pohon(sqlite_db, tugas_dan_pelajar):
+    import grading
+    db = sqlite_db
+    id_tugas, id_pelajar = tugas_dan_pelajar
+    waktu = datetime.datetime(2023, 5, 20, 10, 0)
+    video_lain = models.VideoPembelajaran(judul="Video lain", s3_key="key lain")
+    db.add(video_lain)
+    db.commit()
+    tugas_lain, _ = create_tugas_pembelajaran_lengkap(db, "Lain", 3, video_lain.id, daftar_soal_campuran(1))
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+    nilai, per_soal = grading.nilai_per_soal(kunci, ["2", ["1", "0"], ["1", "0"]])
+    create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, nilai, waktu, waktu, kunci=kunci, per_soal=per_soal)
+    assert db.query(models.JawabanAttempt).count() == 3
+    db.add(models.RegradeTugas(id_tugas=id_tugas, status="selesai"))
+    db.commit()
+
+    assert delete_tugas_pembelajaran_by_id(db, id_tugas) is True
+    assert delete_tugas_pembelajaran_by_id(db, id_tugas) is False
+
+    soal_lain = {id for id, in db.query(models.Soal.id).filter(models.Soal.id_tugas == tugas_lain.id)}
+    assert len(soal_lain) == 3
+    for model in (models.JawabanABC, models.JawabanBenarSalah, models.JawabanMultiPilih,
+                  models.SoalABC, models.SoalBenarSalah, models.SoalMultiPilih):
+        # hanya soal dan pilihan milik tugas lain yang tersisa
+        assert {id for id, in db.query(model.id_soal)} <= soal_lain
+        assert db.query(model).count() > 0
+    for model in (models.AttemptMengerjakanTugas, models.RekapAttemptTugas, models.JawabanAttempt,
+                  models.RegradeTugas):
+        assert db.query(model).count() == 0
+    assert db.query(models.Soal).count() == 3
+    assert db.query(models.VideoPembelajaran).filter(models.VideoPembelajaran.id_tugas == id_tugas).count() == 0
+    assert db.query(models.TugasPembelajaran).one().id == tugas_lain.id
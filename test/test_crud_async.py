@@ -0,0 +1,95 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import crud_async
+import models
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/async_test.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def seeded_db(db):
+    mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", keahlian="Math", Asal="UI")
+    pelajar = models.Pelajar(email="pelajar@example.com", nama_lengkap="Pelajar", asal_sekolah="SMA 1", jurusan="IPA")
+    materi1 = models.Materi(nama="Aljabar", mapel=models.DaftarMapelSkolastik.kuantitatif, jumlah_video=2)
+    materi2 = models.Materi(nama="Grammar", mapel=models.DaftarMapelSkolastik.literasi_inggris, jumlah_video=1)
+    db.add_all([mentor, pelajar, materi1, materi2])
+    await db.flush()
+
+    tugas = models.TugasPembelajaran(judul="Tugas Aljabar", attempt_allowed=3)
+    db.add(tugas)
+    await db.flush()
+
+    db.add_all([
+        models.VideoPembelajaran(creator_id=mentor.uid, judul="Video 1", id_materi=materi1.id, s3_key="a", id_tugas=tugas.id),
+        models.VideoPembelajaran(creator_id=mentor.uid, judul="Video 2", id_materi=materi1.id, s3_key="b"),
+        models.VideoPembelajaran(creator_id=mentor.uid, judul="Video 3", id_materi=materi2.id, s3_key="c"),
+        models.AttemptMengerjakanTugas(id_pelajar=pelajar.uid, id_tugas=tugas.id, nilai=80.0),
+    ])
+    await db.commit()
+    return {"mentor": mentor, "pelajar": pelajar, "materi1": materi1, "materi2": materi2, "tugas": tugas}
+
+
+@pytest.mark.asyncio
+async def test_read_ringkas_materi_pembelajaran_filter_by(seeded_db, db):
+    result, preview = await crud_async.read_ringkas_materi_pembelajaran_filter_by(db, preview_video=5, id_mapel=1)
+
+    assert [materi.nama for materi in result] == ["Aljabar"]
+    assert sorted(video.judul for video in preview[result[0].id]) == ["Video 1", "Video 2"]
+
+    result, _ = await crud_async.read_ringkas_materi_pembelajaran_filter_by(db, nama_mapel="literasi_inggris")
+    assert [materi.nama for materi in result] == ["Grammar"]
+
+
+@pytest.mark.asyncio
+async def test_read_ringkas_materi_caps_video_preview(seeded_db, db):
+    materi, preview = await crud_async.read_ringkas_materi_pembelajaran_filter_by(db, preview_video=1)
+    assert [(m.nama, m.jumlah_video) for m in materi] == [("Aljabar", 2), ("Grammar", 1)]
+    assert {id_materi: [video.judul for video in daftar] for id_materi, daftar in preview.items()} == {
+        seeded_db["materi1"].id: ["Video 2"], seeded_db["materi2"].id: ["Video 3"]}
+
+    materi, preview = await crud_async.read_ringkas_materi_pembelajaran_filter_by(db, id_mapel=1)
+    assert [m.jumlah_video for m in materi] == [2]
+    assert preview == {}
+
+    daftar = await crud_async.read_ringkas_video_by_materi(db, seeded_db["materi1"].id, limit=1)
+    assert [video.judul for video in daftar] == ["Video 1"]
+
+
+@pytest.mark.asyncio
+async def test_read_ringkas_video_pembelajaran(seeded_db, db):
+    result = await crud_async.read_ringkas_video_pembelajaran(db, id_materi=seeded_db["materi1"].id)
+    assert len(result) == 2
+    assert all(video.materi__nama == "Aljabar" for video in result)
+
+    result = await crud_async.read_ringkas_video_pembelajaran(db, judul="video 3")
+    assert [video.judul for video in result] == ["Video 3"]
+
+    result = await crud_async.read_ringkas_video_pembelajaran(db, limit=2, page=2)
+    assert len(result) == 1
+
+
+@pytest.mark.asyncio
+async def test_read_ringkas_tugas_pembelajaran_filter_by(seeded_db, db):
+    result = await crud_async.read_ringkas_tugas_pembelajaran_filter_by(db, mapel="kuantitatif")
+    assert len(result) == 1
+    assert result[0].video__judul == "Video 1"
+    assert result[0].jumlah_attempt == 0
+
+    result = await crud_async.read_ringkas_tugas_pembelajaran_filter_by(db, id_materi=seeded_db["materi2"].id)
+    assert result == []
+
+    result = await crud_async.read_ringkas_tugas_pembelajaran_filter_by(db, id_mentor=seeded_db["mentor"].uid)
+    assert len(result) == 1
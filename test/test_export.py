@@ -0,0 +1,121 @@
+import csv
+import datetime
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import database
+import export
+import main
+import models
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/export.db")
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def data(session_factory):
+    with session_factory() as db:
+        daftar_pelajar = [
+            models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar, {i}", asal_sekolah="SMA 1",
+                           jurusan="IPA", is_member=i % 2 == 0)
+            for i in range(3)
+        ]
+        daftar_tugas = [models.TugasPembelajaran(judul=f"Tugas \"{i}\"", attempt_allowed=3) for i in range(2)]
+        db.add_all([*daftar_pelajar, *daftar_tugas])
+        db.flush()
+        db.add_all([
+            models.AttemptMengerjakanTugas(id_pelajar=pelajar.id, id_tugas=tugas.id, nilai=float(i + j),
+                                           waktu_mulai=WAKTU, waktu_selesai=WAKTU)
+            for i, pelajar in enumerate(daftar_pelajar) for j, tugas in enumerate(daftar_tugas)
+        ])
+        db.commit()
+        return {"pelajar": [p.id for p in daftar_pelajar], "tugas": [t.id for t in daftar_tugas]}
+
+
+def test_csv_export_joins_names_and_titles(session_factory, data):
+    isi = "".join(export.stream(session_factory, export.nilai_stmt(), export.CSV))
+    header, *rows = list(csv.reader(io.StringIO(isi)))
+
+    assert header == ["id_attempt", "id_pelajar", "nama_pelajar", "email_pelajar", "id_tugas", "judul_tugas",
+                      "nilai", "waktu_mulai", "waktu_selesai"]
+    assert len(rows) == 6
+    assert rows[0][2:4] == ["Pelajar, 0", "pelajar0@example.com"]
+    assert rows[1][5] == 'Tugas "1"'
+    assert rows[0][7] == WAKTU.isoformat()
+
+def test_ndjson_export_filters(session_factory, data):
+    isi = "".join(export.stream(session_factory, export.nilai_stmt(id_tugas=data["tugas"][1]), export.NDJSON))
+    rows = [json.loads(line) for line in isi.splitlines()]
+
+    assert [row["id_pelajar"] for row in rows] == data["pelajar"]
+    assert {row["judul_tugas"] for row in rows} == {'Tugas "1"'}
+    assert [row["nilai"] for row in rows] == [1.0, 2.0, 3.0]
+
+def test_export_streams_one_query_in_batches(engine, session_factory, data):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    potongan = list(export.stream(session_factory, export.nilai_stmt(), export.CSV, batch_size=2))
+
+    # header ikut potongan pertama, lalu satu potongan per 2 baris
+    assert len(potongan) == 3
+    assert len(statements) == 1
+
+def test_empty_csv_export_has_header(session_factory):
+    assert list(export.stream(session_factory, export.pelajar_stmt(), export.CSV)) == [
+        "id,email,nama_lengkap,asal_sekolah,jurusan,is_member,is_active,time_created\r\n"]
+
+def test_endpoints(session_factory, data):
+    def get_db():
+        with session_factory() as db:
+            yield db
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    try:
+        client = TestClient(main.app)
+        response = client.get("/admin/export/pelajar", params={"format": "ndjson"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers["content-disposition"] == 'attachment; filename="pelajar.ndjson"'
+        assert [json.loads(line)["is_member"] for line in response.text.splitlines()] == [True, False, True]
+
+        response = client.get("/admin/export/nilai", params={"id_pelajar": data["pelajar"][0]})
+        assert response.headers["content-type"].startswith("text/csv")
+        assert len(response.text.splitlines()) == 1 + 2
+
+        assert client.get("/admin/export/nilai", params={"format": "xlsx"}).status_code == 400
+    finally:
+        main.app.dependency_overrides.clear()
+
+def test_export_reads_from_replica(tmp_path, engine, session_factory, data):
+    # primary kosong, semua baris hanya ada di replika
+    primary = create_engine(f"sqlite:///{tmp_path}/primary.db")
+    models.Base.metadata.create_all(primary)
+    read_session = sessionmaker(class_=database.RoutingSession, info={"primary": primary, "replicas": [engine]})
+
+    def get_db():
+        with read_session() as db:
+            yield db
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    try:
+        response = TestClient(main.app).get("/admin/export/pelajar", params={"format": "ndjson"})
+        assert len(response.text.splitlines()) == 3
+    finally:
+        main.app.dependency_overrides.clear()
+        primary.dispose()
@@ -0,0 +1,131 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import NoResultFound
+
+import cache
+import crud
+import grading
+import models
+import schema
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/grading.db")
+    models.Base.metadata.create_all(engine)
+    cache.hapus_semua()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
+
+@pytest.fixture
+def id_tugas(db):
+    mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+    db.add(mentor)
+    db.flush()
+    video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key")
+    db.add(video)
+    db.commit()
+    db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video.id, [
+        schema.SoalABCKunci(pertanyaan="abc", pilihan_jawaban=["a", "b", "c"], index_jawaban_benar=2),
+        schema.SoalBenarSalah(pertanyaan="bs", pernyataan_pada_benar="Benar", pernyataan_pada_salah="Salah",
+                              daftar_jawaban=[schema.JawabanBenarSalahKunci(isi_jawaban="x", jawaban_pernyataan_yang_benar=True),
+                                              schema.JawabanBenarSalahKunci(isi_jawaban="y", jawaban_pernyataan_yang_benar=False)]),
+        schema.SoalMultiPilih(pertanyaan="mp", pilihan=[
+            schema.JawabanMultiPilihKunci(isi_jawaban="p", jawaban_ini_benar=True),
+            schema.JawabanMultiPilihKunci(isi_jawaban="q", jawaban_ini_benar=False),
+            schema.JawabanMultiPilihKunci(isi_jawaban="r", jawaban_ini_benar=True),
+            schema.JawabanMultiPilihKunci(isi_jawaban="s", jawaban_ini_benar=False)]),
+    ])
+    return db_tugas.id
+
+
+def test_kompilasi_flattens_keys(db, id_tugas):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    assert kunci.id_tugas == id_tugas
+    assert kunci.attempt_allowed == 3
+    assert kunci.ada_video
+    assert kunci.jenis == (grading.ABC, grading.BENAR_SALAH, grading.MULTI_PILIH)
+    assert kunci.awal == (0, 1, 3)
+    assert kunci.jumlah == (0, 2, 4)
+    assert kunci.kunci == (2, 1, 0, 1, 0, 1, 0)
+
+@pytest.mark.parametrize("jawaban,nilai", [
+    (["2", ["1", "0"], ["1", "0", "1", "0"]], 1.0),
+    (["1", ["1", "0"], ["1", "0", "1", "0"]], 2 / 3),
+    (["2", ["0", "0"], ["1", "1", "1", "1"]], (1 + 0.5 + 0.5) / 3),
+    (["0", ["0", "1"], ["0", "1", "0", "1"]], 0.0),
+])
+def test_nilai_jawaban(db, id_tugas, jawaban, nilai):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    assert grading.nilai_jawaban(kunci, jawaban) == pytest.approx(nilai)
+
+@pytest.mark.parametrize("jawaban", [
+    ["2", ["1", "0"]],
+    ["2", ["1"], ["1", "0", "1", "0"]],
+    [["2"], ["1", "0"], ["1", "0", "1", "0"]],
+    ["a", ["1", "0"], ["1", "0", "1", "0"]],
+])
+def test_invalid_answers_are_rejected(db, id_tugas, jawaban):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    with pytest.raises(grading.JawabanTidakValid):
+        grading.nilai_jawaban(kunci, jawaban)
+
+def test_missing_tugas_raises(db):
+    with pytest.raises(NoResultFound):
+        grading.read_kunci_jawaban(db, 99)
+
+def test_warm_key_does_not_touch_soal_tables(engine, db, id_tugas):
+    grading.read_kunci_jawaban(db, id_tugas)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    assert statements == []
+    assert cache.kunci_jawaban.get(id_tugas) is kunci
+
+def test_key_is_recompiled_after_soal_change(db, id_tugas):
+    lama = grading.read_kunci_jawaban(db, id_tugas)
+
+    crud.create_soal_abc(db, "abc 2", id_tugas)
+
+    baru = grading.read_kunci_jawaban(db, id_tugas)
+    assert baru is not lama
+    assert len(baru) == 4
+
+def test_key_is_invalidated_when_video_is_deleted(db, id_tugas, monkeypatch):
+    monkeypatch.setattr(crud, "s3", type("S3", (), {"delete_object": lambda self, **kwargs: None})())
+    id_video = db.query(models.VideoPembelajaran.id).filter(models.VideoPembelajaran.id_tugas == id_tugas).scalar()
+    assert grading.read_kunci_jawaban(db, id_tugas).ada_video
+
+    crud.delete_video_pembelajaran_by_id(db, id_video)
+
+    assert not grading.read_kunci_jawaban(db, id_tugas).ada_video
+
+def test_nilai_per_soal_encodes_answers(db, id_tugas):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    nilai, per_soal = grading.nilai_per_soal(kunci, ["1", ["1", "1"], ["1", "0", "0", "1"]])
+
+    assert per_soal == [(1, 0.0), (0b11, 0.5), (0b1001, 0.5)]
+    assert nilai == pytest.approx(1 / 3)
+    assert kunci.pilihan == (3, 2, 4)
+    assert len(kunci.id_soal) == 3
+
+@pytest.mark.parametrize("isi", ["3", "-2", str(2 ** 40)])
+def test_abc_answer_outside_choices_is_stored_as_unanswered(db, id_tugas, isi):
+    kunci = grading.read_kunci_jawaban(db, id_tugas)
+
+    nilai, per_soal = grading.nilai_per_soal(kunci, [isi, ["1", "0"], ["1", "0", "1", "0"]])
+
+    assert per_soal[0] == (grading.TIDAK_DIJAWAB, 0.0)
+    assert nilai == pytest.approx(2 / 3)
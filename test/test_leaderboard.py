@@ -0,0 +1,217 @@
+import datetime
+import time
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import auth
+import crud
+import leaderboard
+import main
+import models
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0)
+MTK = models.DaftarMapelSkolastik.penalaran_matematika
+INGGRIS = models.DaftarMapelSkolastik.literasi_inggris
+
+
+def test_papan_peringkat_ranks_ties_equally():
+    papan = leaderboard.PapanPeringkat()
+    for id_pelajar, skor in [(1, 5.0), (2, 9.0), (3, 7.0), (4, 7.0), (5, 2.0)]:
+        papan.perbarui(id_pelajar, skor)
+
+    assert papan.teratas(4) == [(1, 2, 9.0), (2, 3, 7.0), (2, 4, 7.0), (4, 1, 5.0)]
+    assert [papan.peringkat(i) for i in range(1, 7)] == [4, 1, 2, 2, 5, None]
+
+    papan.perbarui(5, 10.0)
+    papan.hapus(2)
+    assert papan.teratas(10) == [(1, 5, 10.0), (2, 3, 7.0), (2, 4, 7.0), (4, 1, 5.0)]
+    assert len(papan) == 4
+    assert papan.ukuran_memori() > 0
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/leaderboard.db")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+@pytest.fixture
+def data(db):
+    mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+    daftar_pelajar = [
+        models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", asal_sekolah="SMA 1", jurusan="IPA")
+        for i in range(3)
+    ]
+    materi = [models.Materi(nama="Aljabar", mapel=MTK), models.Materi(nama="Grammar", mapel=INGGRIS)]
+    daftar_tugas = [models.TugasPembelajaran(judul=f"Tugas {i}", attempt_allowed=5) for i in range(3)]
+    db.add_all([mentor, *daftar_pelajar, *materi, *daftar_tugas])
+    db.flush()
+    # tugas 0 dan 1 di matematika, tugas 2 di bahasa inggris
+    db.add_all([
+        models.VideoPembelajaran(creator_id=mentor.id, judul=f"Video {i}", id_tugas=tugas.id,
+                                 id_materi=materi[0 if i < 2 else 1].id)
+        for i, tugas in enumerate(daftar_tugas)
+    ])
+    db.commit()
+    return {"pelajar": [p.id for p in daftar_pelajar], "tugas": [t.id for t in daftar_tugas]}
+
+def kumpul(db, id_pelajar, id_tugas, nilai, mapel):
+    attempt = crud.create_new_attempt_mengerjakan_tugas(db, id_pelajar, id_tugas, nilai, WAKTU, WAKTU)
+    leaderboard.catat_nilai(id_pelajar, id_tugas, attempt.nilai, mapel)
+
+def isi_nilai(db, data):
+    a, b, c = data["pelajar"]
+    t0, t1, t2 = data["tugas"]
+    for id_pelajar, id_tugas, nilai, mapel in [
+        (a, t0, 0.8, MTK), (a, t0, 0.6, MTK), (b, t0, 0.9, MTK), (c, t0, 0.5, MTK),
+        (a, t1, 0.7, MTK), (b, t1, 0.3, MTK),
+        (c, t2, 1.0, INGGRIS), (a, t2, 0.4, INGGRIS),
+    ]:
+        kumpul(db, id_pelajar, id_tugas, nilai, mapel)
+
+
+def test_incremental_updates_match_rebuild(db, data):
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+    a, b, c = data["pelajar"]
+    t0, t1, t2 = data["tugas"]
+
+    bertahap = (leaderboard.papan_tugas(t0, 10, a), leaderboard.papan_mapel(MTK, 10, c), leaderboard.papan_mapel(INGGRIS))
+    leaderboard.muat_ulang(db)
+    dibangun_ulang = (leaderboard.papan_tugas(t0, 10, a), leaderboard.papan_mapel(MTK, 10, c), leaderboard.papan_mapel(INGGRIS))
+
+    assert bertahap == dibangun_ulang
+    tugas, mtk, inggris = dibangun_ulang
+    assert [(p["id_pelajar"], p["nilai"]) for p in tugas["teratas"]] == [(b, 9.0), (a, 8.0), (c, 5.0)]
+    assert tugas["pelajar"] == {"peringkat": 2, "id_pelajar": a, "nilai": 8.0}
+    assert [(p["id_pelajar"], p["nilai"]) for p in mtk["teratas"]] == [(a, 15.0), (b, 12.0), (c, 5.0)]
+    assert mtk["pelajar"]["peringkat"] == 3
+    assert [p["id_pelajar"] for p in inggris["teratas"]] == [c, a]
+
+def test_deleting_tugas_updates_mapel_board(db, data):
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+    a, b, c = data["pelajar"]
+    t0, t1, t2 = data["tugas"]
+
+    crud.delete_tugas_pembelajaran_by_id(db, t0)
+
+    assert leaderboard.papan_tugas(t0)["jumlah_pelajar"] == 0
+    mtk = leaderboard.papan_mapel(MTK)
+    assert [(p["id_pelajar"], p["nilai"]) for p in mtk["teratas"]] == [(a, 7.0), (b, 3.0)]
+    leaderboard.muat_ulang(db)
+    assert leaderboard.papan_mapel(MTK) == mtk
+
+def test_updates_during_rebuild_are_not_lost(db, data):
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+    a, b, c = data["pelajar"]
+    t0, t1, t2 = data["tugas"]
+    query_asli = leaderboard._nilai_terbaik_query
+
+    class QuerySelamaMuat:
+        def __init__(self, db):
+            self.rows = query_asli(db).all()
+        def yield_per(self, n):
+            yield from self.rows
+            # nilai yang dicatat worker ini setelah rekap dibaca
+            leaderboard.catat_nilai(c, t1, 10.0, MTK)
+            leaderboard.hapus_tugas(t2)
+
+    with mock.patch.object(leaderboard, "_nilai_terbaik_query", QuerySelamaMuat):
+        leaderboard.muat_ulang(db)
+
+    assert leaderboard.papan_tugas(t1)["teratas"][0] == {"peringkat": 1, "id_pelajar": c, "nilai": 10.0}
+    assert leaderboard.papan_mapel(MTK, 10, c)["pelajar"]["nilai"] == 15.0
+    assert leaderboard.papan_tugas(t2)["jumlah_pelajar"] == 0
+    assert leaderboard.papan_mapel(INGGRIS)["jumlah_pelajar"] == 0
+
+def test_periodic_rebuild_picks_up_other_workers(db, data):
+    leaderboard.muat_ulang(db)
+    a = data["pelajar"][0]
+    t0 = data["tugas"][0]
+    # attempt yang dicatat worker lain: ada di database, tidak lewat catat_nilai worker ini
+    crud.create_new_attempt_mengerjakan_tugas(db, a, t0, 0.7, WAKTU, WAKTU)
+    assert leaderboard.papan_tugas(t0)["jumlah_pelajar"] == 0
+
+    thread = leaderboard.mulai_muat_ulang_berkala(sessionmaker(bind=db.get_bind()), interval=0.01)
+    try:
+        batas = time.monotonic() + 5
+        while leaderboard.papan_tugas(t0)["jumlah_pelajar"] == 0 and time.monotonic() < batas:
+            time.sleep(0.01)
+    finally:
+        leaderboard.hentikan_muat_ulang_berkala()
+        thread.join()
+    assert leaderboard.papan_tugas(t0)["teratas"][0]["nilai"] == 7.0
+
+def test_rebuild_reads_rekap_not_attempts(db, data):
+    from sqlalchemy import event
+    isi_nilai(db, data)
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    leaderboard.muat_ulang(db)
+    event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    [statement] = statements
+    assert "FROM rekap_attempt_tugas" in statement
+    assert "mengerjakan_tugas " not in statement and "GROUP BY" not in statement
+
+def test_stats_does_not_block_submissions(db, data, monkeypatch):
+    import threading
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+    a, t0 = data["pelajar"][0], data["tugas"][0]
+    ukuran_asli = leaderboard.PapanPeringkat.ukuran_memori
+    selesai = []
+
+    def ukuran_memori(papan):
+        # catat_nilai dari thread lain tetap jalan selama memori dihitung
+        if not selesai:
+            thread = threading.Thread(target=lambda: selesai.append(leaderboard.catat_nilai(a, t0, 10.0, MTK)))
+            thread.start()
+            thread.join(timeout=5)
+        return ukuran_asli(papan)
+    monkeypatch.setattr(leaderboard.PapanPeringkat, "ukuran_memori", ukuran_memori)
+
+    assert leaderboard.stats()["memori_byte"] > 0
+    assert selesai
+    assert leaderboard.papan_tugas(t0, 10, a)["pelajar"]["nilai"] == 10.0
+
+def test_stats_report_memory(db, data):
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+
+    stats = leaderboard.stats()
+    assert (stats["jumlah_papan_tugas"], stats["jumlah_papan_mapel"]) == (3, 2)
+    assert stats["jumlah_entri"] == 3 + 2 + 2 + 3 + 2
+    assert stats["memori_byte"] > 0
+
+
+def test_endpoints(db, data):
+    leaderboard.muat_ulang(db)
+    isi_nilai(db, data)
+    a = data["pelajar"][0]
+    main.app.dependency_overrides[auth.get_token_dynamic] = lambda: None
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    try:
+        client = TestClient(main.app)
+        response = client.get("/video/tugas/leaderboard", params={"id_tugas": data["tugas"][0], "limit": 1, "id_pelajar": a})
+        assert response.json() == {
+            "jumlah_pelajar": 3,
+            "teratas": [{"peringkat": 1, "id_pelajar": data["pelajar"][1], "nilai": 9.0}],
+            "pelajar": {"peringkat": 2, "id_pelajar": a, "nilai": 8.0},
+        }
+        response = client.get("/materi/leaderboard", params={"mapel": MTK.value})
+        assert response.json()["teratas"][0] == {"peringkat": 1, "id_pelajar": a, "nilai": 15.0}
+        assert client.get("/materi/leaderboard", params={"mapel": MTK.name}).json() == response.json()
+        assert client.get("/materi/leaderboard", params={"mapel": 99}).status_code == 400
+        assert client.get("/admin/leaderboard/stats").json()["jumlah_papan_tugas"] == 3
+    finally:
+        main.app.dependency_overrides.clear()
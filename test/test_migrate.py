@@ -0,0 +1,96 @@
+from sqlalchemy import create_engine, inspect
+
+import migrate
+import models
+
+
+def test_bootstrap_creates_database_and_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+
+    migrate.bootstrap(engine)
+
+    tables = set(inspect(engine).get_table_names())
+    assert set(models.Base.metadata.tables) <= tables
+    engine.dispose()
+
+def test_bootstrap_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+
+    migrate.bootstrap(engine)
+    migrate.bootstrap(engine)
+
+    assert "user" in inspect(engine).get_table_names()
+    engine.dispose()
+
+def test_bootstrap_adds_missing_indexes_to_existing_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_mengerjakan_tugas_id_pelajar_id_tugas")
+        conn.exec_driver_sql("DROP INDEX ix_soal_id_tugas")
+
+    assert migrate.bootstrap(engine) == ["ix_soal_id_tugas", "ix_mengerjakan_tugas_id_pelajar_id_tugas"]
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("mengerjakan_tugas")}
+    assert "ix_mengerjakan_tugas_id_pelajar_id_tugas" in indexes
+    assert migrate.bootstrap(engine) == []
+    engine.dispose()
+
+def test_bootstrap_adds_rekap_columns_and_backfills_them(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # tabel rekap versi lama, hanya dengan jumlah attempt
+        conn.exec_driver_sql("DROP TABLE rekap_attempt_tugas")
+        conn.exec_driver_sql("CREATE TABLE rekap_attempt_tugas (id_pelajar BIGINT NOT NULL, id_tugas BIGINT NOT NULL, "
+                             "jumlah_attempt INTEGER NOT NULL, PRIMARY KEY (id_pelajar, id_tugas))")
+        conn.exec_driver_sql("INSERT INTO mengerjakan_tugas (id_pelajar, id_tugas, nilai) VALUES (1, 1, 8), (1, 1, 4), (2, 1, 6)")
+        conn.exec_driver_sql("INSERT INTO rekap_attempt_tugas VALUES (1, 1, 2), (2, 1, 1)")
+
+    assert migrate.bootstrap(engine) == [
+        "rekap_attempt_tugas.nilai_terbaik", "rekap_attempt_tugas.nilai_terakhir", "rekap_attempt_tugas.total_nilai",
+        "ix_rekap_attempt_tugas_id_tugas",
+    ]
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT id_pelajar, jumlah_attempt, nilai_terbaik, nilai_terakhir, total_nilai "
+                                    "FROM rekap_attempt_tugas ORDER BY id_pelajar").all()
+    assert rows == [(1, 2, 8.0, 4.0, 12.0), (2, 1, 6.0, 6.0, 6.0)]
+    assert migrate.bootstrap(engine) == []
+    engine.dispose()
+
+def test_bootstrap_adds_counter_columns_and_backfills_them(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # database lama tanpa kolom penghitung
+        conn.exec_driver_sql("ALTER TABLE materi_pembelajaran DROP COLUMN jumlah_video")
+        conn.exec_driver_sql("ALTER TABLE tugas_pembelajaran DROP COLUMN jumlah_soal")
+        conn.exec_driver_sql("INSERT INTO materi_pembelajaran (id, nama) VALUES (1, 'a'), (2, 'b')")
+        conn.exec_driver_sql("INSERT INTO tugas_pembelajaran (id, judul) VALUES (1, 't'), (2, 'u')")
+        conn.exec_driver_sql("INSERT INTO video_pembelajaran (judul, id_materi) VALUES ('x', 1), ('y', 1)")
+        conn.exec_driver_sql("INSERT INTO soal (pertanyaan, id_tugas) VALUES ('p', 1), ('q', 1), ('r', 2)")
+
+    assert migrate.bootstrap(engine) == [
+        "materi_pembelajaran.jumlah_video", "tugas_pembelajaran.jumlah_soal",
+    ]
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT jumlah_video FROM materi_pembelajaran ORDER BY id").scalars().all() == [2, 0]
+        assert conn.exec_driver_sql("SELECT jumlah_soal FROM tugas_pembelajaran ORDER BY id").scalars().all() == [2, 1]
+    engine.dispose()
+
+def test_hitung_ulang_penghitung_repairs_drift(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/bootstrap.db")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO materi_pembelajaran (id, nama, jumlah_video) VALUES (1, 'a', 5)")
+        conn.exec_driver_sql("INSERT INTO tugas_pembelajaran (id, judul, jumlah_soal) VALUES (1, 't', 3)")
+        conn.exec_driver_sql("INSERT INTO soal (pertanyaan, id_tugas) VALUES ('p', 1)")
+
+    migrate.hitung_ulang_penghitung(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT jumlah_video FROM materi_pembelajaran").scalar() == 0
+        assert conn.exec_driver_sql("SELECT jumlah_soal FROM tugas_pembelajaran").scalar() == 1
+    engine.dispose()
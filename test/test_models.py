@@ -1,6 +1,10 @@
 import pytest
 from unittest.mock import MagicMock
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
 
+import crud
+import models
 from models import DaftarMapelSkolastik, User, Mentor, Pelajar, Admin, Materi, VideoPembelajaran
 
 @pytest.fixture
@@ -114,3 +118,79 @@ def test_video_pembelajaran_model(db_session):
     assert video_pembelajaran.creator_id == mentor.uid
     assert video_pembelajaran.id_materi == materi.id
     assert video_pembelajaran.s3_key == "test_video.mp4"
+
+
+@pytest.fixture
+def sqlite_session():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+def query_plans(session, fn):
+    """
+    Menjalankan fn dan mengembalikan EXPLAIN QUERY PLAN dari setiap statement
+    yang dijalankannya.
+    """
+    statements = []
+
+    def simpan(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", simpan)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", simpan)
+
+    with engine.connect() as conn:
+        return [
+            " ".join(row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+            for statement, parameters in statements
+        ]
+
+@pytest.mark.parametrize("query, index", [
+    (lambda db: crud.read_attempt_mengerjakan_tugas(db, 1, 1), "ix_mengerjakan_tugas_id_pelajar_id_tugas"),
+    (lambda db: crud.read_nilai_tugas_filter_by(db, id_pelajar=1), "ix_mengerjakan_tugas_id_pelajar_id_tugas"),
+    (lambda db: crud.read_nilai_tugas_filter_by(db, id_tugas=1), "ix_mengerjakan_tugas_id_tugas"),
+    (lambda db: crud.read_all_video_pembelajaran(db, id_mentor=1), "ix_video_pembelajaran_creator_id"),
+    (lambda db: crud.read_all_video_pembelajaran(db, id_materi=1), "ix_video_pembelajaran_id_materi"),
+    (lambda db: crud.read_tugas_pembelajaran_filter_by(db, limit=10, page=1), "ix_tugas_pembelajaran_time_created"),
+])
+def test_crud_queries_use_indexes(sqlite_session, query, index):
+    plans = query_plans(sqlite_session, lambda: query(sqlite_session))
+
+    assert len(plans) == 1
+    assert f"USING INDEX {index}" in plans[0]
+
+def test_soal_and_jawaban_loads_use_indexes(sqlite_session):
+    db = sqlite_session
+    tugas = models.TugasPembelajaran(judul="Tugas", attempt_allowed=1)
+    db.add(tugas)
+    db.flush()
+    db.add_all([
+        models.SoalABC(pertanyaan="a", id_tugas=tugas.id, pilihan=[models.JawabanABC(jawaban="x")]),
+        models.SoalBenarSalah(pertanyaan="b", id_tugas=tugas.id, pilihan=[models.JawabanBenarSalah(jawaban="x")]),
+        models.SoalMultiPilih(pertanyaan="c", id_tugas=tugas.id, pilihan=[models.JawabanMultiPilih(jawaban="x")]),
+    ])
+    db.commit()
+
+    def baca_tugas():
+        for soal in crud.read_tugas_pembelajaran_by_id(db, tugas.id).soal:
+            soal.pilihan
+
+    plans = " | ".join(query_plans(db, baca_tugas))
+
+    for index in ["ix_soal_id_tugas", "ix_jawaban_pilihan_ganda_id_soal",
+                  "ix_jawaban_benar_salah_id_soal", "ix_jawaban_multi_pilih_id_soal"]:
+        assert f"USING INDEX {index}" in plans
+
+def test_rekap_sums_are_double_precision_on_mysql():
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy.schema import CreateTable
+
+    ddl = str(CreateTable(models.RekapAttemptTugas.__table__).compile(dialect=mysql.dialect()))
+    assert "FLOAT" not in ddl
+    assert ddl.count("DOUBLE") == 3
@@ -0,0 +1,146 @@
+import datetime
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import crud
+import crud_async
+import main
+import models
+import pagination
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0, 0)
+
+
+def isi_data(db):
+    # time_created sengaja sama untuk beberapa tugas agar id dipakai sebagai pemisah
+    db.add_all([
+        models.TugasPembelajaran(judul=f"Tugas {i}", attempt_allowed=1, time_created=WAKTU + datetime.timedelta(minutes=i // 3))
+        for i in range(10)
+    ])
+    db.add_all([
+        models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", asal_sekolah="SMA 1", jurusan="IPA")
+        for i in range(7)
+    ])
+    db.commit()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pagination.db")
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        isi_data(db)
+    yield factory
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+@pytest_asyncio.fixture
+async def async_db(tmp_path, session_factory):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/pagination.db")
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+def semua_halaman(baca, limit):
+    hasil, cursor = [], None
+    while True:
+        halaman = baca(limit=limit, cursor=cursor)
+        hasil.append(halaman)
+        cursor = pagination.cursor_berikutnya(halaman, limit, None, crud.KUNCI_TUGAS)
+        if cursor is None:
+            return hasil
+
+
+def test_cursor_roundtrip():
+    cursor = pagination.encode_cursor([WAKTU, 42])
+
+    assert pagination.decode_cursor(cursor, crud.KUNCI_TUGAS) == [WAKTU, 42]
+
+@pytest.mark.parametrize("cursor", ["bukan-base64!", pagination.encode_cursor([1]), pagination.encode_cursor(["x", 1])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(pagination.CursorTidakValid):
+        pagination.decode_cursor(cursor, crud.KUNCI_TUGAS)
+
+@pytest.mark.parametrize("newest", [True, False])
+def test_keyset_pages_cover_every_row_once(db, newest):
+    semua = crud.read_tugas_pembelajaran_filter_by(db, newest=newest)
+    halaman = semua_halaman(lambda **kwargs: crud.read_tugas_pembelajaran_filter_by(db, newest=newest, **kwargs), 4)
+
+    assert [len(h) for h in halaman] == [4, 4, 2]
+    assert [t.id for h in halaman for t in h] == [t.id for t in semua]
+    waktu = [t.time_created for h in halaman for t in h]
+    assert waktu == sorted(waktu, reverse=newest)
+
+def test_keyset_page_is_stable_when_rows_are_added(db):
+    pertama = crud.read_user_pelajar_filter_by(db, limit=3)
+    cursor = pagination.cursor_berikutnya(pertama, 3, None, crud.KUNCI_PELAJAR)
+    kedua = crud.read_user_pelajar_filter_by(db, limit=3, cursor=cursor)
+
+    db.add(models.Pelajar(email="baru@example.com", nama_lengkap="Baru", asal_sekolah="SMA 2", jurusan="IPS"))
+    db.commit()
+
+    assert crud.read_user_pelajar_filter_by(db, limit=3, cursor=cursor) == kedua
+    assert [p.id for p in pertama + kedua] == sorted(p.id for p in pertama + kedua)
+
+def test_page_and_limit_still_use_offset(db):
+    semua = crud.read_user_pelajar_filter_by(db)
+
+    assert crud.read_user_pelajar_filter_by(db, limit=3, page=2) == semua[3:6]
+
+def test_page_and_cursor_cannot_be_combined(db):
+    cursor = pagination.encode_cursor([1])
+    with pytest.raises(pagination.CursorTidakValid):
+        crud.read_user_pelajar_filter_by(db, limit=3, page=2, cursor=cursor)
+
+@pytest.mark.asyncio
+async def test_async_keyset_matches_sync(db, async_db):
+    sync_ids = [t.id for t in crud.read_tugas_pembelajaran_filter_by(db, limit=4)]
+    async_ids = [t.id for t in await crud_async.read_ringkas_tugas_pembelajaran_filter_by(async_db, limit=4)]
+    assert async_ids == sync_ids
+
+    cursor = pagination.encode_cursor([WAKTU + datetime.timedelta(minutes=3), 10])
+    result = await crud_async.read_ringkas_tugas_pembelajaran_filter_by(async_db, limit=4, cursor=cursor)
+    assert [t.id for t in result] == [9, 8, 7, 6]
+
+
+def test_endpoint_returns_next_cursor_header(session_factory):
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    try:
+        client = TestClient(main.app)
+        response = client.get("/admin/pelajar/list", params={"limit": 4})
+        assert response.status_code == 200
+        assert len(response.json()) == 4
+
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get("/admin/pelajar/list", params={"limit": 4, "cursor": cursor})
+        assert len(response.json()) == 3
+        assert "X-Next-Cursor" not in response.headers
+
+        response = client.get("/admin/pelajar/list", params={"limit": 4, "cursor": "rusak"})
+        assert response.status_code == 400
+
+        response = client.get("/admin/pelajar/list", params={"limit": 4, "page": 2, "cursor": cursor})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "page dan cursor tidak bisa dipakai bersamaan"
+
+        header = main.app.openapi()["paths"]["/admin/pelajar/list"]["get"]["responses"]["200"]["headers"]
+        assert "X-Next-Cursor" in header
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,386 @@
+"""
+Batas jumlah statement SQL per endpoint.
+
+Setiap route di main.py dijalankan terhadap database SQLite sungguhan yang
+diisi dengan data ukuran kecil dan besar. Jumlah statement (header
+X-DB-Queries dari sql_metrics) harus sama untuk kedua ukuran data dan tidak
+melebihi budget route tersebut, sehingga regresi N+1 membuat test gagal.
+"""
+from collections import namedtuple
+from unittest import mock
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import cache
+import crud
+import email_api
+import leaderboard
+import main
+import models
+import regrade
+import sql_metrics
+import submission_queue
+
+pytestmark = pytest.mark.skipif(not main.SQL_METRICS_ENABLED, reason="SQL_METRICS_ENABLED=false")
+
+# Ukuran data; jumlah statement harus sama untuk keduanya
+SMALL = 2
+LARGE = 6
+PASSWORD = "password123"
+# Endpoint yang masih N+1; dihapus dari daftar ini setelah diperbaiki
+N_PLUS_ONE = pytest.mark.xfail(strict=True, reason="N+1: jumlah query bertambah dengan jumlah soal")
+
+Case = namedtuple("Case", ["method", "path", "budget", "request"])
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(db, n, password_hash):
+    """
+    Mengisi database dengan n mentor, n pelajar, n materi masing-masing n
+    video, dan n tugas berisi n soal untuk setiap tipe soal.
+    """
+    admin = models.Admin(id="root", nama_lengkap="Root", hashed_password=password_hash)
+    mentors = [
+        models.Mentor(email=f"mentor{i}@example.com", nama_lengkap=f"Mentor {i}", hashed_password=password_hash,
+                      is_active=True, keahlian="Matematika", Asal="UI")
+        for i in range(n)
+    ]
+    daftar_pelajar = [
+        models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", hashed_password=password_hash,
+                       is_active=True, asal_sekolah="SMA 1", jurusan="IPA")
+        for i in range(n)
+    ]
+    belum_aktif = models.Pelajar(email="baru@example.com", nama_lengkap="Baru", hashed_password=password_hash,
+                                 activation_code="abc123", asal_sekolah="SMA 2", jurusan="IPS")
+    daftar_materi = [models.Materi(nama=f"Materi {i}", mapel=models.DaftarMapelSkolastik(i % 6 + 1)) for i in range(n)]
+    materi_kosong = models.Materi(nama="Materi Kosong", mapel=models.DaftarMapelSkolastik.kuantitatif)
+    db.add_all([admin, *mentors, *daftar_pelajar, belum_aktif, *daftar_materi, materi_kosong])
+    db.flush()
+
+    mentor = mentors[0]
+    videos = [
+        models.VideoPembelajaran(creator_id=mentor.id, judul=f"Video {i}-{j}", id_materi=materi.id, s3_key=f"video/{i}/{j}")
+        for i, materi in enumerate(daftar_materi) for j in range(n)
+    ]
+    video_tanpa_tugas = models.VideoPembelajaran(creator_id=mentor.id, judul="Video tanpa tugas",
+                                                 id_materi=daftar_materi[0].id, s3_key="video/kosong")
+    db.add_all([*videos, video_tanpa_tugas])
+    db.flush()
+
+    daftar_tugas = []
+    jawaban = []
+    for i, video in enumerate(videos[:n]):
+        tugas = models.TugasPembelajaran(judul=f"Tugas {i}", attempt_allowed=100)
+        db.add(tugas)
+        db.flush()
+        video.id_tugas = tugas.id
+        daftar_tugas.append(tugas)
+
+        for k in range(n):
+            db.add_all([
+                models.SoalABC(pertanyaan=f"ABC {k}", id_tugas=tugas.id, kunci=1,
+                               pilihan=[models.JawabanABC(jawaban=f"pilihan {p}") for p in range(4)]),
+                models.SoalBenarSalah(pertanyaan=f"Benar salah {k}", id_tugas=tugas.id, benar="Benar", salah="Salah",
+                                      pilihan=[models.JawabanBenarSalah(jawaban=f"pernyataan {p}", kunci=p % 2 == 0)
+                                               for p in range(4)]),
+                models.SoalMultiPilih(pertanyaan=f"Multi {k}", id_tugas=tugas.id,
+                                      pilihan=[models.JawabanMultiPilih(jawaban=f"opsi {p}", benar=p < 2)
+                                               for p in range(4)]),
+            ])
+            if i == 0:
+                jawaban += ["1", ["1", "0", "1", "0"], ["1", "1", "0", "0"]]
+
+    for pelajar in daftar_pelajar:
+        for tugas in daftar_tugas:
+            db.add(models.AttemptMengerjakanTugas(id_pelajar=pelajar.id, id_tugas=tugas.id, nilai=80.0))
+    db.commit()
+
+    return {
+        "mentor": mentor.id,
+        "mentor_email": mentor.email,
+        "pelajar": daftar_pelajar[0].id,
+        "pelajar_email": daftar_pelajar[0].email,
+        "belum_aktif": belum_aktif.id,
+        "materi": daftar_materi[0].id,
+        "materi_kosong": materi_kosong.id,
+        "video": videos[0].id,
+        "video_lain": videos[-1].id,
+        "video_tanpa_tugas": video_tanpa_tugas.id,
+        "tugas": daftar_tugas[0].id,
+        "jawaban": jawaban,
+        "mentor_token": auth.create_access_token({"id": mentor.id}),
+        "pelajar_token": auth.create_access_token({"id": daftar_pelajar[0].id}),
+        "admin_token": auth.create_access_token({"id": "root"}),
+    }
+
+
+TUGAS_BARU = {
+    "judul": "Tugas baru",
+    "jumlah_attempt": 3,
+    "daftar_soal": [
+        {"pertanyaan": "1 + 1?", "pilihan_jawaban": ["1", "2", "3"], "index_jawaban_benar": 1},
+        {"pertanyaan": "Pernyataan", "pernyataan_pada_benar": "Benar", "pernyataan_pada_salah": "Salah",
+         "daftar_jawaban": [{"isi_jawaban": "a", "jawaban_pernyataan_yang_benar": True},
+                            {"isi_jawaban": "b", "jawaban_pernyataan_yang_benar": False}]},
+        {"pertanyaan": "Pilih yang genap", "pilihan": [{"isi_jawaban": "2", "jawaban_ini_benar": True},
+                                                       {"isi_jawaban": "3", "jawaban_ini_benar": False}]},
+    ],
+}
+
+CASES = {
+    "pelajar_login": Case("POST", "/pelajar/login", 1, lambda d: dict(
+        json={"email": d["pelajar_email"], "password": PASSWORD})),
+    "mentor_login": Case("POST", "/mentor/login", 1, lambda d: dict(
+        json={"email": d["mentor_email"], "password": PASSWORD})),
+    "aktivasi": Case("GET", "/user/aktivasi", 3, lambda d: dict(
+        params={"id": d["belum_aktif"], "otp": "abc123"})),
+    "reset_password": Case("POST", "/user/resetpassword", 3, lambda d: dict(
+        params={"email": d["pelajar_email"]})),
+    "new_password": Case("POST", "/user/newpassword", 2, lambda d: dict(
+        json={"email": d["pelajar_email"], "password": PASSWORD, "new_password": "password456"})),
+    "pelajar_profile_picture": Case("POST", "/pelajar/updateprofilepicture", 2, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), files={"file": ("foto.png", b"png", "image/png")})),
+    "mentor_profile_picture": Case("POST", "/mentor/updateprofilepicture", 2, lambda d: dict(
+        headers=bearer(d["mentor_token"]), files={"file": ("foto.png", b"png", "image/png")})),
+    "pelajar_updatedata": Case("POST", "/pelajar/updatedata", 6, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), data={"namaLengkap": "Nama Baru", "jurusan": "IPS"})),
+    "mentor_updatedata": Case("POST", "/mentor/updatedata", 6, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"namaLengkap": "Nama Baru", "keahlian": "Fisika"})),
+    "pelajar_mydata": Case("GET", "/pelajar/mydata", 1, lambda d: dict(headers=bearer(d["pelajar_token"]))),
+    "mentor_mydata": Case("GET", "/mentor/mydata", 1, lambda d: dict(headers=bearer(d["mentor_token"]))),
+    "pelajar_register": Case("POST", "/pelajar/register", 3, lambda d: dict(json={
+        "email": "daftar@example.com", "nama_lengkap": "Daftar", "raw_password": PASSWORD,
+        "asal_sekolah": "SMA 3", "jurusan": "IPA"})),
+    "mentor_register": Case("POST", "/mentor/register", 3, lambda d: dict(json={
+        "email": "daftar@example.com", "nama_lengkap": "Daftar", "raw_password": PASSWORD,
+        "keahlian": "Kimia", "asal": "ITB"})),
+    "video_upload": Case("POST", "/video/upload", 5, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"id_materi": d["materi"], "judul_video": "Video baru"},
+        files={"file": ("video.mp4", b"mp4", "video/mp4")})),
+    "video_download": Case("GET", "/video/download", 2, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"videoid": d["video"]})),
+    "video_update": Case("PUT", "/video/update", 4, lambda d: dict(
+        headers=bearer(d["mentor_token"]),
+        data={"video_id": d["video"], "id_materi": d["materi"], "judul_video": "Judul baru"})),
+    "video_delete": Case("DELETE", "/video/delete", 4, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"video_id": d["video_lain"]})),
+    "admin_register": Case("POST", "/admin/register", 2, lambda d: dict(
+        headers=bearer(d["admin_token"]),
+        json={"id": "admin2", "nama_lengkap": "Admin Dua", "new_password": PASSWORD})),
+    "admin_login": Case("POST", "/admin/login", 1, lambda d: dict(json={"id": "root", "password": PASSWORD})),
+    "admin_mydata": Case("GET", "/admin/mydata", 1, lambda d: dict(headers=bearer(d["admin_token"]))),
+    "admin_updatemember": Case("PATCH", "/admin/pelajar/updatemember", 3, lambda d: dict(
+        headers=bearer(d["admin_token"]), json={"email": d["pelajar_email"]})),
+    # satu executemany per tabel soal/jawaban, tidak bergantung pada jumlah soal
+    "tugas_add": Case("POST", "/video/tugas/add", 12, lambda d: dict(
+        headers=bearer(d["mentor_token"]), json={**TUGAS_BARU, "id_video": d["video_tanpa_tugas"]})),
+    # cek mentor dan video, lalu satu DELETE per tabel pohon tugas (rekap, jawaban attempt, attempt,
+    # regrade, 3 tabel pilihan, 3 tabel soal turunan, soal) + lepas video + tugas
+    "tugas_delete": Case("DELETE", "/video/tugas/delete", 15, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"id_video": d["video"]})),
+    "tugas_pelajar": Case("GET", "/video/tugas", 6, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_video": d["video"]})),
+    "tugas_mentor": Case("GET", "/video/tugas/edit", 7, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"id_video": d["video"]})),
+    # pohon tugas (5, sekali per tugas) + rekap attempt (update, insert awal, select) + insert attempt
+    # + insert jawaban per soal
+    "tugas_kumpul": Case("POST", "/video/tugas/kumpul", 11, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), json={
+            "id_tugas": d["tugas"], "waktu_mulai": "2023-05-20T10:00:00", "waktu_selesai": "2023-05-20T10:30:00",
+            "jawaban": d["jawaban"]})),
+    # hanya antrian di memori, tanpa database
+    "tugas_kumpul_antrian": Case("POST", "/video/tugas/kumpul/antrian", 0, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), json={
+            "id_tugas": d["tugas"], "waktu_mulai": "2023-05-20T10:00:00", "waktu_selesai": "2023-05-20T10:30:00",
+            "jawaban": d["jawaban"]})),
+    "tugas_kumpul_antrian_hasil": Case("GET", "/video/tugas/kumpul/antrian/{receipt}", 0, lambda d: dict(
+        url=f"/video/tugas/kumpul/antrian/{d['receipt']}", headers=bearer(d["pelajar_token"]))),
+    "admin_antrian_stats": Case("GET", "/admin/antrian/stats", 0, lambda d: dict(headers=bearer(d["admin_token"]))),
+    "tugas_nilai": Case("GET", "/video/tugas/nilai", 1, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_pelajar": d["pelajar"]})),
+    "tugas_rekap": Case("GET", "/video/tugas/rekap", 1, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_pelajar": d["pelajar"]})),
+    "tugas_rekap_mapel": Case("GET", "/video/tugas/rekap/mapel", 1, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_pelajar": d["pelajar"]})),
+    "tugas_regrade": Case("POST", "/video/tugas/regrade", 6, lambda d: dict(
+        headers=bearer(d["mentor_token"]), data={"id_video": d["video"]})),
+    # cek mentor, job, pembuat tugas
+    "tugas_regrade_status": Case("GET", "/video/tugas/regrade/{id_regrade}", 3, lambda d: dict(
+        url=f"/video/tugas/regrade/{d['regrade']}", headers=bearer(d["mentor_token"]))),
+    # cek mentor dan video, kunci jawaban (5, sekali per tugas) + jumlahan per soal dan distribusi jawaban
+    "tugas_statistik": Case("GET", "/video/tugas/statistik", 9, lambda d: dict(
+        headers=bearer(d["mentor_token"]), params={"id_video": d["video"]})),
+    # leaderboard dari memori, tanpa database
+    "tugas_leaderboard": Case("GET", "/video/tugas/leaderboard", 0, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_tugas": d["tugas"], "id_pelajar": d["pelajar"]})),
+    "materi_leaderboard": Case("GET", "/materi/leaderboard", 0, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"mapel": 1, "id_pelajar": d["pelajar"]})),
+    "admin_leaderboard_stats": Case("GET", "/admin/leaderboard/stats", 0, lambda d: dict(headers=bearer(d["admin_token"]))),
+    "video_list": Case("GET", "/video/list", 1, lambda d: dict(headers=bearer(d["pelajar_token"]))),
+    "materi_tambah": Case("POST", "/materi/tambah", 3, lambda d: dict(
+        headers=bearer(d["mentor_token"]), json={"mapel": 1, "nama_materi": "Materi Baru"})),
+    "materi_update": Case("PUT", "/materi/admin/update", 4, lambda d: dict(
+        headers=bearer(d["admin_token"]), params={"id": d["materi"]}, json={"mapel": 2, "nama_materi": "Ganti"})),
+    "materi_delete": Case("DELETE", "/materi/admin/delete", 2, lambda d: dict(
+        headers=bearer(d["admin_token"]), params={"id": d["materi_kosong"]})),
+    "materi_list": Case("GET", "/materi/list", 2, lambda d: dict(headers=bearer(d["pelajar_token"]))),
+    "materi_video_list": Case("GET", "/materi/video/list", 1, lambda d: dict(
+        headers=bearer(d["pelajar_token"]), params={"id_materi": d["materi"]})),
+    "materi_tugas_list": Case("GET", "/materi/tugas/list", 1, lambda d: dict(headers=bearer(d["pelajar_token"]))),
+    "admin_pelajar_list": Case("GET", "/admin/pelajar/list", 1, lambda d: dict(headers=bearer(d["admin_token"]))),
+    "admin_mentor_list": Case("GET", "/admin/mentor/list", 1, lambda d: dict(headers=bearer(d["admin_token"]))),
+    # satu SELECT yang di-stream per batch
+    "admin_export_nilai": Case("GET", "/admin/export/nilai", 1, lambda d: dict(headers=bearer(d["admin_token"]))),
+    "admin_export_pelajar": Case("GET", "/admin/export/pelajar", 1, lambda d: dict(
+        headers=bearer(d["admin_token"]), params={"format": "ndjson"})),
+    "admin_admin_list": Case("GET", "/admin/admin/list", 1, lambda d: dict(headers=bearer(d["admin_token"]))),
+}
+
+KNOWN_N_PLUS_ONE = set()
+
+# Baris export dibaca saat body di-stream, setelah header X-DB-Queries dikirim,
+# jadi statement-nya dihitung langsung dari engine sampai body selesai dibaca.
+DI_STREAM = {"admin_export_nilai", "admin_export_pelajar"}
+
+
+@pytest.fixture(scope="module")
+def password_hash():
+    return auth.get_password_hash(PASSWORD)
+
+
+@pytest.fixture
+def build_app(tmp_path, password_hash, monkeypatch):
+    """
+    Membuat database baru berukuran n dan mengarahkan semua dependency
+    database di main.app ke sana.
+    """
+    engines = []
+
+    def build(n):
+        path = tmp_path / f"budget_{n}.db"
+        engine = create_engine(f"sqlite:///{path}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        engines.append((engine, async_engine))
+        models.Base.metadata.create_all(engine)
+
+        session_factory = sessionmaker(bind=engine)
+        async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        with session_factory() as db:
+            data = seed(db, n, password_hash)
+
+        sql_metrics.pasang(engine)
+        sql_metrics.pasang(async_engine.sync_engine)
+        # id tugas sama di setiap database, jadi cache dari database sebelumnya dibuang
+        cache.hapus_semua()
+        antrian = submission_queue.AntrianPengumpulan(session_factory, workers=0)
+        antrian.mulai()
+        data["receipt"] = antrian.kirim(data["pelajar"], data["tugas"], data["jawaban"], None, None)
+        antrian.proses_semua()
+        monkeypatch.setattr(main, "antrian_pengumpulan", antrian)
+        # kunci jawaban yang dimuat antrian juga dibuang agar endpoint mulai dari cache kosong
+        cache.hapus_semua()
+        # job regrade dijalankan langsung di sini; endpoint hanya membuat job
+        with session_factory() as db:
+            data["regrade"] = regrade.buat_job(db, data["tugas"]).id
+        regrade.jalankan(session_factory, data["regrade"])
+        monkeypatch.setattr(regrade, "mulai", lambda *args: None)
+
+        def get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def get_async_db():
+            async with async_session_factory() as db:
+                yield db
+
+        main.app.dependency_overrides.update({
+            main.get_db: get_db,
+            main.get_read_db: get_db,
+            main.get_async_db: get_async_db,
+            main.get_async_read_db: get_async_db,
+        })
+        return TestClient(main.app), data
+
+    s3 = mock.MagicMock()
+    s3.generate_presigned_url.return_value = "https://s3.example.com/presigned"
+    with mock.patch.object(crud, "s3", s3), \
+         mock.patch.object(email_api, "kirim_konfimasi_email"), \
+         mock.patch.object(email_api, "kirim_password_baru"):
+        yield build
+
+    main.app.dependency_overrides.clear()
+    for engine, async_engine in engines:
+        engine.dispose()
+        async_engine.sync_engine.dispose()
+
+
+def test_every_route_has_a_budget():
+    routes = {
+        (method, route.path)
+        for route in main.app.routes if isinstance(route, APIRoute) and route.path != "/"
+        for method in route.methods
+    }
+    assert routes == {(case.method, case.path) for case in CASES.values()}
+
+
+def request_dengan_body(client, case, data):
+    """
+    (response, jumlah statement) termasuk statement yang dijalankan saat body di-stream.
+    """
+    statements = []
+    def catat(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(Engine, "before_cursor_execute", catat)
+    try:
+        response = client.request(case.method, **{"url": case.path, **case.request(data)})
+    finally:
+        event.remove(Engine, "before_cursor_execute", catat)
+    assert response.content
+    return response, len(statements)
+
+@pytest.mark.parametrize("name", [
+    pytest.param(name, marks=N_PLUS_ONE) if name in KNOWN_N_PLUS_ONE else name for name in CASES
+])
+def test_query_count_within_budget(name, build_app):
+    case = CASES[name]
+    counts = []
+    for n in (SMALL, LARGE):
+        client, data = build_app(n)
+        if name in DI_STREAM:
+            response, jumlah = request_dengan_body(client, case, data)
+        else:
+            response = client.request(case.method, **{"url": case.path, **case.request(data)})
+            jumlah = int(response.headers["X-DB-Queries"])
+        assert response.status_code < 400, response.text
+        counts.append(jumlah)
+
+    assert counts[0] == counts[1], f"{case.path}: {counts[0]} query untuk n={SMALL}, {counts[1]} untuk n={LARGE}"
+    assert counts[1] <= case.budget, f"{case.path}: {counts[1]} query, budget {case.budget}"
+
+def test_warm_kumpul_skips_tugas_tree(build_app):
+    case = CASES["tugas_kumpul"]
+    client, data = build_app(LARGE)
+    dingin = client.request(case.method, case.path, **case.request(data))
+    hangat = client.request(case.method, case.path, **case.request(data))
+
+    assert hangat.status_code == 200, hangat.text
+    assert hangat.json()["nilai"] == dingin.json()["nilai"]
+    papan = leaderboard.papan_tugas(data["tugas"], id_pelajar=data["pelajar"])
+    [rekap] = client.get("/video/tugas/rekap", headers=bearer(data["pelajar_token"]),
+                         params={"id_pelajar": data["pelajar"], "id_tugas": data["tugas"]}).json()
+    assert papan["pelajar"]["nilai"] == rekap["nilai_terbaik"]
+    # kunci jawaban dari cache: hanya cek attempt dan insert attempt
+    assert int(hangat.headers["X-DB-Queries"]) <= int(dingin.headers["X-DB-Queries"]) - 5
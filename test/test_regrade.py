@@ -0,0 +1,254 @@
+import datetime
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import analisis_soal
+import auth
+import cache
+import crud
+import grading
+import leaderboard
+import main
+import models
+import regrade
+import schema
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0)
+JAWABAN = [
+    ["2", ["1", "0"], ["1", "0", "1", "0"]],
+    ["1", ["1", "1"], ["1", "0", "0", "0"]],
+    ["0", ["0", "1"], ["0", "1", "0", "1"]],
+    ["1", ["1", "0"], ["1", "1", "1", "0"]],
+    ["2", ["0", "0"], ["1", "0", "1", "1"]],
+]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/regrade.db")
+    models.Base.metadata.create_all(engine)
+    cache.hapus_semua()
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def data(session_factory):
+    with session_factory() as db:
+        mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+        daftar_pelajar = [
+            models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", asal_sekolah="SMA 1", jurusan="IPA")
+            for i in range(len(JAWABAN))
+        ]
+        materi = models.Materi(nama="Aljabar", mapel=models.DaftarMapelSkolastik.penalaran_matematika)
+        db.add_all([mentor, materi, *daftar_pelajar])
+        db.flush()
+        video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key", id_materi=materi.id)
+        db.add(video)
+        db.commit()
+        db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video.id, [
+            schema.SoalABCKunci(pertanyaan="abc", pilihan_jawaban=["a", "b", "c"], index_jawaban_benar=2),
+            schema.SoalBenarSalah(pertanyaan="bs", pernyataan_pada_benar="Benar", pernyataan_pada_salah="Salah",
+                                  daftar_jawaban=[schema.JawabanBenarSalahKunci(isi_jawaban="x", jawaban_pernyataan_yang_benar=True),
+                                                  schema.JawabanBenarSalahKunci(isi_jawaban="y", jawaban_pernyataan_yang_benar=False)]),
+            schema.SoalMultiPilih(pertanyaan="mp", pilihan=[
+                schema.JawabanMultiPilihKunci(isi_jawaban="p", jawaban_ini_benar=True),
+                schema.JawabanMultiPilihKunci(isi_jawaban="q", jawaban_ini_benar=False),
+                schema.JawabanMultiPilihKunci(isi_jawaban="r", jawaban_ini_benar=True),
+                schema.JawabanMultiPilihKunci(isi_jawaban="s", jawaban_ini_benar=False)]),
+        ])
+        # attempt lama tanpa jawaban per soal
+        db.add(models.AttemptMengerjakanTugas(id_pelajar=daftar_pelajar[0].id, id_tugas=db_tugas.id, nilai=5.0))
+        db.commit()
+        for pelajar, jawaban in zip(daftar_pelajar, JAWABAN):
+            kunci = grading.read_kunci_jawaban(db, db_tugas.id)
+            nilai, per_soal = grading.nilai_per_soal(kunci, jawaban)
+            crud.create_new_attempt_mengerjakan_tugas(db, pelajar.id, db_tugas.id, nilai, WAKTU, WAKTU,
+                                                      kunci=kunci, per_soal=per_soal)
+        return {"tugas": db_tugas.id, "video": video.id, "mentor": mentor.id, "pelajar": [p.id for p in daftar_pelajar]}
+
+def perbaiki_kunci(db, id_tugas):
+    """
+    Kunci soal ABC menjadi pilihan 1 dan kedua pernyataan benar-salah dibalik.
+    """
+    tugas = crud.read_tugas_pembelajaran_lengkap_by_id(db, id_tugas)
+    abc, benar_salah, _ = tugas.soal
+    for pilihan in benar_salah.pilihan:
+        pilihan.kunci = not pilihan.kunci
+    crud.update_soal_abc_add_kunci_by_ids(db, abc.id, 1)
+    return grading.read_kunci_jawaban(db, id_tugas)
+
+def nilai_attempt(db, id_tugas):
+    return [attempt.nilai for attempt in db.query(models.AttemptMengerjakanTugas)
+            .filter(models.AttemptMengerjakanTugas.id_tugas == id_tugas).order_by(models.AttemptMengerjakanTugas.id)]
+
+
+def test_skor_tersimpan_matches_nilai_per_soal(session_factory, data):
+    with session_factory() as db:
+        kunci = grading.read_kunci_jawaban(db, data["tugas"])
+    kunci_soal = grading.kunci_per_soal(kunci)
+    for jawaban in JAWABAN:
+        _, per_soal = grading.nilai_per_soal(kunci, jawaban)
+        assert [grading.skor_tersimpan(kunci_soal[id_soal], tersimpan) for id_soal, (tersimpan, _) in zip(kunci.id_soal, per_soal)] \
+            == [skor for _, skor in per_soal]
+
+def test_regrade_rescores_attempts_in_batches(session_factory, data):
+    with session_factory() as db:
+        lama = nilai_attempt(db, data["tugas"])
+        kunci = perbaiki_kunci(db, data["tugas"])
+        id_job = regrade.buat_job(db, data["tugas"]).id
+
+    proses_batch = regrade.proses_batch
+    with mock.patch.object(regrade, "proses_batch", side_effect=proses_batch) as batch:
+        assert regrade.jalankan(session_factory, id_job, batch_size=2)
+    # 6 attempt per 2, ditambah satu batch kosong
+    assert batch.call_count == 4
+
+    with session_factory() as db:
+        job = regrade.read_job(db, id_job)
+        assert (job.status, job.jumlah_total, job.jumlah_diproses, job.jumlah_dilewati) == (regrade.SELESAI, 6, 6, 1)
+        assert job.persen == 100.0
+        diharapkan = [5.0] + [crud.skala_nilai(grading.nilai_jawaban(kunci, jawaban)) for jawaban in JAWABAN]
+        assert nilai_attempt(db, data["tugas"]) == pytest.approx(diharapkan)
+        assert job.jumlah_berubah == sum(a != pytest.approx(b) for a, b in zip(lama, diharapkan)) > 0
+
+        [rekap] = crud.read_rekap_nilai_filter_by(db, id_pelajar=data["pelajar"][1])
+        assert rekap.nilai_terbaik == pytest.approx(diharapkan[2])
+        statistik = analisis_soal.read_statistik_soal(db, data["tugas"])
+        assert statistik[0]["persen_benar"] == 40.0
+
+    papan = leaderboard.papan_tugas(data["tugas"], id_pelajar=data["pelajar"][1])
+    assert papan["pelajar"]["nilai"] == pytest.approx(diharapkan[2])
+
+def test_failed_job_resumes_from_checkpoint(session_factory, data):
+    with session_factory() as db:
+        kunci = perbaiki_kunci(db, data["tugas"])
+        id_job = regrade.buat_job(db, data["tugas"]).id
+
+    proses_batch = regrade.proses_batch
+    panggilan = []
+    def gagal_di_batch_kedua(*args, **kwargs):
+        panggilan.append(args)
+        if len(panggilan) == 2:
+            raise RuntimeError("database mati")
+        return proses_batch(*args, **kwargs)
+
+    with mock.patch.object(regrade, "proses_batch", side_effect=gagal_di_batch_kedua):
+        assert not regrade.jalankan(session_factory, id_job, batch_size=2)
+    with session_factory() as db:
+        job = regrade.read_job(db, id_job)
+        assert (job.status, job.jumlah_diproses, job.pesan) == (regrade.GAGAL, 2, "database mati")
+        # job gagal dilanjutkan, bukan dibuat baru
+        assert regrade.buat_job(db, data["tugas"]).id == id_job
+
+    assert regrade.jalankan(session_factory, id_job, batch_size=2)
+    with session_factory() as db:
+        job = regrade.read_job(db, id_job)
+        assert (job.status, job.jumlah_diproses) == (regrade.SELESAI, 6)
+        diharapkan = [5.0] + [crud.skala_nilai(grading.nilai_jawaban(kunci, jawaban)) for jawaban in JAWABAN]
+        assert nilai_attempt(db, data["tugas"]) == pytest.approx(diharapkan)
+
+def test_key_change_resets_checkpoint(session_factory, data):
+    with session_factory() as db:
+        perbaiki_kunci(db, data["tugas"])
+        id_job = regrade.buat_job(db, data["tugas"]).id
+
+    proses_batch = regrade.proses_batch
+    panggilan = []
+    def kunci_diubah_di_batch_kedua(db, *args, **kwargs):
+        panggilan.append(args)
+        if len(panggilan) == 2:
+            # mentor memperbaiki kunci lagi saat job berjalan
+            with session_factory() as db_mentor:
+                tugas = crud.read_tugas_pembelajaran_lengkap_by_id(db_mentor, data["tugas"])
+                crud.update_soal_abc_add_kunci_by_ids(db_mentor, tugas.soal[0].id, 0)
+        return proses_batch(db, *args, **kwargs)
+
+    with mock.patch.object(regrade, "proses_batch", side_effect=kunci_diubah_di_batch_kedua):
+        assert regrade.jalankan(session_factory, id_job, batch_size=2)
+
+    with session_factory() as db:
+        kunci = grading.read_kunci_jawaban(db, data["tugas"])
+        job = regrade.read_job(db, id_job)
+        assert job.sidik_kunci == grading.sidik_kunci(kunci)
+        assert (job.status, job.jumlah_diproses) == (regrade.SELESAI, 6)
+        # semua attempt dinilai dengan kunci terakhir
+        diharapkan = [5.0] + [crud.skala_nilai(grading.nilai_jawaban(kunci, jawaban)) for jawaban in JAWABAN]
+        assert nilai_attempt(db, data["tugas"]) == pytest.approx(diharapkan)
+
+def test_failed_job_with_new_key_restarts(session_factory, data):
+    with session_factory() as db:
+        perbaiki_kunci(db, data["tugas"])
+        id_job = regrade.buat_job(db, data["tugas"]).id
+
+    proses_batch = regrade.proses_batch
+    panggilan = []
+    def gagal_di_batch_kedua(*args, **kwargs):
+        panggilan.append(args)
+        if len(panggilan) == 2:
+            raise RuntimeError("database mati")
+        return proses_batch(*args, **kwargs)
+
+    with mock.patch.object(regrade, "proses_batch", side_effect=gagal_di_batch_kedua):
+        assert not regrade.jalankan(session_factory, id_job, batch_size=2)
+    with session_factory() as db:
+        tugas = crud.read_tugas_pembelajaran_lengkap_by_id(db, data["tugas"])
+        crud.update_soal_abc_add_kunci_by_ids(db, tugas.soal[0].id, 0)
+        kunci = grading.read_kunci_jawaban(db, data["tugas"])
+
+    with mock.patch.object(regrade, "proses_batch", side_effect=proses_batch) as batch:
+        assert regrade.jalankan(session_factory, id_job, batch_size=2)
+    # dari awal, bukan dari checkpoint attempt ke-2
+    assert batch.call_args_list[0].args[4] == 0
+    with session_factory() as db:
+        assert regrade.read_job(db, id_job).jumlah_diproses == 6
+        diharapkan = [5.0] + [crud.skala_nilai(grading.nilai_jawaban(kunci, jawaban)) for jawaban in JAWABAN]
+        assert nilai_attempt(db, data["tugas"]) == pytest.approx(diharapkan)
+
+def test_running_job_is_not_claimed_twice(session_factory, data):
+    with session_factory() as db:
+        id_job = regrade.buat_job(db, data["tugas"]).id
+        assert regrade.klaim(db, id_job)
+        assert not regrade.klaim(db, id_job)
+    assert not regrade.jalankan(session_factory, id_job)
+
+    with session_factory() as db:
+        db.query(models.RegradeTugas).update({"time_updated": datetime.datetime.now() - datetime.timedelta(hours=1)})
+        db.commit()
+    assert regrade.jalankan(session_factory, id_job)
+
+def test_endpoints(session_factory, data, monkeypatch):
+    monkeypatch.setattr(regrade, "mulai", regrade.jalankan)
+    monkeypatch.setattr(main, "SessionLocal", session_factory)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+    main.app.dependency_overrides[main.get_db] = get_db
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    try:
+        client = TestClient(main.app)
+        token = {"Authorization": f"Bearer {auth.create_access_token({'id': data['mentor']})}"}
+        response = client.post("/video/tugas/regrade", headers=token, data={"id_video": data["video"]})
+        assert response.status_code == 202
+        id_job = response.json()["id"]
+
+        response = client.get(f"/video/tugas/regrade/{id_job}", headers=token)
+        assert response.json()["status"] == regrade.SELESAI
+        assert response.json()["jumlah_diproses"] == 6
+        assert client.get("/video/tugas/regrade/999", headers=token).status_code == 404
+
+        with session_factory() as db:
+            lain = models.Mentor(email="lain@example.com", nama_lengkap="Lain", Asal="UI")
+            pelajar = db.query(models.Pelajar).first()
+            db.add(lain)
+            db.commit()
+            token_lain = {"Authorization": f"Bearer {auth.create_access_token({'id': lain.id})}"}
+            token_pelajar = {"Authorization": f"Bearer {auth.create_access_token({'id': pelajar.id})}"}
+        assert client.get(f"/video/tugas/regrade/{id_job}", headers=token_lain).status_code == 403
+        assert client.get(f"/video/tugas/regrade/{id_job}", headers=token_pelajar).status_code == 401
+    finally:
+        main.app.dependency_overrides.clear()
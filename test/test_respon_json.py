@@ -0,0 +1,134 @@
+import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker, joinedload
+
+import auth
+import main
+import models
+import respon_json
+import schema
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 30, 0, 123456)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/respon.db")
+    models.Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def data(session_factory):
+    with session_factory() as db:
+        mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", keahlian="Math", Asal="UI",
+                               is_active=True, time_updated=WAKTU)
+        daftar_pelajar = [
+            models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar \"{i}\"", asal_sekolah="SMA 1",
+                           jurusan="IPA", is_member=i % 2 == 0, is_active=True)
+            for i in range(5)
+        ]
+        materi = models.Materi(nama="Aljabar", mapel=models.DaftarMapelSkolastik.kuantitatif, jumlah_video=3)
+        admin = [models.Admin(id="root", nama_lengkap="Root", hashed_password="x"),
+                 models.Admin(id="staf", nama_lengkap="Staf", hashed_password="x", created_by="root", time_updated=WAKTU)]
+        db.add_all([mentor, materi, *admin, *daftar_pelajar])
+        db.flush()
+        daftar_tugas = [models.TugasPembelajaran(judul=f"Tugas {i}", attempt_allowed=3,
+                                                 time_created=WAKTU + datetime.timedelta(minutes=i))
+                        for i in range(4)]
+        db.add_all(daftar_tugas)
+        db.flush()
+        # tugas terakhir tidak punya video
+        db.add_all([
+            models.VideoPembelajaran(creator_id=mentor.id, judul=f"Video {i}", id_materi=materi.id, s3_key=f"key{i}",
+                                     id_tugas=tugas.id, time_created=WAKTU)
+            for i, tugas in enumerate(daftar_tugas[:3])
+        ])
+        db.commit()
+
+@pytest.fixture
+def client(tmp_path, session_factory, data):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/respon.db")
+    async_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+    async def get_async_db():
+        async with async_factory() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_read_db] = get_db
+    main.app.dependency_overrides[main.get_async_read_db] = get_async_db
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    main.app.dependency_overrides[auth.get_token_dynamic] = lambda: None
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def lewat_pydantic(model, daftar):
+    return jsonable_encoder([model.model_validate(item, from_attributes=True) for item in daftar])
+
+
+@pytest.mark.parametrize("path, model, entitas", [
+    ("/admin/pelajar/list", schema.Pelajar, lambda db: db.query(models.Pelajar).order_by(models.Pelajar.id).all()),
+    ("/admin/mentor/list", schema.Mentor, lambda db: db.query(models.Mentor).all()),
+    ("/admin/admin/list", schema.AdminData, lambda db: db.query(models.Admin).order_by(models.Admin.id).all()),
+    ("/video/list", schema.VideoDenganMateri,
+     lambda db: db.query(models.VideoPembelajaran).options(joinedload(models.VideoPembelajaran.materi))
+        .order_by(models.VideoPembelajaran.id).all()),
+    ("/materi/tugas/list?id_materi=1", schema.TugasDenganVideo,
+     lambda db: db.query(models.TugasPembelajaran).options(joinedload(models.TugasPembelajaran.video))
+        .filter(models.TugasPembelajaran.video.has()).order_by(models.TugasPembelajaran.time_created.desc()).all()),
+])
+def test_fast_path_matches_pydantic_response(client, session_factory, path, model, entitas):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    with session_factory() as db:
+        assert response.json() == lewat_pydantic(model, entitas(db))
+
+def test_cursor_header_and_missing_relation(client):
+    response = client.get("/materi/tugas/list", params={"limit": 3})
+    assert [tugas["judul"] for tugas in response.json()] == ["Tugas 3", "Tugas 2", "Tugas 1"]
+    assert response.json()[0]["video"] is None
+    assert response.json()[1]["video"]["judul"] == "Video 2"
+
+    response = client.get("/materi/tugas/list", params={"limit": 3, "cursor": response.headers["X-Next-Cursor"]})
+    assert [tugas["judul"] for tugas in response.json()] == ["Tugas 0"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/admin/pelajar/list", params={"is_member": True, "limit": 2})
+    assert [pelajar["nama_lengkap"] for pelajar in response.json()] == ['Pelajar "0"', 'Pelajar "2"']
+    response = client.get("/admin/pelajar/list", params={"is_member": True, "limit": 2,
+                                                         "cursor": response.headers["X-Next-Cursor"]})
+    assert [pelajar["nama_lengkap"] for pelajar in response.json()] == ['Pelajar "4"']
+
+def test_susun_semua_nests_labelled_columns():
+    class Row(tuple):
+        _fields = ("id", "video__id", "video__judul")
+
+    assert respon_json.susun_semua([Row((1, None, None)), Row((2, 5, "x"))]) == [
+        {"id": 1, "video": None},
+        {"id": 2, "video": {"id": 5, "judul": "x"}},
+    ]
+    assert respon_json.susun_semua([]) == []
+
+def test_materi_list_counts_videos_and_caps_preview(client):
+    response = client.get("/materi/list", params={"preview_video": 2})
+    [materi] = response.json()
+    assert materi["jumlah_video"] == 3
+    assert [video["judul"] for video in materi["video_pembelajaran"]] == ["Video 2", "Video 1"]
+    assert client.get("/materi/list", params={"preview_video": 0}).json()[0]["video_pembelajaran"] == []
+    assert client.get("/materi/list", params={"preview_video": 100}).status_code == 422
+
+    response = client.get("/materi/video/list", params={"id_materi": materi["id"], "limit": 2})
+    assert [video["judul"] for video in response.json()] == ["Video 0", "Video 1"]
+    response = client.get("/materi/video/list", params={"id_materi": materi["id"], "limit": 2,
+                                                        "cursor": response.headers["X-Next-Cursor"]})
+    assert [video["judul"] for video in response.json()] == ["Video 2"]
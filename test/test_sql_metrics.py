@@ -0,0 +1,100 @@
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import sql_metrics
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    sql_metrics.pasang(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_rekam_counts_statements_and_time(engine):
+    with sql_metrics.rekam() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    assert stats.jumlah == 2
+    assert stats.durasi >= 0
+    assert stats.statement["SELECT 1"] == 1
+
+def test_statements_outside_rekam_are_ignored(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    with sql_metrics.rekam() as stats:
+        pass
+
+    assert stats.jumlah == 0
+
+def test_failed_statement_leaves_no_start_time_on_connection(engine, monkeypatch):
+    waktu = iter([0.0, 100.0, 101.0])
+    monkeypatch.setattr(sql_metrics.time, "perf_counter", lambda: next(waktu))
+
+    with sql_metrics.rekam() as stats:
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM tidak_ada"))
+            conn.execute(text("SELECT 1"))
+            info = dict(conn.info)
+
+    assert stats.jumlah == 1
+    assert stats.durasi == 1.0
+    assert not any(str(key).startswith("sql_metrics") for key in info)
+
+def test_pasang_twice_does_not_double_count(engine):
+    sql_metrics.pasang(engine)
+
+    with sql_metrics.rekam() as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    assert stats.jumlah == 1
+
+def test_berulang_detects_repeated_statements(engine):
+    with sql_metrics.rekam() as stats:
+        with engine.connect() as conn:
+            for i in range(6):
+                conn.execute(text("SELECT :x"), {"x": i})
+            conn.execute(text("SELECT 1"))
+
+    assert stats.berulang(5) == {"SELECT ?": 6}
+    assert stats.berulang(7) == {}
+
+
+def test_middleware_adds_headers_and_logs_n_plus_one(engine, caplog):
+    app = FastAPI()
+    app.add_middleware(sql_metrics.SqlMetricsMiddleware)
+
+    @app.get("/n-plus-one")
+    def n_plus_one():
+        with engine.connect() as conn:
+            for i in range(sql_metrics.N_PLUS_ONE_THRESHOLD):
+                conn.execute(text("SELECT :x"), {"x": i})
+        return {}
+
+    @app.get("/single")
+    def single():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {}
+
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="sql_metrics"):
+        response = client.get("/single")
+        assert response.headers["X-DB-Queries"] == "1"
+        assert "X-DB-Time-Ms" in response.headers
+        assert "X-DB-Repeated" not in response.headers
+        assert caplog.records == []
+
+        response = client.get("/n-plus-one")
+        assert response.headers["X-DB-Queries"] == str(sql_metrics.N_PLUS_ONE_THRESHOLD)
+        assert response.headers["X-DB-Repeated"] == str(sql_metrics.N_PLUS_ONE_THRESHOLD)
+        assert any("N+1" in record.getMessage() for record in caplog.records)
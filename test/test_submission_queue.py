@@ -0,0 +1,212 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import cache
+import crud
+import grading
+import main
+import models
+import schema
+import submission_queue
+
+WAKTU = datetime.datetime(2023, 5, 20, 10, 0)
+BENAR = ["1", ["1", "0"]]
+SALAH = ["0", ["0", "1"]]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/antrian.db")
+    models.Base.metadata.create_all(engine)
+    cache.hapus_semua()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def data(session_factory):
+    with session_factory() as db:
+        mentor = models.Mentor(email="mentor@example.com", nama_lengkap="Mentor", Asal="UI")
+        daftar_pelajar = [
+            models.Pelajar(email=f"pelajar{i}@example.com", nama_lengkap=f"Pelajar {i}", asal_sekolah="SMA 1", jurusan="IPA")
+            for i in range(4)
+        ]
+        db.add_all([mentor, *daftar_pelajar])
+        db.flush()
+        video = models.VideoPembelajaran(creator_id=mentor.id, judul="Video", s3_key="key")
+        db.add(video)
+        db.commit()
+        db_tugas, _ = crud.create_tugas_pembelajaran_lengkap(db, "Tugas", 3, video.id, [
+            schema.SoalABCKunci(pertanyaan="abc", pilihan_jawaban=["a", "b"], index_jawaban_benar=1),
+            schema.SoalBenarSalah(pertanyaan="bs", pernyataan_pada_benar="Benar", pernyataan_pada_salah="Salah",
+                                  daftar_jawaban=[schema.JawabanBenarSalahKunci(isi_jawaban="x", jawaban_pernyataan_yang_benar=True),
+                                                  schema.JawabanBenarSalahKunci(isi_jawaban="y", jawaban_pernyataan_yang_benar=False)]),
+        ])
+        return {"tugas": db_tugas.id, "pelajar": [p.id for p in daftar_pelajar]}
+
+@pytest.fixture
+def antrian(session_factory):
+    antrian = submission_queue.AntrianPengumpulan(session_factory, workers=0, batch_size=10)
+    antrian.mulai()
+    return antrian
+
+
+def jumlah_attempt(session_factory, id_pelajar, id_tugas):
+    with session_factory() as db:
+        return len(crud.read_attempt_mengerjakan_tugas(db, id_tugas, id_pelajar))
+
+
+def test_submissions_are_graded_in_one_batch(engine, session_factory, data, antrian):
+    pelajar = data["pelajar"][0]
+    receipts = [antrian.kirim(pelajar, data["tugas"], BENAR if i % 2 == 0 else SALAH, WAKTU, WAKTU) for i in range(5)]
+    assert antrian.status(receipts[0])["status"] == submission_queue.MENUNGGU
+    assert antrian.stats()["antrian"] == 5
+
+    inserts = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT INTO mengerjakan_tugas") else None)
+    antrian.proses_semua()
+
+    hasil = [antrian.status(receipt) for receipt in receipts]
+    assert [h["status"] for h in hasil] == ["selesai"] * 3 + ["ditolak"] * 2
+    assert [h["attempt"]["nilai"] for h in hasil[:3]] == [10.0, 0.0, 10.0]
+    assert hasil[3]["detail"] == "Max attempt reached"
+    assert jumlah_attempt(session_factory, pelajar, data["tugas"]) == 3
+    with session_factory() as db:
+        [rekap] = crud.read_rekap_nilai_filter_by(db, id_pelajar=pelajar)
+    assert (rekap.jumlah_attempt, rekap.nilai_terbaik, rekap.nilai_terakhir) == (3, 10.0, 10.0)
+    assert rekap.rata_rata == pytest.approx(20 / 3)
+    # satu batch, satu statement insert (insertmanyvalues)
+    assert len(inserts) == 1
+    stats = antrian.stats()
+    assert (stats["antrian"], stats["diproses"], stats["ditolak"], stats["batch"]) == (0, 3, 2, 1)
+
+def test_limit_counts_attempts_made_outside_the_queue(session_factory, data, antrian):
+    pelajar = data["pelajar"][0]
+    with session_factory() as db:
+        crud.create_new_attempt_mengerjakan_tugas(db, pelajar, data["tugas"], 1.0, WAKTU, WAKTU, attempt_allowed=3)
+        crud.create_new_attempt_mengerjakan_tugas(db, pelajar, data["tugas"], 1.0, WAKTU, WAKTU, attempt_allowed=3)
+
+    receipts = [antrian.kirim(pelajar, data["tugas"], BENAR, WAKTU, WAKTU) for _ in range(2)]
+    antrian.proses_semua()
+
+    assert [antrian.status(receipt)["status"] for receipt in receipts] == ["selesai", "ditolak"]
+    with session_factory() as db:
+        with pytest.raises(crud.BatasAttemptTercapai):
+            crud.create_new_attempt_mengerjakan_tugas(db, pelajar, data["tugas"], 1.0, WAKTU, WAKTU, attempt_allowed=3)
+
+def test_invalid_submissions_are_rejected(data, antrian):
+    pelajar = data["pelajar"][0]
+    salah_id = antrian.kirim(pelajar, 99, BENAR, WAKTU, WAKTU)
+    salah_panjang = antrian.kirim(pelajar, data["tugas"], ["1"], WAKTU, WAKTU)
+    benar = antrian.kirim(pelajar, data["tugas"], BENAR, WAKTU, WAKTU)
+    antrian.proses_semua()
+
+    assert antrian.status(salah_id)["detail"] == "Invalid id"
+    assert antrian.status(salah_panjang)["detail"] == "Length missmatch"
+    assert antrian.status(benar)["status"] == "selesai"
+
+def test_failed_batch_is_reported(data, antrian, monkeypatch):
+    def gagal(*args, **kwargs):
+        raise RuntimeError("database mati")
+    monkeypatch.setattr(crud, "tambah_rekap_attempt", gagal)
+    receipt = antrian.kirim(data["pelajar"][0], data["tugas"], BENAR, WAKTU, WAKTU)
+    antrian.proses_semua()
+
+    assert antrian.status(receipt)["status"] == "gagal"
+    assert antrian.stats()["gagal"] == 1
+
+def test_one_failing_submission_does_not_fail_the_batch(session_factory, data, antrian, monkeypatch):
+    a, b, c, _ = data["pelajar"]
+    asli = crud.tambah_rekap_attempt
+    def gagal_untuk_b(db, id_pelajar, id_tugas):
+        if id_pelajar == b:
+            raise RuntimeError("pelajar sudah dihapus")
+        return asli(db, id_pelajar, id_tugas)
+    monkeypatch.setattr(crud, "tambah_rekap_attempt", gagal_untuk_b)
+    receipts = [antrian.kirim(pelajar, data["tugas"], BENAR, WAKTU, WAKTU) for pelajar in (a, b, c)]
+    antrian.proses_semua()
+
+    assert [antrian.status(receipt)["status"] for receipt in receipts] == ["selesai", "gagal", "selesai"]
+    assert [jumlah_attempt(session_factory, pelajar, data["tugas"]) for pelajar in (a, b, c)] == [1, 0, 1]
+
+def test_rekap_rows_are_locked_in_key_order(data, antrian, monkeypatch):
+    asli = crud.tambah_rekap_attempt
+    urutan = []
+    def catat(db, id_pelajar, id_tugas):
+        urutan.append((id_pelajar, id_tugas))
+        return asli(db, id_pelajar, id_tugas)
+    monkeypatch.setattr(crud, "tambah_rekap_attempt", catat)
+    for pelajar in reversed(data["pelajar"]):
+        antrian.kirim(pelajar, data["tugas"], BENAR, WAKTU, WAKTU)
+    antrian.proses_semua()
+
+    assert urutan == sorted(urutan) and len(urutan) == 4
+
+def test_inactive_queue_rejects_submissions(session_factory):
+    antrian = submission_queue.AntrianPengumpulan(session_factory, workers=0)
+    with pytest.raises(submission_queue.AntrianTidakAktif):
+        antrian.kirim(1, 1, BENAR, WAKTU, WAKTU)
+
+def test_full_queue_rejects_submissions(session_factory, data):
+    antrian = submission_queue.AntrianPengumpulan(session_factory, workers=0, maxsize=1)
+    antrian.mulai()
+    antrian.kirim(data["pelajar"][0], data["tugas"], BENAR, WAKTU, WAKTU)
+    with pytest.raises(submission_queue.AntrianPenuh):
+        antrian.kirim(data["pelajar"][0], data["tugas"], BENAR, WAKTU, WAKTU)
+
+def test_worker_threads_drain_queue_on_stop(session_factory, data):
+    antrian = submission_queue.AntrianPengumpulan(session_factory, workers=2, batch_size=4)
+    antrian.mulai()
+    receipts = [
+        antrian.kirim(pelajar, data["tugas"], BENAR, WAKTU, WAKTU)
+        for pelajar in data["pelajar"] for _ in range(5)
+    ]
+    antrian.berhenti()
+
+    status = [antrian.status(receipt)["status"] for receipt in receipts]
+    assert status.count("selesai") == 4 * 3
+    assert status.count("ditolak") == 4 * 2
+    for pelajar in data["pelajar"]:
+        assert jumlah_attempt(session_factory, pelajar, data["tugas"]) == 3
+    assert antrian.stats()["workers"] == 0
+
+
+def test_endpoints(session_factory, data, antrian):
+    pelajar, lain = data["pelajar"][:2]
+    main.app.dependency_overrides[auth.get_admin_token] = lambda: None
+    try:
+        main_antrian, main.antrian_pengumpulan = main.antrian_pengumpulan, antrian
+        client = TestClient(main.app)
+        token = {"Authorization": f"Bearer {auth.create_access_token({'id': pelajar})}"}
+
+        response = client.post("/video/tugas/kumpul/antrian", headers=token, json={
+            "id_tugas": data["tugas"], "waktu_mulai": WAKTU.isoformat(), "waktu_selesai": WAKTU.isoformat(), "jawaban": BENAR})
+        assert response.status_code == 202
+        receipt = response.json()["receipt"]
+        assert client.get(f"/video/tugas/kumpul/antrian/{receipt}", headers=token).json()["status"] == "menunggu"
+        assert client.get("/admin/antrian/stats").json()["antrian"] == 1
+
+        antrian.proses_semua()
+        hasil = client.get(f"/video/tugas/kumpul/antrian/{receipt}", headers=token).json()
+        assert hasil["status"] == "selesai"
+        assert hasil["attempt"]["nilai"] == 10.0
+
+        token_lain = {"Authorization": f"Bearer {auth.create_access_token({'id': lain})}"}
+        assert client.get(f"/video/tugas/kumpul/antrian/{receipt}", headers=token_lain).status_code == 404
+
+        antrian.aktif = False
+        response = client.post("/video/tugas/kumpul/antrian", headers=token, json={
+            "id_tugas": data["tugas"], "waktu_mulai": WAKTU.isoformat(), "waktu_selesai": WAKTU.isoformat(), "jawaban": BENAR})
+        assert response.status_code == 503
+    finally:
+        main.antrian_pengumpulan = main_antrian
+        main.app.dependency_overrides.clear()